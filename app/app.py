@@ -3,14 +3,16 @@ API REST de traducción Español → Danés usando NLLB + CTranslate2.
 
 Servicio 100% local, gratuito y privado con arranque resiliente.
 """
+import asyncio
+import hmac
 import logging
 import threading
 from contextlib import asynccontextmanager
-from typing import Union
+from typing import Optional, Tuple, Union
 from datetime import datetime
 
-from fastapi import FastAPI, HTTPException, status, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, status, Request, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.settings import settings
@@ -19,14 +21,25 @@ from app.schemas import (
     TranslateRequest, 
     TranslateResponse,
     TranslateHTMLRequest,
-    TranslateHTMLResponse
+    TranslateHTMLResponse,
+    GlossaryRequest,
+    GlossaryInfo
+)
+from app.inference import segment_text, translate_batch, translate_text_preserving_structure
+from app.glossary import (
+    GlossaryMatcher, apply_glossary_pre, apply_glossary_post, compile_glossary
+)
+from app.glossary_store import glossary_store, glossary_version
+from app.ruleset_store import ruleset_store, TenantRuleSet
+from app.segment import (
+    join_spans, sanitize_and_split_html, collect_attribute_texts,
+    translate_text_blocks, rehydrate_html
 )
-from app.inference import translate_batch, translate_text_preserving_structure
-from app.glossary import apply_glossary_pre, apply_glossary_post
-from app.segment import split_text_for_email, split_html_preserving_structure, rehydrate_html
 from app.cache import translation_cache
 from app.utils_html import sanitize_html
 from app.utils_text import looks_like_html
+from app.profiler import SamplingProfiler, profile_for, profile_store
+from app.metrics import metrics
 
 
 # Configuración de logging
@@ -62,7 +75,17 @@ async def lifespan(app: FastAPI):
         logger.warning("La API arrancará de todos modos.")
         logger.warning("Consulta /health para más detalles")
     
-    # 2. Cargar modelo en hilo separado (para no bloquear)
+    # 2. Cargar glosarios con nombre (compilados una vez aquí)
+    glossary_count = glossary_store.load()
+    if glossary_count:
+        logger.info(f"✓ {glossary_count} glosario(s) con nombre cargados")
+    
+    # 3. Cargar reglas de post-procesado por cliente (compiladas aquí)
+    ruleset_count = ruleset_store.load()
+    if ruleset_count:
+        logger.info(f"✓ {ruleset_count} conjunto(s) de reglas cargados")
+    
+    # 4. Cargar modelo en hilo separado (para no bloquear)
     if probe_result["all_ok"]:
         logger.info("Cargando modelo en segundo plano...")
         
@@ -74,7 +97,9 @@ async def lifespan(app: FastAPI):
             else:
                 logger.error("✗ Fallo al cargar modelo (consulta /health)")
         
-        loading_thread = threading.Thread(target=load_in_background, daemon=True)
+        loading_thread = threading.Thread(
+            target=load_in_background, name="model-loader", daemon=True
+        )
         loading_thread.start()
         
         logger.info("✓ Servidor arrancando (modelo cargando en paralelo)")
@@ -129,7 +154,7 @@ app.add_middleware(
         "http://localhost:5173",  # Vite dev server
         "http://127.0.0.1:5173"
     ],
-    allow_methods=["GET", "POST", "OPTIONS"],  # Restrict methods
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],  # Restrict methods
     allow_headers=["Content-Type", "Authorization", "Accept"],  # Restrict headers
     allow_credentials=False,  # Crítico: False cuando allow_origins incluye "*"
     max_age=600  # Cache preflight por 10 minutos
@@ -153,7 +178,7 @@ async def add_security_headers(request: Request, call_next):
     response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
     
     # Cache control para APIs - no cachear respuestas con contenido sensible
-    if request.url.path.startswith(("/translate", "/info")):
+    if request.url.path.startswith(("/translate", "/info", "/admin")):
         response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, private"
         response.headers["Pragma"] = "no-cache"
         response.headers["Expires"] = "0"
@@ -167,6 +192,56 @@ async def add_security_headers(request: Request, call_next):
     return response
 
 
+def is_admin_request(request: Request) -> bool:
+    """
+    Verifica el token de administración (cabecera X-Admin-Token).
+    
+    Si ADMIN_TOKEN no está configurado, ninguna petición es de administración.
+    """
+    if not settings.ADMIN_TOKEN:
+        return False
+    provided = request.headers.get("X-Admin-Token", "")
+    return hmac.compare_digest(provided.encode("utf-8"), settings.ADMIN_TOKEN.encode("utf-8"))
+
+
+def require_admin(request: Request):
+    """Lanza 404 si la administración está deshabilitada y 403 si el token no es válido."""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Endpoints de administración deshabilitados (configura ADMIN_TOKEN)"
+        )
+    if not is_admin_request(request):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Token de administración inválido"
+        )
+
+
+# Middleware de profiling por petición
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    """
+    Perfila la petición si incluye `X-Profile: 1` y un token de administración válido.
+    
+    El perfil (pilas colapsadas de todos los hilos durante la petición) se
+    descarga después vía GET /admin/profile/{id}, indicado en la cabecera
+    de respuesta X-Profile-Id.
+    """
+    if request.headers.get("X-Profile") != "1" or not is_admin_request(request):
+        return await call_next(request)
+    
+    profiler = SamplingProfiler()
+    profiler.start()
+    try:
+        response = await call_next(request)
+    finally:
+        profiler.stop()
+    
+    response.headers["X-Profile-Id"] = profile_store.add(profiler.collapsed())
+    return response
+
+
 @app.get("/")
 async def root():
     """Endpoint raíz con información del servicio."""
@@ -210,6 +285,85 @@ async def health():
     }
 
 
+def resolve_glossary(
+    request: Union[TranslateRequest, TranslateHTMLRequest]
+) -> Tuple[Optional[GlossaryMatcher], str]:
+    """
+    Resuelve el glosario de una petición (en línea o registrado por nombre).
+    
+    Args:
+        request: Petición de traducción
+        
+    Returns:
+        Tupla (matcher compilado o None, namespace de caché). El namespace
+        incluye la versión del glosario para que traducciones con glosarios
+        distintos no compartan entradas de caché.
+        
+    Raises:
+        HTTPException: 400 si se envían ambos, 404 si el nombre no existe,
+                       409 si la versión esperada no coincide
+    """
+    if request.glossary_name is None:
+        if not request.glossary:
+            return None, ""
+        return (
+            compile_glossary(request.glossary),
+            f"glossary:{glossary_version(request.glossary)}"
+        )
+    
+    if request.glossary:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Usa 'glossary' o 'glossary_name', no ambos"
+        )
+    
+    named = glossary_store.get(request.glossary_name)
+    if named is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Glosario no encontrado: {request.glossary_name}"
+        )
+    if request.glossary_version is not None and request.glossary_version != named.version:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=(
+                f"Versión de glosario '{named.name}' no coincide: "
+                f"solicitada {request.glossary_version}, actual {named.version}"
+            )
+        )
+    return named.matcher, f"glossary:{named.version}"
+
+
+def resolve_ruleset(
+    request: Union[TranslateRequest, TranslateHTMLRequest],
+    cache_namespace: str
+) -> Tuple[Optional[TenantRuleSet], str]:
+    """
+    Resuelve el conjunto de reglas del cliente indicado en la petición.
+    
+    Args:
+        request: Petición de traducción
+        cache_namespace: Namespace de caché actual (ej: del glosario)
+        
+    Returns:
+        Tupla (reglas o None, namespace de caché ampliado con la versión de las
+        reglas, ya que el caché guarda traducciones post-procesadas)
+        
+    Raises:
+        HTTPException: 404 si el conjunto no existe
+    """
+    if request.ruleset is None:
+        return None, cache_namespace
+    
+    ruleset = ruleset_store.get(request.ruleset)
+    if ruleset is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Conjunto de reglas no encontrado: {request.ruleset}"
+        )
+    return ruleset, f"{cache_namespace}+rules:{ruleset.name}@{ruleset.version}"
+
+
 def resolve_max_new_tokens(user_value: Union[int, None], input_texts: list[str]) -> Union[int, None]:
     """
     Resuelve max_new_tokens basado en el valor del usuario y el texto de entrada.
@@ -236,14 +390,19 @@ def resolve_max_new_tokens(user_value: Union[int, None], input_texts: list[str])
 
 
 @app.post("/translate", response_model=TranslateResponse)
-async def translate(request: TranslateRequest):
+def translate(request: TranslateRequest):
     """
     Traduce texto de español a danés.
     
+    Se define como función síncrona: FastAPI la ejecuta en su threadpool, de
+    modo que la inferencia no bloquea el event loop y las peticiones
+    concurrentes pueden coalescer traducciones idénticas en curso.
+    
     **Parámetros:**
     - `text`: Texto o lista de textos en español
     - `max_new_tokens`: Máximo de tokens a generar (default: 256)
     - `glossary`: Diccionario opcional de términos ES → DA
+    - `glossary_name`: Glosario registrado con PUT /glossaries/{name} (opcional `glossary_version`)
     
     **Ejemplo de uso:**
     ```json
@@ -297,6 +456,10 @@ async def translate(request: TranslateRequest):
                 detail="El campo 'text' no puede estar vacío"
             )
         
+        # Glosario compilado (en línea o con nombre) y namespace de caché
+        glossary, cache_namespace = resolve_glossary(request)
+        ruleset, cache_namespace = resolve_ruleset(request, cache_namespace)
+        
         # Resolver max_new_tokens ANTES de cualquier procesamiento
         resolved_max_new_tokens = resolve_max_new_tokens(
             request.max_new_tokens, 
@@ -324,8 +487,8 @@ async def translate(request: TranslateRequest):
                 logger.info(f"Usando traducción con preservación de estructura (preserve_newlines=True)")
                 
                 # Aplicar glosario pre-traducción si existe
-                if request.glossary:
-                    text_to_translate = apply_glossary_pre(text_to_translate, request.glossary)
+                if glossary:
+                    text_to_translate = apply_glossary_pre(text_to_translate, glossary)
                 
                 # Traducir preservando estructura
                 translated = translate_text_preserving_structure(
@@ -333,12 +496,14 @@ async def translate(request: TranslateRequest):
                     direction=request.direction,
                     max_new_tokens=resolved_max_new_tokens,
                     formal=request.formal or settings.FORMAL_DA,
-                    strict_max=request.strict_max
+                    strict_max=request.strict_max,
+                    cache_namespace=cache_namespace,
+                    ruleset=ruleset
                 )
                 
                 # Aplicar glosario post-traducción si existe
-                if request.glossary:
-                    translated = apply_glossary_post(translated, request.glossary)
+                if glossary:
+                    translated = apply_glossary_post(translated, glossary)
                 
                 # Construir respuesta directamente
                 elapsed_ms = int((time.time() - start_time) * 1000)
@@ -358,30 +523,22 @@ async def translate(request: TranslateRequest):
                 )
         
         # Ruta tradicional: segmentación y batch
-        # Segmentar textos largos automáticamente SOLO si es necesario
+        # Cada texto se divide en spans (por tokens o caracteres); los segmentos
+        # de todos los textos van en un único batch
+        text_spans = []
         all_segments = []
-        segment_map = []  # Para reconstruir después
-        
-        for idx, text in enumerate(texts_to_translate):
-            # Solo segmentar si el texto es muy largo (más de 1500 caracteres)
-            # o si se acerca al límite de tokens
-            if len(text) > settings.MAX_SEGMENT_CHARS:
-                # Texto largo: segmentar
-                segments = split_text_for_email(text, max_segment_chars=settings.MAX_SEGMENT_CHARS)
-                for seg in segments:
-                    all_segments.append(seg)
-                    segment_map.append(idx)
-            else:
-                # Texto corto: traducir completo
-                all_segments.append(text)
-                segment_map.append(idx)
+        
+        for text in texts_to_translate:
+            spans = segment_text(text, request.direction)
+            text_spans.append(spans)
+            all_segments.extend(text[start:end] for start, end, _ in spans)
         
         # Aplicar glosario pre-traducción si existe
-        if request.glossary:
+        if glossary:
             if not settings.LOG_TRANSLATIONS:
-                logger.info(f"Aplicando glosario con {len(request.glossary)} términos")
+                logger.info(f"Aplicando glosario con {len(glossary.glossary)} términos")
             all_segments = [
-                apply_glossary_pre(seg, request.glossary)
+                apply_glossary_pre(seg, glossary)
                 for seg in all_segments
             ]
         
@@ -396,32 +553,26 @@ async def translate(request: TranslateRequest):
             use_cache=True,
             formal=request.formal or settings.FORMAL_DA,
             strict_max=request.strict_max,
-            preserve_newlines=request.preserve_newlines
+            preserve_newlines=request.preserve_newlines,
+            cache_namespace=cache_namespace,
+            ruleset=ruleset
         )
         
         # Aplicar glosario post-traducción si existe
-        if request.glossary:
+        if glossary:
             segment_translations = [
-                apply_glossary_post(seg, request.glossary)
+                apply_glossary_post(seg, glossary)
                 for seg in segment_translations
             ]
         
-        # Reensamblar segmentos por texto original
+        # Reensamblar segmentos por texto original (separadores exactos, O(n))
         translations = []
-        for original_idx in range(len(texts_to_translate)):
-            # Encontrar todos los segmentos de este texto
-            segs_for_this_text = [
-                segment_translations[i] 
-                for i, seg_idx in enumerate(segment_map) 
-                if seg_idx == original_idx
-            ]
-            
-            if len(segs_for_this_text) == 1:
-                # Texto no segmentado: usar traducción directa
-                translations.append(segs_for_this_text[0])
-            else:
-                # Texto segmentado: unir con espacio
-                translations.append(' '.join(segs_for_this_text))
+        offset = 0
+        for text, spans in zip(texts_to_translate, text_spans):
+            translations.append(
+                join_spans(text, spans, segment_translations[offset:offset + len(spans)])
+            )
+            offset += len(spans)
         
         # Métricas finales
         elapsed_ms = int((time.time() - start_time) * 1000)
@@ -470,16 +621,20 @@ async def translate(request: TranslateRequest):
 
 
 @app.post("/translate/html", response_model=TranslateHTMLResponse)
-async def translate_html_endpoint(request: TranslateHTMLRequest):
+def translate_html_endpoint(request: TranslateHTMLRequest):
     """
     Traduce HTML de correos electrónicos de español a danés.
     
+    Síncrona (threadpool) por el mismo motivo que /translate.
+    
     Preserva estructura HTML básica: etiquetas, formato, enlaces, etc.
     
     **Parámetros:**
     - `html`: Contenido HTML del correo
     - `max_new_tokens`: Máximo de tokens a generar por bloque (default: 256)
     - `glossary`: Diccionario opcional de términos ES → DA
+    - `glossary_name`: Glosario registrado con PUT /glossaries/{name} (opcional `glossary_version`)
+    - `translate_attributes`: Traducir también `alt`, `title` y `placeholder` (default: false)
     
     **Ejemplo de uso:**
     ```json
@@ -516,14 +671,19 @@ async def translate_html_endpoint(request: TranslateHTMLRequest):
                 detail="El campo 'html' no puede estar vacío"
             )
         
-        # Sanitizar HTML de entrada (seguridad)
-        html_clean = sanitize_html(request.html)
+        # Glosario compilado (en línea o con nombre) y namespace de caché
+        glossary, cache_namespace = resolve_glossary(request)
+        ruleset, cache_namespace = resolve_ruleset(request, cache_namespace)
         
         if not settings.LOG_TRANSLATIONS:
-            logger.info(f"Traduciendo HTML ({len(html_clean)} caracteres)...")
+            logger.info(f"Traduciendo HTML ({len(request.html)} caracteres)...")
+        
+        # Sanitizar (seguridad) y extraer bloques y textos en una sola pasada
+        blocks, texts_to_translate = sanitize_and_split_html(request.html)
         
-        # Extraer bloques HTML y textos
-        blocks, texts_to_translate = split_html_preserving_structure(html_clean)
+        # alt/title/placeholder en el mismo batch (dedup con los textos)
+        if request.translate_attributes:
+            texts_to_translate = collect_attribute_texts(blocks, texts_to_translate)
         
         if not texts_to_translate:
             # HTML sin texto traducible
@@ -531,39 +691,37 @@ async def translate_html_endpoint(request: TranslateHTMLRequest):
                 provider="nllb-ct2-int8",
                 source="spa_Latn",
                 target="dan_Latn",
-                html=html_clean
+                html=sanitize_html(request.html)
             )
         
-        # Aplicar glosario pre-traducción si existe
-        if request.glossary:
-            texts_to_translate = [
-                apply_glossary_pre(t, request.glossary)
-                for t in texts_to_translate
-            ]
-        
         # Resolver max_new_tokens: usar cálculo adaptativo si no se especifica
         resolved_max_new_tokens = resolve_max_new_tokens(
             request.max_new_tokens, 
             texts_to_translate
         )
         
-        # Traducir con caché, post-procesado y dirección
-        translated_texts = translate_batch(
-            texts_to_translate,
-            direction=request.direction,
-            max_new_tokens=resolved_max_new_tokens,
-            use_cache=True,
-            formal=request.formal or settings.FORMAL_DA,
-            strict_max=request.strict_max,
-            preserve_newlines=request.preserve_newlines
-        )
+        def translate_texts(texts):
+            """Glosario pre → traducción (caché, post-procesado, dirección) → glosario post."""
+            if glossary:
+                texts = [apply_glossary_pre(t, glossary) for t in texts]
+            translated = translate_batch(
+                texts,
+                direction=request.direction,
+                max_new_tokens=resolved_max_new_tokens,
+                use_cache=True,
+                formal=request.formal or settings.FORMAL_DA,
+                strict_max=request.strict_max,
+                preserve_newlines=request.preserve_newlines,
+                cache_namespace=cache_namespace,
+                ruleset=ruleset
+            )
+            if glossary:
+                translated = [apply_glossary_post(t, glossary) for t in translated]
+            return translated
         
-        # Aplicar glosario post-traducción si existe
-        if request.glossary:
-            translated_texts = [
-                apply_glossary_post(t, request.glossary)
-                for t in translated_texts
-            ]
+        # Un batch para todos los bloques; los que pierdan sus marcadores
+        # inline se re-traducen por fragmentos en un segundo batch
+        translated_texts = translate_text_blocks(blocks, texts_to_translate, translate_texts)
         
         # Reconstruir HTML
         html_translated = rehydrate_html(blocks, translated_texts)
@@ -631,7 +789,8 @@ async def info():
         "threads_config": {
             "ct2_inter_threads": settings.CT2_INTER_THREADS,
             "ct2_intra_threads": settings.CT2_INTRA_THREADS
-        }
+        },
+        **metrics.snapshot()
     }
     
     return {
@@ -657,6 +816,8 @@ async def info():
             "supports_segmentation": True,
             "supports_formal_style": True,
             "supports_case_insensitive_glossary": True,
+            "supports_named_glossaries": True,
+            "supports_rulesets": True,
             "max_batch_size": settings.MAX_BATCH_SIZE,
             "max_tokens_per_translation": settings.MAX_MAX_NEW_TOKENS,
             "auto_tokens_enabled": True,
@@ -667,6 +828,7 @@ async def info():
             "default_max_new_tokens": settings.DEFAULT_MAX_NEW_TOKENS,
             "max_max_new_tokens": settings.MAX_MAX_NEW_TOKENS,
             "max_segment_chars": settings.MAX_SEGMENT_CHARS,
+            "max_segment_tokens": settings.MAX_SEGMENT_TOKENS,
             "request_timeout": settings.REQUEST_TIMEOUT
         }
     }
@@ -684,6 +846,124 @@ async def clear_cache():
     }
 
 
+@app.put("/glossaries/{name}", response_model=GlossaryInfo)
+def put_glossary(name: str, request: GlossaryRequest, http_request: Request):
+    """
+    Registra (o reemplaza) un glosario con nombre.
+    
+    Se compila una sola vez y se persiste en GLOSSARY_DIR. Las peticiones lo
+    referencian con `glossary_name` (y opcionalmente `glossary_version`).
+    Requiere el token de administración (el glosario lo comparten todos los clientes).
+    
+    **Ejemplo:**
+    ```
+    curl -X PUT http://localhost:8000/glossaries/acme \\
+         -H "X-Admin-Token: $ADMIN_TOKEN" \\
+         -H "Content-Type: application/json" \\
+         -d '{"terms": {"Acme Corporation": "Acme Corporation A/S"}}'
+    ```
+    """
+    require_admin(http_request)
+    
+    try:
+        named = glossary_store.put(name, request.terms)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    logger.info(f"Glosario '{name}' registrado ({len(named.terms)} términos, versión {named.version})")
+    return GlossaryInfo(**named.describe())
+
+
+@app.get("/glossaries", response_model=list[GlossaryInfo])
+async def list_glossaries():
+    """Lista los glosarios registrados (sin términos)."""
+    return glossary_store.list()
+
+
+@app.get("/glossaries/{name}", response_model=GlossaryInfo)
+async def get_glossary(name: str, request: Request):
+    """
+    Devuelve los metadatos de un glosario registrado.
+    
+    Los términos solo se incluyen con el token de administración: el glosario
+    de un cliente no es visible para los demás.
+    """
+    named = glossary_store.get(name)
+    if named is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Glosario no encontrado: {name}"
+        )
+    terms = named.terms if is_admin_request(request) else None
+    return GlossaryInfo(**named.describe(), terms=terms)
+
+
+@app.delete("/glossaries/{name}")
+async def delete_glossary(name: str, request: Request):
+    """Elimina un glosario registrado (requiere el token de administración)."""
+    require_admin(request)
+    
+    if not glossary_store.delete(name):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Glosario no encontrado: {name}"
+        )
+    return {"message": f"Glosario '{name}' eliminado"}
+
+
+@app.get("/rulesets")
+async def list_rulesets():
+    """Lista los conjuntos de reglas de post-procesado cargados (RULESETS_DIR)."""
+    return ruleset_store.list()
+
+
+@app.get("/admin/profile", response_class=PlainTextResponse)
+async def admin_profile(
+    request: Request,
+    seconds: float = Query(default=10.0, gt=0),
+    interval_ms: float = Query(default=5.0, ge=1.0, le=1000.0)
+):
+    """
+    Perfila el proceso completo durante N segundos (solo administración).
+    
+    Cubre el hilo del event loop, el hilo de carga del modelo y los hilos
+    de inferencia. Devuelve pilas colapsadas compatibles con flamegraph.pl
+    y speedscope.
+    
+    **Ejemplo:**
+    ```
+    curl -H "X-Admin-Token: $ADMIN_TOKEN" "http://localhost:8000/admin/profile?seconds=15" > perfil.txt
+    flamegraph.pl perfil.txt > perfil.svg
+    ```
+    """
+    require_admin(request)
+    
+    if seconds > settings.PROFILE_MAX_SECONDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"seconds no puede superar {settings.PROFILE_MAX_SECONDS}"
+        )
+    
+    # Muestrear en un hilo aparte: el event loop sigue atendiendo peticiones
+    # y aparece en el perfil con su actividad real
+    collapsed = await asyncio.to_thread(profile_for, seconds, interval_ms / 1000)
+    return PlainTextResponse(collapsed)
+
+
+@app.get("/admin/profile/{profile_id}", response_class=PlainTextResponse)
+async def admin_request_profile(profile_id: str, request: Request):
+    """Devuelve el perfil de una petición hecha con la cabecera X-Profile: 1."""
+    require_admin(request)
+    
+    collapsed = profile_store.get(profile_id)
+    if collapsed is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Perfil no encontrado: {profile_id}"
+        )
+    return PlainTextResponse(collapsed)
+
+
 # Manejador de errores global
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
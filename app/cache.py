@@ -5,7 +5,7 @@ Evita retraducciones de segmentos repetidos (especialmente útil en correos con
 """
 import hashlib
 import logging
-from functools import lru_cache
+import threading
 from typing import Optional
 
 
@@ -16,7 +16,8 @@ class TranslationCache:
     """
     Caché simple LRU para traducciones de segmentos.
     
-    Usa sha256 del texto normalizado como clave.
+    Usa sha256 del texto normalizado como clave. Thread-safe: las peticiones
+    se atienden en hilos del threadpool.
     """
     
     def __init__(self, max_size: int = 1024):
@@ -31,6 +32,7 @@ class TranslationCache:
         self.access_order = []  # Para LRU
         self.hits = 0
         self.misses = 0
+        self._lock = threading.Lock()
     
     def _normalize_key(self, text: str) -> str:
         """
@@ -51,6 +53,14 @@ class TranslationCache:
         normalized = self._normalize_key(text)
         return hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:16]
     
+    def key(self, text: str) -> str:
+        """
+        Retorna la clave interna del caché para un texto.
+        
+        Dos textos con la misma clave comparten entrada de caché.
+        """
+        return self._hash_text(text)
+    
     def get(self, text: str) -> Optional[str]:
         """
         Obtiene traducción del caché si existe.
@@ -63,16 +73,17 @@ class TranslationCache:
         """
         key = self._hash_text(text)
         
-        if key in self.cache:
-            # Mover al final (más reciente)
-            self.access_order.remove(key)
-            self.access_order.append(key)
-            self.hits += 1
+        with self._lock:
+            if key in self.cache:
+                # Mover al final (más reciente)
+                self.access_order.remove(key)
+                self.access_order.append(key)
+                self.hits += 1
+                
+                logger.debug(f"Cache HIT: {key}")
+                return self.cache[key]
             
-            logger.debug(f"Cache HIT: {key}")
-            return self.cache[key]
-        
-        self.misses += 1
+            self.misses += 1
         logger.debug(f"Cache MISS: {key}")
         return None
     
@@ -86,37 +97,41 @@ class TranslationCache:
         """
         key = self._hash_text(text)
         
-        # Si ya existe, actualizarlo y mover al final
-        if key in self.cache:
-            self.access_order.remove(key)
-        # Si el caché está lleno, eliminar el menos usado
-        elif len(self.cache) >= self.max_size:
-            oldest = self.access_order.pop(0)
-            del self.cache[oldest]
-            logger.debug(f"Cache EVICT: {oldest}")
-        
-        self.cache[key] = translation
-        self.access_order.append(key)
+        with self._lock:
+            # Si ya existe, actualizarlo y mover al final
+            if key in self.cache:
+                self.access_order.remove(key)
+            # Si el caché está lleno, eliminar el menos usado
+            elif len(self.cache) >= self.max_size:
+                oldest = self.access_order.pop(0)
+                del self.cache[oldest]
+                logger.debug(f"Cache EVICT: {oldest}")
+            
+            self.cache[key] = translation
+            self.access_order.append(key)
         logger.debug(f"Cache PUT: {key}")
     
     def clear(self):
         """Limpia el caché."""
-        self.cache.clear()
-        self.access_order.clear()
-        self.hits = 0
-        self.misses = 0
+        with self._lock:
+            self.cache.clear()
+            self.access_order.clear()
+            self.hits = 0
+            self.misses = 0
         logger.info("Caché limpiado")
     
     def stats(self) -> dict:
         """Retorna estadísticas del caché."""
-        total = self.hits + self.misses
-        hit_rate = (self.hits / total * 100) if total > 0 else 0
+        with self._lock:
+            size, hits, misses = len(self.cache), self.hits, self.misses
+        total = hits + misses
+        hit_rate = (hits / total * 100) if total > 0 else 0
         
         return {
-            "size": len(self.cache),
+            "size": size,
             "max_size": self.max_size,
-            "hits": self.hits,
-            "misses": self.misses,
+            "hits": hits,
+            "misses": misses,
             "hit_rate": f"{hit_rate:.1f}%"
         }
 
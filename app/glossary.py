@@ -16,58 +16,278 @@ Limitaciones:
 - Se recomienda usar términos completos y no fragmentos
 """
 import re
-from typing import Dict, List, Tuple
+from functools import lru_cache
+from typing import Dict, List, Tuple, Union
+
+
+# Marca de fin de término en los nodos del trie
+_END = ""
+
+
+class GlossaryMatcher:
+    """
+    Glosario compilado en un único patrón de búsqueda.
+    
+    Los términos se insertan en un trie (case-insensitive) que se convierte en
+    una expresión regular anidada, p. ej. {"acme", "acme corp", "ab"} →
+    ``\b(?:a(?:cme(?: corp)?|b))\b``. Así el texto se recorre UNA sola vez:
+    
+    - Coincidencia más larga primero (los grupos opcionales son voraces)
+    - Word boundaries como antes (si el término largo no termina en frontera
+      de palabra, el motor retrocede al término más corto)
+    - Coste independiente del número de términos en cada posición
+    
+    Se compila una vez por glosario (ver compile_glossary).
+    """
+    
+    def __init__(self, glossary: Dict[str, str]):
+        """
+        Compila el glosario.
+        
+        Args:
+            glossary: Diccionario {término_es: término_da}
+        """
+        self.glossary = dict(glossary)
+        # Lookup case-insensitive para el post-procesamiento
+        self.lookup = {k.lower(): v for k, v in glossary.items()}
+        
+        trie: dict = {}
+        for term in glossary:
+            if not term:
+                continue
+            node = trie
+            for ch in term:
+                lowered = ch.lower()
+                node = node.setdefault(lowered if len(lowered) == 1 else ch, {})
+            node[_END] = True
+        
+        body = self._trie_to_regex(trie)
+        self.pattern = (
+            re.compile(r'\b(?:' + body + r')\b', re.IGNORECASE) if body else None
+        )
+    
+    @classmethod
+    def _trie_to_regex(cls, node: dict) -> str:
+        """Convierte un nodo del trie en una expresión regular equivalente."""
+        branches = [
+            re.escape(ch) + cls._trie_to_regex(child)
+            for ch, child in node.items()
+            if ch != _END
+        ]
+        if not branches:
+            return ""
+        
+        is_terminal = _END in node
+        if len(branches) == 1 and not is_terminal:
+            return branches[0]
+        
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if is_terminal else group
+    
+    def __bool__(self) -> bool:
+        return bool(self.glossary)
+    
+    def mark_terms(self, text: str) -> str:
+        """
+        Envuelve cada término encontrado como [[TERM::<texto_original>]].
+        
+        Args:
+            text: Texto a marcar
+            
+        Returns:
+            Texto con los términos marcados (case original preservado)
+        """
+        if self.pattern is None:
+            return text
+        return self.pattern.sub(lambda m: f"[[TERM::{m.group(0)}]]", text)
+
+
+@lru_cache(maxsize=64)
+def _compile_items(items: Tuple[Tuple[str, str], ...]) -> GlossaryMatcher:
+    """Compila un glosario dado como tupla ordenada de pares (cacheado)."""
+    return GlossaryMatcher(dict(items))
+
+
+def compile_glossary(glossary: Union[Dict[str, str], GlossaryMatcher]) -> GlossaryMatcher:
+    """
+    Obtiene el matcher compilado de un glosario.
+    
+    Los glosarios idénticos comparten el mismo matcher (caché LRU), de modo que
+    un glosario repetido en muchas peticiones se compila una sola vez.
+    
+    Args:
+        glossary: Diccionario {término_es: término_da} o matcher ya compilado
+        
+    Returns:
+        GlossaryMatcher compilado
+    """
+    if isinstance(glossary, GlossaryMatcher):
+        return glossary
+    return _compile_items(tuple(sorted(glossary.items())))
+
+
+# Entidades protegidas: un único escáner para URLs, emails y números.
+# En cada posición se prueba URL, luego email, luego número (mismo orden de
+# prioridad que la protección secuencial anterior).
+_ENTITY_PATTERN = re.compile(
+    r'(?P<URL>https?://[^\s]+|www\.[^\s]+)'
+    r'|(?P<EMAIL>\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b)'
+    # Posibles marcadores de etiquetas inline [1]/[/1] de segment.py
+    r'|(?P<TAG>\[/?\d+\])'
+    # Números: 1000, 1.000, 1,000, 1.5, 1,5, etc.
+    r'|(?P<NUM>\b\d+(?:[.,]\d+)*\b)'
+)
+
+# Marcadores inline de apertura/cierre, para detectar los que van en pareja
+_INLINE_OPEN_PATTERN = re.compile(r'\[(\d+)\]')
+_INLINE_CLOSE_PATTERN = re.compile(r'\[/(\d+)\]')
+
+# Placeholders generados por _protect_entities
+_PLACEHOLDER_PATTERN = re.compile(r'__(?:URL|EMAIL|NUM)_\d+__')
+
+# Marcadores de glosario [[TERM::x]] y [[KEEP::x]]
+_MARKER_PATTERN = re.compile(r'\[\[(TERM|KEEP)::(.*?)\]\]')
+
+
+# Centinelas compactos que sustituyen a los marcadores durante la inferencia.
+# Se toleran espacios insertados por el modelo/decodificador ("§ 1").
+_SENTINEL_PATTERN = re.compile(r'§\s*(\d+)')
+
+
+def markers_to_sentinels(text: str) -> Tuple[str, List[str]]:
+    """
+    Sustituye cada marcador [[TERM::x]]/[[KEEP::x]] por un centinela §n.
+    
+    Los marcadores entran al modelo como texto normal: una URL o un número
+    marcado se convierte en muchos subtokens más los corchetes, y el modelo a
+    veces los altera. El centinela ocupa 1-2 tokens y el modelo lo copia tal cual.
+    
+    Si el texto ya contiene algo con forma de centinela (§ seguido de dígito)
+    no se convierte nada, para no confundirlo al restaurar.
+    
+    Args:
+        text: Texto con marcadores (salida de apply_glossary_pre)
+        
+    Returns:
+        Tupla (texto_con_centinelas, marcadores). El centinela §n corresponde
+        a marcadores[n - 1]
+    """
+    if "[[" not in text or _SENTINEL_PATTERN.search(text):
+        return text, []
+    
+    markers = []
+    
+    def replace_marker(match):
+        """Registra el marcador y devuelve su centinela."""
+        markers.append(match.group(0))
+        return f"§{len(markers)}"
+    
+    return _MARKER_PATTERN.sub(replace_marker, text), markers
+
+
+def sentinels_to_markers(text: str, markers: List[str]) -> Tuple[str, int]:
+    """
+    Restaura los marcadores originales a partir de los centinelas §n.
+    
+    Args:
+        text: Texto traducido con centinelas
+        markers: Marcadores devueltos por markers_to_sentinels
+        
+    Returns:
+        Tupla (texto_con_marcadores, número_de_centinelas_perdidos)
+    """
+    if not markers:
+        return text, 0
+    
+    seen = set()
+    
+    def replace_sentinel(match):
+        """Sustituye un centinela conocido por su marcador."""
+        index = int(match.group(1))
+        if not 1 <= index <= len(markers):
+            return match.group(0)
+        seen.add(index)
+        return markers[index - 1]
+    
+    result = _SENTINEL_PATTERN.sub(replace_sentinel, text)
+    return result, len(markers) - len(seen)
+
+
+def reinsert_missing_markers(text: str, markers: List[str]) -> Tuple[str, int]:
+    """
+    Añade al final los marcadores que no aparecen en el texto.
+    
+    Último recurso cuando el modelo pierde una entidad protegida o un término
+    del glosario: mejor fuera de sitio que desaparecida de la traducción.
+    
+    Returns:
+        Tupla (texto, número_de_marcadores_añadidos)
+    """
+    missing = [marker for marker in markers if marker not in text]
+    if not missing:
+        return text, 0
+    return " ".join([text.rstrip(), *missing]), len(missing)
 
 
 def _protect_entities(text: str) -> Tuple[str, List[Tuple[str, str]]]:
     """
     Protege entidades especiales (URLs, emails, números) reemplazándolas con placeholders.
     
+    Una sola pasada con el escáner combinado: cada entidad se sustituye en su
+    posición (sin str.replace por entidad, que era cuadrático en textos con
+    muchos números y podía reemplazar una aparición equivocada).
+    
     Returns:
         Tupla (texto_con_placeholders, lista_de_entidades_protegidas)
     """
     protected = []
-    result = text
-    
-    # 1. Proteger URLs (http://, https://, www.)
-    url_pattern = r'(https?://[^\s]+|www\.[^\s]+)'
-    urls = re.findall(url_pattern, result)
-    for i, url in enumerate(urls):
-        placeholder = f"__URL_{i}__"
-        protected.append((placeholder, url))
-        result = result.replace(url, placeholder, 1)
-    
-    # 2. Proteger emails
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    emails = re.findall(email_pattern, result)
-    for i, email in enumerate(emails):
-        placeholder = f"__EMAIL_{i}__"
-        protected.append((placeholder, email))
-        result = result.replace(email, placeholder, 1)
-    
-    # 3. Proteger números (enteros, decimales, con separadores)
-    # Incluye formatos: 1000, 1.000, 1,000, 1.5, 1,5, etc.
-    number_pattern = r'\b\d+(?:[.,]\d+)*\b'
-    numbers = re.findall(number_pattern, result)
-    for i, number in enumerate(numbers):
-        placeholder = f"__NUM_{i}__"
-        protected.append((placeholder, number))
-        result = result.replace(number, placeholder, 1)
-    
-    return result, protected
+    counters = {"URL": 0, "EMAIL": 0, "NUM": 0}
+    
+    # Solo [n]...[/n] en pareja son marcadores inline (deben llegar intactos);
+    # un "[1]" suelto es texto del usuario y su número se protege como tal
+    inline_ids = set()
+    if "[" in text:
+        inline_ids = set(_INLINE_OPEN_PATTERN.findall(text)) & set(_INLINE_CLOSE_PATTERN.findall(text))
+    
+    def protect(kind: str, value: str) -> str:
+        """Registra la entidad y devuelve su placeholder __<TIPO>_<n>__."""
+        placeholder = f"__{kind}_{counters[kind]}__"
+        counters[kind] += 1
+        protected.append((placeholder, value))
+        return placeholder
+    
+    def replace_entity(match):
+        """Sustituye la entidad por su placeholder (salvo marcadores inline)."""
+        kind = match.lastgroup
+        value = match.group(0)
+        if kind == "TAG":
+            closing = value.startswith("[/")
+            number = value[2:-1] if closing else value[1:-1]
+            if number in inline_ids:
+                return value
+            return f"[{'/' if closing else ''}{protect('NUM', number)}]"
+        return protect(kind, value)
+    
+    return _ENTITY_PATTERN.sub(replace_entity, text), protected
 
 
 def _restore_entities(text: str, protected: List[Tuple[str, str]]) -> str:
     """
     Restaura las entidades protegidas reemplazando placeholders por valores originales.
     """
-    result = text
-    for placeholder, original in protected:
-        result = result.replace(placeholder, original)
-    return result
+    if not protected:
+        return text
+    originals = dict(protected)
+    return _PLACEHOLDER_PATTERN.sub(
+        lambda m: originals.get(m.group(0), m.group(0)),
+        text
+    )
 
 
-def apply_glossary_pre(text: str, glossary: Dict[str, str]) -> str:
+def apply_glossary_pre(
+    text: str,
+    glossary: Union[Dict[str, str], GlossaryMatcher]
+) -> str:
     """
     Aplica glosario en pre-procesamiento: marca términos ES para protegerlos.
     
@@ -75,53 +295,46 @@ def apply_glossary_pre(text: str, glossary: Dict[str, str]) -> str:
     
     Args:
         text: Texto en español original
-        glossary: Diccionario {término_es: término_da}
+        glossary: Diccionario {término_es: término_da} o GlossaryMatcher
+                  (compilar con compile_glossary para reutilizarlo entre segmentos)
         
     Returns:
         Texto con términos marcados como [[TERM::<término_es>]]
         
     Estrategia:
         1. Protege URLs, emails y números con placeholders
-        2. Ordena términos por longitud descendente (evitar matches parciales)
-        3. Búsqueda case-insensitive pero preserva case original
-        4. Usa word boundaries para evitar matches parciales
-        5. Restaura entidades protegidas
+        2. Una sola pasada con el matcher compilado: coincidencia más larga,
+           case-insensitive (preserva case original) y con word boundaries
+        3. Restaura entidades protegidas
     """
     if not glossary:
         return text
     
+    matcher = compile_glossary(glossary)
+    
     # Proteger URLs, emails, números
     text_protected, entities = _protect_entities(text)
     
-    result = text_protected
-    
-    # Ordenar términos por longitud (más largos primero) para evitar matches parciales
-    sorted_terms = sorted(glossary.keys(), key=len, reverse=True)
-    
-    for term_es in sorted_terms:
-        # Escapar caracteres especiales de regex
-        escaped_term = re.escape(term_es)
-        
-        # Pattern con word boundaries para match exacto (case-insensitive)
-        # Captura el término con su case original
-        pattern = r'\b(' + escaped_term + r')\b'
-        
-        # Reemplazar con marcador, preservando el case original
-        result = re.sub(
-            pattern,
-            r'[[TERM::\1]]',
-            result,
-            flags=re.IGNORECASE
-        )
+    result = matcher.mark_terms(text_protected)
     
     # Marcar también las entidades protegidas para que no se traduzcan
-    for placeholder, original in entities:
-        result = result.replace(placeholder, f"[[KEEP::{original}]]")
+    if entities:
+        originals = dict(entities)
+        result = _PLACEHOLDER_PATTERN.sub(
+            lambda m: (
+                f"[[KEEP::{originals[m.group(0)]}]]"
+                if m.group(0) in originals else m.group(0)
+            ),
+            result
+        )
     
     return result
 
 
-def apply_glossary_post(text: str, glossary: Dict[str, str]) -> str:
+def apply_glossary_post(
+    text: str,
+    glossary: Union[Dict[str, str], GlossaryMatcher]
+) -> str:
     """
     Aplica glosario en post-procesamiento: reemplaza marcadores por términos DA.
     
@@ -129,7 +342,7 @@ def apply_glossary_post(text: str, glossary: Dict[str, str]) -> str:
     
     Args:
         text: Texto traducido con marcadores [[TERM::...]] y [[KEEP::...]]
-        glossary: Diccionario {término_es: término_da}
+        glossary: Diccionario {término_es: término_da} o GlossaryMatcher
         
     Returns:
         Texto con marcadores reemplazados por términos daneses y entidades restauradas
@@ -140,38 +353,19 @@ def apply_glossary_post(text: str, glossary: Dict[str, str]) -> str:
         - Busca <algo> en el glosario (case-insensitive)
         - Reemplaza con el término danés correspondiente
     """
-    result = text
-    
-    # 1. Procesar marcadores TERM (términos del glosario)
-    if glossary:
-        # Crear diccionario case-insensitive para lookup
-        glossary_lower = {k.lower(): v for k, v in glossary.items()}
-        
-        # Pattern para encontrar todos los marcadores TERM
-        term_pattern = r'\[\[TERM::(.*?)\]\]'
-        
-        def replace_term_marker(match):
-            """Función de reemplazo para cada marcador TERM encontrado."""
-            original_term = match.group(1)
-            term_lower = original_term.lower()
-            
-            # Buscar término en glosario (case-insensitive)
-            if term_lower in glossary_lower:
-                return glossary_lower[term_lower]
-            
-            # Si no se encuentra, devolver sin marcador (fallback)
-            return original_term
-        
-        result = re.sub(term_pattern, replace_term_marker, result)
-    
-    # 2. Procesar marcadores KEEP (URLs, emails, números)
-    keep_pattern = r'\[\[KEEP::(.*?)\]\]'
+    # Diccionario case-insensitive para lookup (precalculado en el matcher)
+    glossary_lower = compile_glossary(glossary).lookup if glossary else {}
     
-    def replace_keep_marker(match):
-        """Función de reemplazo para cada marcador KEEP encontrado."""
-        return match.group(1)  # Restaurar valor original sin traducir
+    def replace_marker(match):
+        """Reemplaza un marcador TERM (término DA) o KEEP (valor original)."""
+        kind, original = match.group(1), match.group(2)
+        if kind == "TERM":
+            # Si no está en el glosario, devolver sin marcador (fallback)
+            return glossary_lower.get(original.lower(), original)
+        return original  # KEEP: restaurar valor original sin traducir
     
-    result = re.sub(keep_pattern, replace_keep_marker, result)
+    # 1-2. Marcadores TERM y KEEP en una sola sustitución
+    result = _MARKER_PATTERN.sub(replace_marker, text)
     
     # 3. Limpiar cualquier marcador residual (seguridad)
     result = clean_glossary_markers(result)
@@ -192,9 +386,11 @@ def clean_glossary_markers(text: str) -> str:
     Uso:
         Función de seguridad para casos donde el post-procesamiento falla.
     """
-    # Limpiar marcadores TERM
-    text = re.sub(r'\[\[TERM::(.*?)\]\]', r'\1', text)
-    # Limpiar marcadores KEEP
-    text = re.sub(r'\[\[KEEP::(.*?)\]\]', r'\1', text)
+    # Una sustitución combinada TERM/KEEP; solo se repite si había marcadores
+    # anidados (ej: [[KEEP::[[TERM::x]]]])
+    while "[[" in text:
+        text, count = _MARKER_PATTERN.subn(r'\2', text)
+        if not count:
+            break
     return text
 
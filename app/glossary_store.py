@@ -0,0 +1,200 @@
+"""
+Glosarios con nombre registrados en el servidor.
+
+Permite registrar un glosario una sola vez (PUT /glossaries/{name}) y
+referenciarlo por nombre en las peticiones, en lugar de enviar el diccionario
+completo en cada una. Cada glosario:
+- Se persiste localmente como JSON en settings.GLOSSARY_DIR
+- Se compila a GlossaryMatcher al registrarse (no por petición)
+- Tiene una versión (hash del contenido) que entra en la clave del caché
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from typing import Dict, List, Optional
+
+from app.settings import settings
+from app.glossary import GlossaryMatcher, compile_glossary
+
+logger = logging.getLogger(__name__)
+
+# Nombres válidos: también son nombres de fichero (usar siempre fullmatch)
+GLOSSARY_NAME = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+
+def glossary_version(terms: Dict[str, str]) -> str:
+    """
+    Calcula la versión de un glosario a partir de su contenido.
+
+    Args:
+        terms: Diccionario {término_es: término_da}
+
+    Returns:
+        Hash hexadecimal (16 caracteres), estable ante el orden de las claves
+    """
+    canonical = json.dumps(terms, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+class NamedGlossary:
+    """Glosario registrado: términos, versión y matcher compilado."""
+
+    def __init__(self, name: str, terms: Dict[str, str]):
+        """
+        Inicializa y compila el glosario.
+
+        Args:
+            name: Nombre del glosario
+            terms: Diccionario {término_es: término_da}
+        """
+        self.name = name
+        self.terms = dict(terms)
+        self.version = glossary_version(self.terms)
+        self.matcher: GlossaryMatcher = compile_glossary(self.terms)
+
+    def describe(self) -> dict:
+        """Metadatos del glosario (sin términos)."""
+        return {
+            "name": self.name,
+            "version": self.version,
+            "size": len(self.terms)
+        }
+
+
+class GlossaryStore:
+    """
+    Registro thread-safe de glosarios con nombre, persistido en disco.
+
+    Un fichero <directorio>/<nombre>.json por glosario.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Inicializa el registro (vacío hasta llamar a load()).
+
+        Args:
+            directory: Directorio de persistencia
+        """
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._glossaries: Dict[str, NamedGlossary] = {}
+
+    def _path(self, name: str) -> str:
+        """Ruta del fichero de un glosario."""
+        return os.path.join(self.directory, f"{name}.json")
+
+    @staticmethod
+    def validate_name(name: str):
+        """
+        Valida el nombre de un glosario.
+
+        Raises:
+            ValueError: Si el nombre no es válido
+        """
+        if not GLOSSARY_NAME.fullmatch(name):
+            raise ValueError(
+                f"Nombre de glosario inválido: '{name}'. "
+                "Usa 1-64 caracteres: letras, números, '_' o '-'"
+            )
+
+    def load(self) -> int:
+        """
+        Carga (o recarga) todos los glosarios persistidos.
+
+        Los ficheros ilegibles se ignoran con un aviso.
+
+        Returns:
+            Número de glosarios cargados
+        """
+        loaded = {}
+        if os.path.isdir(self.directory):
+            for filename in sorted(os.listdir(self.directory)):
+                name, ext = os.path.splitext(filename)
+                if ext != ".json" or not GLOSSARY_NAME.fullmatch(name):
+                    continue
+                try:
+                    with open(self._path(name), encoding="utf-8") as f:
+                        terms = json.load(f)["terms"]
+                    loaded[name] = NamedGlossary(name, terms)
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    logger.warning(f"Glosario '{filename}' ignorado: {e}")
+
+        with self._lock:
+            self._glossaries = loaded
+        return len(loaded)
+
+    def put(self, name: str, terms: Dict[str, str]) -> NamedGlossary:
+        """
+        Registra (o reemplaza) un glosario y lo persiste.
+
+        Args:
+            name: Nombre del glosario
+            terms: Diccionario {término_es: término_da}
+
+        Returns:
+            Glosario registrado
+
+        Raises:
+            ValueError: Si el nombre no es válido
+        """
+        self.validate_name(name)
+        glossary = NamedGlossary(name, terms)
+
+        os.makedirs(self.directory, exist_ok=True)
+        # Temporal único por escritura: PUT concurrentes del mismo glosario
+        # no comparten fichero temporal
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=self.directory,
+            prefix=f".{name}.", suffix=".tmp", delete=False
+        ) as f:
+            json.dump(
+                {"name": name, "version": glossary.version, "terms": glossary.terms},
+                f, ensure_ascii=False, indent=2, sort_keys=True
+            )
+        # Reemplazo atómico: nunca queda un fichero a medio escribir
+        try:
+            os.replace(f.name, self._path(name))
+        except OSError:
+            os.unlink(f.name)
+            raise
+
+        with self._lock:
+            self._glossaries[name] = glossary
+        return glossary
+
+    def get(self, name: str) -> Optional[NamedGlossary]:
+        """Retorna el glosario registrado con ese nombre (None si no existe)."""
+        with self._lock:
+            return self._glossaries.get(name)
+
+    def delete(self, name: str) -> bool:
+        """
+        Elimina un glosario del registro y del disco.
+
+        Returns:
+            True si existía
+        """
+        with self._lock:
+            existed = self._glossaries.pop(name, None) is not None
+        if existed:
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                pass
+        return existed
+
+    def list(self) -> List[dict]:
+        """Metadatos de todos los glosarios registrados, ordenados por nombre."""
+        with self._lock:
+            return [
+                self._glossaries[name].describe()
+                for name in sorted(self._glossaries)
+            ]
+
+
+# Instancia global de glosarios con nombre
+glossary_store = GlossaryStore(settings.GLOSSARY_DIR)
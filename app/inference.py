@@ -11,11 +11,16 @@ from typing import List, Optional
 from app.settings import settings
 from app.startup import model_manager
 from app.cache import translation_cache
-from app.postprocess_da import postprocess_da
-from app.postprocess_es import postprocess_es
+from app.metrics import metrics
+from app.singleflight import inflight_translations
+from app.segment import join_spans, split_sentences, split_text_by_tokens, split_text_spans
+from app.glossary import markers_to_sentinels, reinsert_missing_markers, sentinels_to_markers
+from app.rules import Rule, RuleSet
+from app.postprocess_da import postprocess_da_batch
+from app.postprocess_es import postprocess_es_batch
 from app.utils_text import (
     normalize_preserving_newlines,
-    translate_preserving_structure
+    translate_blocks_preserving_structure
 )
 
 
@@ -26,7 +31,6 @@ logger = logging.getLogger(__name__)
 
 # Nota: load_model() ahora está en ModelManager (app/startup.py)
 
-
 def _derive_max_new_tokens(input_lengths: List[int]) -> int:
     """
     Calcula max_new_tokens generosamente para evitar truncado.
@@ -59,6 +63,79 @@ def _derive_max_new_tokens(input_lengths: List[int]) -> int:
     return max(1024, estimated)
 
 
+def _replica_batch_size(translator, n_examples: int) -> int:
+    """
+    max_batch_size para repartir un batch entre las réplicas CT2 libres.
+    
+    CTranslate2 divide un batch mayor que max_batch_size en sub-batches
+    (ordenados por longitud) y los despacha a sus réplicas (inter_threads) en
+    paralelo. Con el servidor ocioso, un documento largo usa así todas las
+    réplicas; bajo carga solo se reparte entre las que quedan libres, y si no
+    hay ninguna libre el batch va entero (0 = sin división) a la cola global.
+    
+    Args:
+        translator: ctranslate2.Translator
+        n_examples: Número de ejemplos del batch
+        
+    Returns:
+        Tamaño máximo de sub-batch, o 0 para no dividir
+    """
+    if not settings.SPLIT_BATCH_ACROSS_REPLICAS or n_examples < 2:
+        return 0
+    
+    replicas = getattr(translator, "num_translators", 1)
+    busy = getattr(translator, "num_active_batches", 0) + getattr(translator, "num_queued_batches", 0)
+    free = min(replicas - busy, n_examples)
+    if free < 2:
+        return 0
+    
+    metrics.incr("replica_split_batches")
+    return -(-n_examples // free)  # ceil(n / libres)
+
+
+def _resolve_max_new_tokens(
+    max_new_tokens: Optional[int],
+    input_lengths: List[int],
+    strict_max: bool
+) -> int:
+    """
+    Calcula/eleva max_new_tokens según la lógica adaptativa + elevación server-side.
+    
+    Args:
+        max_new_tokens: Valor del cliente (None = auto)
+        input_lengths: Longitudes en tokens de las entradas del batch
+        strict_max: Si True, respetar exactamente el valor del cliente
+        
+    Returns:
+        max_new_tokens a usar
+    """
+    derived = _derive_max_new_tokens(input_lengths)
+    
+    # Debug logging mejorado para investigar truncado
+    logger.info(f"🔍 INFERENCE DEBUG - max_new_tokens recibido: {max_new_tokens}")
+    logger.info(f"🔍 INFERENCE DEBUG - input_lengths: {input_lengths}")
+    logger.info(f"🔍 INFERENCE DEBUG - derived: {derived}")
+    logger.info(f"🔍 INFERENCE DEBUG - strict_max: {strict_max}")
+    
+    if max_new_tokens is None:
+        # Cliente no especificó: usar valor extremadamente alto para evitar truncado
+        max_new_tokens = max(4096, derived)  # Mínimo 4096 tokens
+        logger.info(f"🔄 max_new_tokens auto-calculado (EXTREMO): {max_new_tokens}")
+    elif strict_max:
+        # Respetar exactamente el valor del cliente
+        logger.info(f"🔒 max_new_tokens (strict): {max_new_tokens}")
+    else:
+        # SIEMPRE elevar a valores extremadamente altos para evitar truncado
+        original = max_new_tokens
+        max_new_tokens = max(max_new_tokens, max(4096, derived))  # Mínimo 4096 siempre
+        if max_new_tokens != original:
+            logger.info(f"📈 max_new_tokens elevado automáticamente: {original} → {max_new_tokens} (extremo)")
+    
+    # NO aplicar límites artificiales - permitir traducción completa
+    logger.info(f"🚀 FINAL - Usando max_new_tokens: {max_new_tokens}")
+    return max_new_tokens
+
+
 def _needs_continuation(tokens: List[str], max_tokens: int) -> bool:
     """
     Determina si una traducción necesita continuación automática.
@@ -123,7 +200,9 @@ def translate_batch(
     use_cache: bool = True,
     formal: bool = False,
     strict_max: bool = False,
-    preserve_newlines: bool = True
+    preserve_newlines: bool = True,
+    cache_namespace: str = "",
+    ruleset=None
 ) -> List[str]:
     """
     Traduce un batch de textos entre español y danés (bidireccional).
@@ -131,6 +210,11 @@ def translate_batch(
     Incluye caché LRU, post-procesado, validación de salida y continuación automática.
     Soporta ES→DA y DA→ES.
     
+    Con SENTENCE_CACHE activo (y use_cache=True), los párrafos largos se
+    traducen oración a oración: cada oración se busca en el caché y solo las
+    no cacheadas llegan al modelo, de modo que textos casi idénticos
+    (plantillas) reutilizan la mayoría de sus oraciones.
+    
     Args:
         texts: Lista de textos a traducir
         direction: Dirección de traducción ("es-da" o "da-es")
@@ -140,6 +224,10 @@ def translate_batch(
         formal: Si True, aplica estilo formal (solo para salida danesa)
         strict_max: Si True, NO elevar max_new_tokens ni hacer continuación automática
         preserve_newlines: Si True, preserva todos los saltos de línea del original
+        cache_namespace: Espacio de nombres de la clave de caché (ej: versión del
+                         glosario), para no mezclar traducciones de contextos distintos
+        ruleset: TenantRuleSet opcional con reglas de post-procesado del cliente
+                 (su versión debe formar parte de cache_namespace)
         
     Returns:
         Lista de traducciones post-procesadas
@@ -149,6 +237,73 @@ def translate_batch(
         ValueError: Si direction es inválida
         Exception: Si hay error en la traducción
     """
+    options = dict(
+        direction=direction,
+        max_new_tokens=max_new_tokens,
+        beam_size=beam_size,
+        use_cache=use_cache,
+        formal=formal,
+        strict_max=strict_max,
+        preserve_newlines=preserve_newlines,
+        cache_namespace=cache_namespace,
+        ruleset=ruleset
+    )
+    
+    if not (use_cache and settings.SENTENCE_CACHE):
+        return _translate_segments(texts, **options)
+    
+    # Expandir párrafos largos en oraciones (unidades de caché)
+    units = []
+    layout = []  # Por texto: lista de (índice_unidad, separador)
+    for text in texts:
+        sentences = (
+            split_sentences(text)
+            if len(text) >= settings.SENTENCE_CACHE_MIN_CHARS else []
+        )
+        if len(sentences) < 2:
+            layout.append([(len(units), "")])
+            units.append(text)
+            continue
+        
+        # Los espacios iniciales/finales quedan fuera de las oraciones
+        entry = []
+        for sentence, separator in sentences:
+            if sentence.strip():
+                entry.append((len(units), separator))
+                units.append(sentence)
+        layout.append(entry)
+    
+    if len(units) > len(texts):
+        metrics.incr("sentence_cache_units", len(units))
+    
+    unit_translations = _translate_segments(units, **options)
+    
+    return [
+        "".join(unit_translations[idx] + separator for idx, separator in entry)
+        for entry in layout
+    ]
+
+
+def _translate_segments(
+    texts: List[str],
+    direction: str = "es-da",
+    max_new_tokens: Optional[int] = None,
+    beam_size: Optional[int] = None,
+    use_cache: bool = True,
+    formal: bool = False,
+    strict_max: bool = False,
+    preserve_newlines: bool = True,
+    cache_namespace: str = "",
+    ruleset=None
+) -> List[str]:
+    """
+    Traduce segmentos completos (sin expansión a oraciones).
+    
+    Núcleo de translate_batch: caché por segmento, single-flight, dedup,
+    tokenización, decodificación con CTranslate2 y post-procesado.
+    
+    Args y Returns: ver translate_batch.
+    """
     # Validar dirección
     if direction not in ["es-da", "da-es"]:
         raise ValueError(f"Dirección inválida: {direction}. Usa 'es-da' o 'da-es'")
@@ -161,7 +316,9 @@ def translate_batch(
         )
     
     translator = model_manager.translator
-    tokenizer = model_manager.tokenizer
+    # Vocabulario de salida restringido: el vmap se indexa por token de entrada,
+    # así que el código de idioma origen selecciona las piezas del idioma destino
+    use_vmap = model_manager.use_vmap
     
     if not texts:
         return []
@@ -172,50 +329,59 @@ def translate_batch(
     
     # max_new_tokens se calculará después de tokenizar (necesitamos input_lengths)
     
-    # Configurar idiomas según dirección
-    if direction == "es-da":
-        src_lang = "spa_Latn"
-        tgt_lang = "dan_Latn"
-    else:  # da-es
-        src_lang = "dan_Latn"
-        tgt_lang = "spa_Latn"
-    
-    # Obtener token BOS del idioma target
-    if not hasattr(tokenizer, 'lang_code_to_id'):
-        raise RuntimeError("Tokenizador no soporta lang_code_to_id (no es NLLB)")
-    
-    tgt_lang_id = tokenizer.lang_code_to_id.get(tgt_lang)
-    if tgt_lang_id is None:
-        raise RuntimeError(f"No se encontró token para idioma {tgt_lang}")
+    # Tokenización inmutable de la dirección (idioma source fijo, sin lock)
+    direction_tokenizer = model_manager.direction_tokenizers.get(direction)
+    if direction_tokenizer is None:
+        raise RuntimeError(f"Tokenizador no configurado para la dirección {direction}")
     
-    tgt_bos_tok = tokenizer.convert_ids_to_tokens(tgt_lang_id)
+    tgt_lang = direction_tokenizer.tgt_lang
+    tgt_bos_tok = direction_tokenizer.tgt_bos_tok
     
     # Separar textos en caché vs no caché (con dirección)
     translations = [None] * len(texts)
     texts_to_translate = []
     indices_to_translate = []
     
+    # Single-flight: claves que este hilo calcula (líder) y esperas de
+    # claves que ya está calculando otra petición concurrente
+    leader_keys = set()
+    pending_waits = []  # (índice, future)
+    
     if use_cache:
         for i, text in enumerate(texts):
-            # Incluir dirección en la clave del caché
-            cache_key = f"{direction}||{text}"
+            # Incluir dirección (y namespace) en la clave del caché
+            cache_key = _cache_key(direction, cache_namespace, text)
             cached = translation_cache.get(cache_key)
             if cached is not None:
                 translations[i] = cached
-            else:
-                texts_to_translate.append(text)
-                indices_to_translate.append(i)
+                continue
+            
+            flight_key = translation_cache.key(cache_key)
+            if flight_key not in leader_keys:
+                is_leader, future = inflight_translations.claim(flight_key)
+                if not is_leader:
+                    pending_waits.append((i, future))
+                    continue
+                leader_keys.add(flight_key)
+            
+            texts_to_translate.append(text)
+            indices_to_translate.append(i)
     else:
         texts_to_translate = texts
         indices_to_translate = list(range(len(texts)))
     
-    # Si no hay nada que traducir (todo en caché), retornar
+    if pending_waits:
+        metrics.incr("singleflight_coalesced", len(pending_waits))
+        logger.info(f"Single-flight: {len(pending_waits)} segmento(s) en curso en otra petición")
+    
+    # Si no hay nada que traducir (todo en caché o en curso), retornar
     if not texts_to_translate:
-        logger.info(f"Cache: 100% hits ({len(texts)} textos)")
-        return translations
+        if not pending_waits:
+            logger.info(f"Cache: 100% hits ({len(texts)} textos)")
+        return _await_inflight(translations, pending_waits)
     
     if use_cache:
-        logger.info(f"Cache: {len(translations) - len(texts_to_translate)} hits, {len(texts_to_translate)} misses")
+        logger.info(f"Cache: {len(translations) - len(texts_to_translate) - len(pending_waits)} hits, {len(texts_to_translate)} misses")
     
     try:
         # Pre-procesar textos: normalizar espacios
@@ -224,66 +390,32 @@ def translate_batch(
             for text in texts_to_translate
         ]
         
-        # Configurar idioma source en el tokenizador
-        if hasattr(tokenizer, 'src_lang'):
-            tokenizer.src_lang = src_lang
-            logger.debug(f"Idioma source configurado: {src_lang}")
-        
-        # Tokenizar textos de entrada SIN TORCH (solo listas de IDs)
-        # NLLB espera source language token al inicio
-        # El tokenizador ya añade este token automáticamente si src_lang está configurado
-        # Usar límite muy alto para evitar truncado de entrada
-        safe_input_limit = max(8192, settings.MAX_INPUT_TOKENS)
-        logger.info(f"🔧 Tokenizando con límite de entrada: {safe_input_limit}")
-        
-        encoded = tokenizer(
-            texts_normalized,
-            padding=True,
-            truncation=True,  # Mantener pero con límite muy alto
-            max_length=safe_input_limit,
-            return_attention_mask=False,
-            return_token_type_ids=False
-        )
-        
-        # input_ids ya es una lista de listas (sin tensores)
-        input_ids_list = encoded["input_ids"]
-        
-        # Calcular/elevar max_new_tokens según lógica adaptativa + elevación server-side
-        input_lengths = [len(ids) for ids in input_ids_list]
-        derived = _derive_max_new_tokens(input_lengths)
-        
-        # Debug logging mejorado para investigar truncado
-        logger.info(f"🔍 INFERENCE DEBUG - max_new_tokens recibido: {max_new_tokens}")
-        logger.info(f"🔍 INFERENCE DEBUG - input_lengths: {input_lengths}")
-        logger.info(f"🔍 INFERENCE DEBUG - derived: {derived}")
-        logger.info(f"🔍 INFERENCE DEBUG - strict_max: {strict_max}")
+        # Deduplicar entradas idénticas (tras normalizar) dentro del batch:
+        # cada texto único se decodifica una sola vez y se reparte a sus posiciones
+        unique_positions = {}
+        source_texts = []  # Representante original de cada texto único
+        fanout = []        # Posición del batch -> índice del texto único
+        for text, normalized in zip(texts_to_translate, texts_normalized):
+            if normalized not in unique_positions:
+                unique_positions[normalized] = len(source_texts)
+                source_texts.append(text)
+            fanout.append(unique_positions[normalized])
         
-        if max_new_tokens is None:
-            # Cliente no especificó: usar valor extremadamente alto para evitar truncado
-            max_new_tokens = max(4096, derived)  # Mínimo 4096 tokens
-            logger.info(f"🔄 max_new_tokens auto-calculado (EXTREMO): {max_new_tokens}")
-        else:
-            # Cliente especificó un valor
-            if strict_max:
-                # Respetar exactamente el valor del cliente
-                logger.info(f"🔒 max_new_tokens (strict): {max_new_tokens}")
-            else:
-                # SIEMPRE elevar a valores extremadamente altos para evitar truncado
-                original = max_new_tokens
-                max_new_tokens = max(max_new_tokens, max(4096, derived))  # Mínimo 4096 siempre
-                if max_new_tokens != original:
-                    logger.info(f"📈 max_new_tokens elevado automáticamente: {original} → {max_new_tokens} (extremo)")
+        saved_decodes = len(texts_normalized) - len(source_texts)
+        if saved_decodes:
+            metrics.incr("dedup_saved_decodes", saved_decodes)
+            logger.info(f"Dedup: {saved_decodes} segmento(s) repetidos en el batch")
         
-        # NO aplicar límites artificiales - permitir traducción completa
-        # max_new_tokens ya está calculado correctamente arriba
+        texts_normalized = list(unique_positions.keys())
         
-        logger.info(f"🚀 FINAL - Usando max_new_tokens: {max_new_tokens}")
-        
-        # Convertir IDs a tokens para CTranslate2
-        source_tokens = [
-            tokenizer.convert_ids_to_tokens(ids)
-            for ids in input_ids_list
-        ]
+        # Marcadores de glosario → centinelas compactos (§n) para el modelo;
+        # se restauran tras decodificar (los textos con marcadores se guardan
+        # para retraducir si el modelo pierde algún centinela)
+        marked_texts = list(texts_normalized)
+        sentinel_markers = []
+        for i, normalized in enumerate(texts_normalized):
+            texts_normalized[i], markers = markers_to_sentinels(normalized)
+            sentinel_markers.append(markers)
         
         # Preparar target_prefix con token de idioma destino
         # NLLB requiere el token del idioma destino al inicio de la generación
@@ -293,131 +425,260 @@ def translate_batch(
                 "Verifica que el modelo NLLB esté correctamente cargado."
             )
         
-        target_prefix = [[tgt_bos_tok]] * len(texts_to_translate)
-        
-        # Traducir con CTranslate2 usando valores muy altos para evitar truncado
-        # Asegurar que nunca se limita artificialmente
-        safe_max_tokens = max(8192, max_new_tokens)  # Mínimo 8192 tokens
-        logger.info(f"🔧 Usando max_decoding_length: {safe_max_tokens}")
-        
-        results = translator.translate_batch(
-            source_tokens,
-            target_prefix=target_prefix,
-            beam_size=beam_size,
-            max_decoding_length=safe_max_tokens,
-            return_scores=False,
-            repetition_penalty=1.2,  # Evitar repeticiones
-            no_repeat_ngram_size=3   # Evitar repetición de 3-gramas
-        )
+        # Usar límite muy alto para evitar truncado de entrada
+        safe_input_limit = max(8192, settings.MAX_INPUT_TOKENS)
         
-        # Extraer hipótesis (primera de cada beam)
-        hypotheses = [result.hypotheses[0] for result in results]
+        def submit(start: int, end: int) -> dict:
+            """Tokeniza un chunk y lo envía a CTranslate2 sin esperar (asynchronous)."""
+            chunk_texts = texts_normalized[start:end]
+            
+            # Tokenizar textos de entrada SIN TORCH (listas de tokens)
+            # NLLB espera source language token al inicio: lo añade el tokenizador
+            # de la dirección, sin tocar el src_lang del tokenizador compartido
+            source_tokens = direction_tokenizer.encode_batch(chunk_texts, safe_input_limit)
+            
+            # Calcular/elevar max_new_tokens según lógica adaptativa + elevación server-side
+            input_lengths = [len(tokens) for tokens in source_tokens]
+            chunk_max_new_tokens = _resolve_max_new_tokens(max_new_tokens, input_lengths, strict_max)
+            
+            # Traducir con CTranslate2 usando valores muy altos para evitar truncado
+            # Asegurar que nunca se limita artificialmente
+            safe_max_tokens = max(8192, chunk_max_new_tokens)  # Mínimo 8192 tokens
+            logger.info(f"🔧 Chunk {start}-{end}: max_decoding_length={safe_max_tokens}")
+            
+            async_results = translator.translate_batch(
+                source_tokens,
+                target_prefix=[[tgt_bos_tok]] * len(chunk_texts),
+                max_batch_size=_replica_batch_size(translator, len(source_tokens)),
+                beam_size=beam_size,
+                max_decoding_length=safe_max_tokens,
+                return_scores=False,
+                repetition_penalty=1.2,  # Evitar repeticiones
+                no_repeat_ngram_size=3,  # Evitar repetición de 3-gramas
+                use_vmap=use_vmap,
+                asynchronous=True
+            )
+            return {
+                "start": start,
+                "end": end,
+                "source_tokens": source_tokens,
+                "max_new_tokens": chunk_max_new_tokens,
+                "safe_max_tokens": safe_max_tokens,
+                "async_results": async_results,
+            }
         
-        # Continuación automática SIEMPRE para textos largos (sin límites)
-        if not strict_max:
-            continuation_indices = []
-            for i, tokens in enumerate(hypotheses):
-                # LÓGICA SIMPLE: Si el texto original era largo, hacer continuación SIEMPRE
-                original_text = texts_to_translate[i] if i < len(texts_to_translate) else ""
-                is_long_text = len(original_text) > 500  # Texto de más de 500 chars
-                
-                if is_long_text or _needs_continuation(tokens, safe_max_tokens):
-                    continuation_indices.append(i)
-                    logger.info(f"Item {i}: candidato para continuación (long_text={is_long_text}, needs_cont={_needs_continuation(tokens, safe_max_tokens)})")
+        def finish(chunk: dict) -> List[str]:
+            """Espera un chunk y lo detokeniza/post-procesa (mientras decodifica el siguiente)."""
+            start = chunk["start"]
+            source_tokens = chunk["source_tokens"]
+            safe_max_tokens = chunk["safe_max_tokens"]
             
-            if continuation_indices:
-                logger.info(f"🔄 Continuación automática para {len(continuation_indices)} item(s)")
-                
-                for idx in continuation_indices:
-                    # Target prefix = tokens ya generados
-                    prefix_tokens = hypotheses[idx]
-                    logger.info(f"Continuando item {idx}: tokens actuales={len(prefix_tokens)}")
-                    
-                    # EXTREMADAMENTE generoso para continuación - sin límites artificiales
-                    new_max = 16384  # Valor fijo muy alto
-                    
-                    # Segunda pasada con los tokens previos como prefix
-                    continuation_result = translator.translate_batch(
-                        [source_tokens[idx]],
-                        target_prefix=[[tgt_bos_tok] + prefix_tokens],  # incluir BOS + tokens previos
-                        beam_size=beam_size,
-                        max_decoding_length=new_max,  # Sin restar - usar valor alto completo
-                        return_scores=False,
-                        repetition_penalty=1.2,
-                        no_repeat_ngram_size=3
-                    )
-                    
-                    # Obtener tokens de continuación
-                    continuation_tokens = continuation_result[0].hypotheses[0]
+            # Extraer hipótesis (primera de cada beam)
+            hypotheses = [result.result().hypotheses[0] for result in chunk["async_results"]]
+            
+            # Continuación automática SIEMPRE para textos largos (sin límites)
+            if not strict_max:
+                continuation_indices = []
+                for i, tokens in enumerate(hypotheses):
+                    # LÓGICA SIMPLE: Si el texto original era largo, hacer continuación SIEMPRE
+                    original_text = source_texts[start + i]
+                    is_long_text = len(original_text) > 500  # Texto de más de 500 chars
                     
-                    # Concatenar (evitar duplicar el primer token si el decoder lo repite)
-                    if continuation_tokens and continuation_tokens[0] == prefix_tokens[-1]:
-                        continuation_tokens = continuation_tokens[1:]
+                    if is_long_text or _needs_continuation(tokens, safe_max_tokens):
+                        continuation_indices.append(i)
+                        logger.info(f"Item {start + i}: candidato para continuación (long_text={is_long_text}, needs_cont={_needs_continuation(tokens, safe_max_tokens)})")
+                
+                if continuation_indices:
+                    logger.info(f"🔄 Continuación automática para {len(continuation_indices)} item(s)")
                     
-                    hypotheses[idx] = prefix_tokens + continuation_tokens
-                    logger.info(f"Item {idx}: continuación agregó {len(continuation_tokens)} tokens. Total: {len(hypotheses[idx])}")
-        
-        # Convertir tokens a texto y post-procesar
-        new_translations = []
-        for i, tokens in enumerate(hypotheses):
-            # Convertir tokens a IDs
-            token_ids = tokenizer.convert_tokens_to_ids(tokens)
+                    for idx in continuation_indices:
+                        # Target prefix = tokens ya generados
+                        prefix_tokens = hypotheses[idx]
+                        logger.info(f"Continuando item {start + idx}: tokens actuales={len(prefix_tokens)}")
+                        
+                        # EXTREMADAMENTE generoso para continuación - sin límites artificiales
+                        new_max = 16384  # Valor fijo muy alto
+                        
+                        # Segunda pasada con los tokens previos como prefix
+                        continuation_result = translator.translate_batch(
+                            [source_tokens[idx]],
+                            target_prefix=[[tgt_bos_tok] + prefix_tokens],  # incluir BOS + tokens previos
+                            beam_size=beam_size,
+                            max_decoding_length=new_max,  # Sin restar - usar valor alto completo
+                            return_scores=False,
+                            repetition_penalty=1.2,
+                            no_repeat_ngram_size=3,
+                            use_vmap=use_vmap
+                        )
+                        
+                        # Obtener tokens de continuación
+                        continuation_tokens = continuation_result[0].hypotheses[0]
+                        
+                        # Concatenar (evitar duplicar el primer token si el decoder lo repite)
+                        if continuation_tokens and continuation_tokens[0] == prefix_tokens[-1]:
+                            continuation_tokens = continuation_tokens[1:]
+                        
+                        hypotheses[idx] = prefix_tokens + continuation_tokens
+                        logger.info(f"Item {start + idx}: continuación agregó {len(continuation_tokens)} tokens. Total: {len(hypotheses[idx])}")
             
-            # Decodificar a texto
-            text = tokenizer.decode(
-                token_ids,
-                skip_special_tokens=True,
-                clean_up_tokenization_spaces=True
-            )
+            # Convertir tokens a texto y limpiar artefactos (chunk completo)
+            decoded = direction_tokenizer.decode_batch(hypotheses)
+            decoded = CLEAN_TRANSLATION.apply_batch(decoded)
+            
+            # Restaurar marcadores de glosario desde los centinelas
+            lossy = []
+            for i, markers in enumerate(sentinel_markers[start:chunk["end"]]):
+                decoded[i], missing = sentinels_to_markers(decoded[i], markers)
+                if missing:
+                    metrics.incr("sentinels_missing", missing)
+                    logger.warning(
+                        f"Segmento {start + i + 1}: {missing} de {len(markers)} "
+                        f"centinela(s) de glosario no aparecen en la traducción; "
+                        f"se retraduce con los marcadores originales"
+                    )
+                    lossy.append(i)
             
-            # Post-procesamiento: limpiar artefactos
-            text = _clean_translation(text)
+            # Sin centinela la entidad/término desaparecería: retraducir esos
+            # segmentos con los marcadores [[KEEP::…]]/[[TERM::…]] completos y,
+            # si aun así falta alguno, añadirlo al final
+            if lossy:
+                retry_tokens = direction_tokenizer.encode_batch(
+                    [marked_texts[start + i] for i in lossy], safe_input_limit
+                )
+                retry_results = translator.translate_batch(
+                    retry_tokens,
+                    target_prefix=[[tgt_bos_tok]] * len(retry_tokens),
+                    beam_size=beam_size,
+                    max_decoding_length=chunk["safe_max_tokens"],
+                    return_scores=False,
+                    repetition_penalty=1.2,
+                    no_repeat_ngram_size=3,
+                    use_vmap=use_vmap
+                )
+                retry_texts = CLEAN_TRANSLATION.apply_batch(
+                    direction_tokenizer.decode_batch([r.hypotheses[0] for r in retry_results])
+                )
+                for i, text in zip(lossy, retry_texts):
+                    decoded[i], reinserted = reinsert_missing_markers(text, sentinel_markers[start + i])
+                    if reinserted:
+                        metrics.incr("markers_reinserted", reinserted)
             
-            # Validación: verificar que la salida es alfabeto latino
-            if not is_mostly_latin(text):
+            # Validación: verificar que la salida es alfabeto latino (chunk completo)
+            threshold = latin_threshold(direction)
+            chunk_translations = decoded
+            retried = set()  # Índices ya post-procesados por el reintento
+            for i, ratio in enumerate(latin_ratios(decoded)):
+                if ratio >= threshold:
+                    continue
+                
                 logger.warning(
-                    f"Salida con caracteres no latinos detectada (segmento {i+1}). "
-                    f"Reintentando con beam_size={min(beam_size + 1, 5)}..."
+                    f"Salida con caracteres no latinos detectada (segmento {start + i + 1}, "
+                    f"{ratio:.2%} latinos). Reintentando con beam_size={min(beam_size + 1, 5)}..."
                 )
                 # Reintentar UNA VEZ con beam_size mayor
                 if beam_size < 5:
                     retry_result = translate_batch(
-                        [texts_to_translate[i]], 
-                        max_new_tokens=max_new_tokens, 
+                        [source_texts[start + i]], 
+                        direction=direction,
+                        max_new_tokens=chunk["max_new_tokens"], 
                         beam_size=min(beam_size + 1, 5),
                         use_cache=False,  # No usar caché en reintentos
-                        formal=formal
+                        formal=formal,
+                        strict_max=strict_max,
+                        preserve_newlines=preserve_newlines,
+                        cache_namespace=cache_namespace,
+                        ruleset=ruleset
                     )
-                    text = retry_result[0]
+                    chunk_translations[i] = retry_result[0]
+                    retried.add(i)
                 else:
                     # Error controlado si persiste
                     raise ValueError(
                         f"No se pudo obtener salida en alfabeto latino. "
-                        f"Texto original: {texts_to_translate[i][:100]}..."
+                        f"Texto original: {source_texts[start + i][:100]}..."
                     )
             
-            # Post-procesado según idioma destino
+            # Post-procesado según idioma destino (tablas de reglas sobre el chunk)
             if direction == "es-da":
-                text = postprocess_da(text, formal=formal)
+                chunk_translations = postprocess_da_batch(chunk_translations, formal=formal, skip=retried)
             else:  # da-es
-                text = postprocess_es(text)
+                chunk_translations = postprocess_es_batch(chunk_translations, skip=retried)
             
-            new_translations.append(text)
+            # Reglas del cliente (una pasada por texto)
+            if ruleset is not None:
+                chunk_translations = ruleset.apply_batch(chunk_translations, direction, skip=retried)
             
-            # Guardar en caché (con dirección)
-            if use_cache:
-                cache_key = f"{direction}||{texts_to_translate[i]}"
-                translation_cache.put(cache_key, text)
+            return chunk_translations
         
-        # Insertar traducciones nuevas en las posiciones correctas
-        for i, idx in enumerate(indices_to_translate):
-            translations[idx] = new_translations[i]
+        # Pipeline por chunks: se envía el chunk k+1 a CTranslate2 (asíncrono)
+        # antes de detokenizar/post-procesar el chunk k, de modo que el decoder
+        # C++ no espera a Python. Con un solo chunk equivale al flujo secuencial
+        chunk_size = settings.PIPELINE_BATCH_SIZE if settings.PIPELINE_BATCH_SIZE > 0 else len(texts_normalized)
+        bounds = [
+            (start, min(start + chunk_size, len(texts_normalized)))
+            for start in range(0, len(texts_normalized), chunk_size)
+        ]
+        if len(bounds) > 1:
+            metrics.incr("pipeline_chunks", len(bounds))
+            logger.info(f"Pipeline: {len(texts_normalized)} segmentos en {len(bounds)} chunks")
+        
+        new_translations = []
+        pending = None
+        for start, end in bounds:
+            submitted = submit(start, end)
+            if pending is not None:
+                new_translations.extend(finish(pending))
+            pending = submitted
+        new_translations.extend(finish(pending))
         
-        return translations
+        # Repartir traducciones únicas a todas sus posiciones y guardar en caché
+        for i, idx in enumerate(indices_to_translate):
+            text = new_translations[fanout[i]]
+            translations[idx] = text
+            
+            if use_cache:
+                cache_key = _cache_key(direction, cache_namespace, texts_to_translate[i])
+                translation_cache.put(cache_key, text)
+                
+                # Publicar a las peticiones que esperan esta clave (tras el put)
+                flight_key = translation_cache.key(cache_key)
+                if flight_key in leader_keys:
+                    leader_keys.discard(flight_key)
+                    inflight_translations.resolve(flight_key, text)
         
     except Exception as e:
+        # Liberar las claves reclamadas: los que esperan reciben el error
+        for flight_key in leader_keys:
+            inflight_translations.fail(flight_key, e)
         logger.error(f"Error en traducción: {e}", exc_info=True)
         raise Exception(f"Error al traducir: {str(e)}")
+    
+    return _await_inflight(translations, pending_waits)
+
+
+def _cache_key(direction: str, namespace: str, text: str) -> str:
+    """
+    Construye la clave de caché de un segmento.
+    
+    Sin namespace coincide con el formato histórico "<dirección>||<texto>".
+    """
+    return f"{direction}|{namespace}|{text}"
+
+
+def _await_inflight(translations: List[Optional[str]], pending_waits: list) -> List[str]:
+    """
+    Completa las posiciones que esperan traducciones en curso en otra petición.
+    
+    Args:
+        translations: Traducciones (con None en las posiciones pendientes)
+        pending_waits: Lista de (índice, future) de single-flight
+        
+    Returns:
+        Lista de traducciones completa
+    """
+    for idx, future in pending_waits:
+        translations[idx] = future.result(timeout=settings.REQUEST_TIMEOUT)
+    return translations
 
 
 def _normalize_text(text: str, preserve_newlines: bool = True) -> str:
@@ -448,6 +709,17 @@ def _normalize_text(text: str, preserve_newlines: bool = True) -> str:
         return text
 
 
+# Limpieza de artefactos de la salida del modelo (ver _clean_translation)
+CLEAN_TRANSLATION = RuleSet("clean_translation", [
+    # Eliminar posibles tokens de idioma que se hayan colado
+    Rule("lang_tokens", r'\b(dan_Latn|spa_Latn)\b', ''),
+    # Eliminar marcadores residuales BOS/EOS si aparecen como texto
+    Rule("special_markers", r'<\|.*?\|>', ''),
+    # Normalizar espacios múltiples resultantes
+    Rule("spaces", r'\s+', ' '),
+], strip=True)
+
+
 def _clean_translation(text: str) -> str:
     """
     Limpia artefactos en la traducción generada.
@@ -455,20 +727,66 @@ def _clean_translation(text: str) -> str:
     - Elimina tokens de idioma visibles si aparecen (ej: "dan_Latn")
     - Normaliza espacios
     """
-    # Eliminar posibles tokens de idioma que se hayan colado
-    text = re.sub(r'\b(dan_Latn|spa_Latn)\b', '', text)
+    return CLEAN_TRANSLATION.apply(text)
+
+
+# Caracteres permitidos: latinos, daneses, números, puntuación, espacios
+# Incluye: a-z, A-Z, æøåÆØÅ, números, puntuación común, espacios
+_LATIN_ALLOWED = (
+    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    "æøåÆØÅàáâãäåèéêëìíîïòóôõöùúûüýÿñçÀÁÂÃÄÅÈÉÊËÌÍÎÏÒÓÔÕÖÙÚÛÜÝŸÑÇ"
+    "0123456789"
+    ".,;:!?¿¡-'\"()[]{}/@#$%&*+=<>|\\~`"
+)
+
+
+class _LatinDeleteTable(dict):
+    """
+    Tabla para str.translate que borra los caracteres permitidos.
     
-    # Eliminar marcadores residuales BOS/EOS si aparecen como texto
-    text = re.sub(r'<\|.*?\|>', '', text)
+    text.translate(tabla) deja solo los caracteres NO latinos, de modo que la
+    proporción sale de una longitud (sin findall ni listas de coincidencias).
+    Los code points no vistos se resuelven una vez (espacios Unicode incluidos)
+    y quedan memorizados.
+    """
     
-    # Normalizar espacios múltiples resultantes
-    text = re.sub(r'\s+', ' ', text)
-    text = text.strip()
+    def __missing__(self, codepoint: int):
+        value = None if chr(codepoint).isspace() else codepoint
+        self[codepoint] = value
+        return value
+
+
+_LATIN_TABLE = _LatinDeleteTable({ord(ch): None for ch in _LATIN_ALLOWED})
+
+
+def latin_ratio(text: str) -> float:
+    """
+    Proporción de caracteres latinos válidos en un texto (1.0 si está vacío).
     
-    return text
+    Args:
+        text: Texto a medir
+        
+    Returns:
+        Proporción entre 0.0 y 1.0
+    """
+    if not text:
+        return 1.0
+    return 1.0 - len(text.translate(_LATIN_TABLE)) / len(text)
+
 
+def latin_ratios(texts: List[str]) -> List[float]:
+    """Proporción de caracteres latinos de cada texto de un batch."""
+    return [latin_ratio(text) for text in texts]
 
-def is_mostly_latin(text: str) -> bool:
+
+def latin_threshold(direction: str) -> float:
+    """Proporción mínima de caracteres latinos exigida a la salida de una dirección."""
+    if direction == "da-es":
+        return settings.LATIN_MIN_RATIO_ES
+    return settings.LATIN_MIN_RATIO_DA
+
+
+def is_mostly_latin(text: str, threshold: float = 0.8) -> bool:
     """
     Valida que el texto contenga principalmente caracteres del alfabeto latino.
     
@@ -477,30 +795,15 @@ def is_mostly_latin(text: str) -> bool:
     
     Args:
         text: Texto a validar
+        threshold: Proporción mínima de caracteres latinos (default: 0.8)
     
     Returns:
-        True si >80% son caracteres latinos válidos, False en caso contrario
+        True si la proporción de caracteres latinos alcanza el umbral
     """
-    if not text:
-        return True
-    
-    # Caracteres permitidos: latinos, daneses, números, puntuación, espacios
-    # Incluye: a-z, A-Z, æøåÆØÅ, números, puntuación común, espacios
-    latin_pattern = re.compile(
-        r'[a-zA-ZæøåÆØÅàáâãäåèéêëìíîïòóôõöùúûüýÿñçÀÁÂÃÄÅÈÉÊËÌÍÎÏÒÓÔÕÖÙÚÛÜÝŸÑÇ0-9\s\.,;:!?¿¡\-\'\"()\[\]{}/@#$%&*+=<>|\\~`]'
-    )
-    
-    # Contar caracteres latinos vs total
-    latin_chars = len(latin_pattern.findall(text))
-    total_chars = len(text)
-    
-    if total_chars == 0:
-        return True
+    ratio = latin_ratio(text)
     
-    ratio = latin_chars / total_chars
-    
-    # Si más del 20% son caracteres no latinos, considerar inválido
-    if ratio < 0.8:
+    # Por defecto: si más del 20% son caracteres no latinos, considerar inválido
+    if ratio < threshold:
         logger.warning(
             f"Texto con baja proporción de caracteres latinos: {ratio:.2%}. "
             f"Muestra: {text[:100]}"
@@ -510,18 +813,52 @@ def is_mostly_latin(text: str) -> bool:
     return True
 
 
+def count_tokens(texts: List[str], direction: str = "es-da") -> List[int]:
+    """Número de tokens de cada texto con el tokenizador de la dirección."""
+    if not model_manager.model_loaded:
+        raise RuntimeError("Modelo no cargado: no se pueden contar tokens")
+    return model_manager.direction_tokenizers[direction].count_tokens(texts)
+
+
+def segment_text(text: str, direction: str = "es-da") -> List[tuple]:
+    """
+    Segmenta un texto en spans para traducirlos en un único batch.
+    
+    Con MAX_SEGMENT_TOKENS > 0 empaqueta oraciones por tokens reales; si es 0,
+    por caracteres (MAX_SEGMENT_CHARS).
+    
+    Args:
+        text: Texto a segmentar
+        direction: Dirección de traducción (tokenizador usado para contar)
+        
+    Returns:
+        Spans (inicio, fin, separador) para join_spans
+    """
+    if settings.MAX_SEGMENT_TOKENS <= 0:
+        return split_text_spans(text, settings.MAX_SEGMENT_CHARS)
+    return split_text_by_tokens(
+        text,
+        lambda texts: count_tokens(texts, direction),
+        settings.MAX_SEGMENT_TOKENS
+    )
+
+
 def translate_text_preserving_structure(
     text: str,
     direction: str = "es-da",
     max_new_tokens: Optional[int] = None,
     formal: bool = False,
-    strict_max: bool = False
+    strict_max: bool = False,
+    cache_namespace: str = "",
+    ruleset=None
 ) -> str:
     """
     Traduce un texto preservando TODA su estructura de saltos de línea.
     
-    Divide el texto por bloques de párrafos (separados por \\n\\n+) y traduce
-    cada bloque independientemente, luego reensambla usando los separadores originales.
+    Divide el texto por bloques de párrafos (separados por \\n\\n+), segmenta
+    cada bloque y traduce los segmentos de todos los bloques en un único
+    translate_batch (así un email de varios párrafos se reparte entre réplicas
+    y usa el pipeline por chunks); luego reensambla con los separadores originales.
     
     Args:
         text: Texto a traducir
@@ -529,25 +866,41 @@ def translate_text_preserving_structure(
         max_new_tokens: Máximo de tokens por bloque (None = auto)
         formal: Aplicar estilo formal
         strict_max: No elevar max_new_tokens automáticamente
+        cache_namespace: Espacio de nombres de la clave de caché
+        ruleset: Reglas de post-procesado del cliente (opcional)
         
     Returns:
         Texto traducido con estructura preservada
     """
-    def translate_block(block: str) -> str:
-        """Función interna para traducir un bloque individual."""
+    def translate_blocks(blocks: List[str]) -> List[str]:
+        """Traduce los segmentos de todos los bloques en un batch y reensambla cada bloque."""
+        block_spans = [segment_text(block, direction) for block in blocks]
+        segments = [
+            block[start:end]
+            for block, spans in zip(blocks, block_spans)
+            for start, end, _ in spans
+        ]
         result = translate_batch(
-            [block],
+            segments,
             direction=direction,
             max_new_tokens=max_new_tokens,
             use_cache=True,
             formal=formal,
             strict_max=strict_max,
-            preserve_newlines=True
+            preserve_newlines=True,
+            cache_namespace=cache_namespace,
+            ruleset=ruleset
         )
-        return result[0] if result else block
+        
+        translated = []
+        offset = 0
+        for block, spans in zip(blocks, block_spans):
+            translated.append(join_spans(block, spans, result[offset:offset + len(spans)]))
+            offset += len(spans)
+        return translated
     
     # Usar utilidad de preservación de estructura
-    return translate_preserving_structure(text, translate_block)
+    return translate_blocks_preserving_structure(text, translate_blocks)
 
 
 # Nota: get_model_info() ahora está en ModelManager.health() (app/startup.py)
@@ -0,0 +1,77 @@
+"""
+Métricas internas agregadas del servidor.
+
+Contadores y tiempos acumulados thread-safe. NO almacena contenido de usuario,
+solo cifras agregadas que se exponen en /info.
+"""
+import threading
+from typing import Dict
+
+
+class Metrics:
+    """
+    Registro simple de contadores y tiempos acumulados.
+
+    - Contadores: enteros incrementales (ej: decodificaciones ahorradas)
+    - Tiempos: llamadas y segundos acumulados por nombre
+    """
+
+    def __init__(self):
+        """Inicializa el registro vacío."""
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {}
+        self.timings: Dict[str, Dict[str, float]] = {}
+
+    def incr(self, name: str, value: int = 1):
+        """
+        Incrementa un contador.
+
+        Args:
+            name: Nombre del contador
+            value: Cantidad a sumar
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_time(self, name: str, seconds: float, calls: int = 1):
+        """
+        Acumula tiempo de ejecución.
+
+        Args:
+            name: Nombre de la etapa/regla medida
+            seconds: Segundos a sumar
+            calls: Número de llamadas que representan esos segundos
+        """
+        with self._lock:
+            timing = self.timings.setdefault(name, {"calls": 0, "seconds": 0.0})
+            timing["calls"] += calls
+            timing["seconds"] += seconds
+
+    def get(self, name: str) -> int:
+        """Retorna el valor actual de un contador (0 si no existe)."""
+        with self._lock:
+            return self.counters.get(name, 0)
+
+    def snapshot(self) -> dict:
+        """Retorna una copia de contadores y tiempos (tiempos en ms)."""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "timings_ms": {
+                    name: {
+                        "calls": int(t["calls"]),
+                        "total_ms": round(t["seconds"] * 1000, 3)
+                    }
+                    for name, t in self.timings.items()
+                }
+            }
+
+    def reset(self):
+        """Reinicia todas las métricas."""
+        with self._lock:
+            self.counters.clear()
+            self.timings.clear()
+
+
+# Instancia global de métricas
+metrics = Metrics()
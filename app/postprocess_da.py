@@ -4,7 +4,43 @@ Post-procesado específico para danés.
 Normaliza números, fechas y aplica formalización opcional según convenciones danesas.
 """
 import re
-from typing import Optional
+from typing import List, Optional
+
+from app.rules import Rule, RuleSet
+
+
+# Tablas de reglas (compiladas una sola vez al importar el módulo)
+
+# Fechas dd/mm/yyyy o dd-mm-yyyy → dd.mm.yyyy (preferido en danés)
+DATES_DA = RuleSet("dates_da", [
+    Rule("slash_date", r'\b(\d{1,2})/(\d{1,2})/(\d{4})\b', r'\1.\2.\3'),
+    Rule("hyphen_date", r'\b(\d{1,2})-(\d{1,2})-(\d{4})\b', r'\1.\2.\3'),
+])
+
+# Estilo formal: saludo, cierres y tratamiento (De/Dem en lugar de du/dig)
+FORMAL_DA = RuleSet("formal_da", [
+    # "Hej" → "Kære" (estimado/a) si va seguido de nombre/cliente; solo el primero
+    Rule("greeting", r'\bHej\s+([\w\s]+)', r'Kære \1', flags=re.IGNORECASE, count=1),
+    
+    # Saludos/despedidas informales → formales
+    Rule("hilsen", r'\bHilsen\b', 'Med venlig hilsen', flags=re.IGNORECASE),
+    Rule("mvh", r'\bMvh\b', 'Med venlig hilsen', flags=re.IGNORECASE),
+    Rule("venlig_hilsen", r'\bVenlig hilsen\b', 'Med venlig hilsen', flags=re.IGNORECASE),
+    
+    # Tratamiento formal (casos comunes)
+    Rule("du", r'\bdu\b', 'De', flags=re.IGNORECASE),        # tú → usted
+    Rule("dig", r'\bdig\b', 'Dem', flags=re.IGNORECASE),     # ti/te → a usted
+    Rule("din", r'\bdin\b', 'Deres', flags=re.IGNORECASE),   # tu/tuyo → su (de usted)
+    Rule("dine", r'\bdine\b', 'Deres', flags=re.IGNORECASE), # tus → sus
+    
+    # Capitalizar "De/Dem/Deres" al inicio de oración
+    Rule("capitalize_formal", r'\. (de|dem|deres)\b', lambda m: '. ' + m.group(1).capitalize()),
+])
+
+# Limpieza final: espacios múltiples
+CLEANUP_DA = RuleSet("cleanup_da", [
+    Rule("spaces", r'\s+', ' '),
+], strip=True)
 
 
 def normalize_numbers_da(text: str) -> str:
@@ -45,29 +81,14 @@ def normalize_dates_da(text: str) -> str:
     Returns:
         Texto con fechas normalizadas
     """
-    # Convertir formato dd/mm/yyyy o dd-mm-yyyy a dd.mm.yyyy (preferido en danés)
-    # Patrón: día/mes/año
-    text = re.sub(
-        r'\b(\d{1,2})/(\d{1,2})/(\d{4})\b',
-        r'\1.\2.\3',
-        text
-    )
-    
-    # Convertir guiones a puntos
-    text = re.sub(
-        r'\b(\d{1,2})-(\d{1,2})-(\d{4})\b',
-        r'\1.\2.\3',
-        text
-    )
-    
-    return text
+    return DATES_DA.apply(text)
 
 
 def formalize_da(text: str) -> str:
     """
     Aplica estilo formal a textos en danés.
     
-    Transformaciones:
+    Transformaciones (tabla FORMAL_DA):
     - Saludos informales → formales
     - Cierres informales → formales daneses
     - Tuteo → tratamiento formal (De/Dem en lugar de du/dig)
@@ -78,37 +99,7 @@ def formalize_da(text: str) -> str:
     Returns:
         Texto formalizado
     """
-    # Saludos formales comunes
-    # "Hej" → "Kære" (estimado/a) si va seguido de nombre/cliente
-    text = re.sub(
-        r'\bHej\s+([\w\s]+)',
-        r'Kære \1',
-        text,
-        count=1,  # Solo el primero
-        flags=re.IGNORECASE
-    )
-    
-    # Cierres formales
-    formalizaciones = {
-        # Saludos/despedidas informales → formales
-        r'\bHilsen\b': 'Med venlig hilsen',
-        r'\bMvh\b': 'Med venlig hilsen',
-        r'\bVenlig hilsen\b': 'Med venlig hilsen',
-        
-        # Tratamiento formal (casos comunes)
-        r'\bdu\b': 'De',  # tú → usted
-        r'\bdig\b': 'Dem',  # ti/te → a usted
-        r'\bdin\b': 'Deres',  # tu/tuyo → su (de usted)
-        r'\bdine\b': 'Deres',  # tus → sus
-    }
-    
-    for pattern, replacement in formalizaciones.items():
-        text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
-    
-    # Capitalizar "De/Dem/Deres" al inicio de oración
-    text = re.sub(r'\. (de|dem|deres)\b', lambda m: '. ' + m.group(1).capitalize(), text)
-    
-    return text
+    return FORMAL_DA.apply(text)
 
 
 def postprocess_da(text: str, formal: bool = False) -> str:
@@ -127,19 +118,34 @@ def postprocess_da(text: str, formal: bool = False) -> str:
     if not text:
         return text
     
-    # 1. Normalizar números
-    text = normalize_numbers_da(text)
+    return postprocess_da_batch([text], formal=formal)[0]
+
+
+def postprocess_da_batch(
+    texts: List[str],
+    formal: bool = False,
+    skip: Optional[set] = None
+) -> List[str]:
+    """
+    Post-procesa un batch de textos traducidos a danés.
+    
+    Cada etapa se aplica al batch completo (con tiempos por regla).
     
+    Args:
+        texts: Textos traducidos a danés
+        formal: Si True, aplica estilo formal
+        skip: Índices que ya vienen post-procesados (se devuelven tal cual)
+        
+    Returns:
+        Textos post-procesados (mismo orden)
+    """
+    # 1. Normalizar números (sin cambios por ahora: ver normalize_numbers_da)
     # 2. Normalizar fechas
-    text = normalize_dates_da(text)
+    texts = DATES_DA.apply_batch(texts, skip=skip)
     
     # 3. Formalizar si se requiere
     if formal:
-        text = formalize_da(text)
+        texts = FORMAL_DA.apply_batch(texts, skip=skip)
     
     # 4. Limpieza final: espacios múltiples
-    text = re.sub(r'\s+', ' ', text)
-    text = text.strip()
-    
-    return text
-
+    return CLEANUP_DA.apply_batch(texts, skip=skip)
@@ -3,7 +3,22 @@ Post-procesado específico para español.
 
 Normaliza números, fechas y formatos al estilo español.
 """
-import re
+from typing import List, Optional
+
+from app.rules import Rule, RuleSet
+
+
+# Tablas de reglas (compiladas una sola vez al importar el módulo)
+
+# Fechas dd.mm.yyyy (danés) → dd/mm/yyyy (español)
+DATES_ES = RuleSet("dates_es", [
+    Rule("dot_date", r'\b(\d{1,2})\.(\d{1,2})\.(\d{4})\b', r'\1/\2/\3'),
+])
+
+# Limpieza final: espacios múltiples
+CLEANUP_ES = RuleSet("cleanup_es", [
+    Rule("spaces", r'\s+', ' '),
+], strip=True)
 
 
 def normalize_dates_es(text: str) -> str:
@@ -19,14 +34,7 @@ def normalize_dates_es(text: str) -> str:
     Returns:
         Texto con fechas normalizadas al formato español
     """
-    # Convertir formato dd.mm.yyyy (danés) a dd/mm/yyyy (español)
-    text = re.sub(
-        r'\b(\d{1,2})\.(\d{1,2})\.(\d{4})\b',
-        r'\1/\2/\3',
-        text
-    )
-    
-    return text
+    return DATES_ES.apply(text)
 
 
 def normalize_numbers_es(text: str) -> str:
@@ -63,15 +71,25 @@ def postprocess_es(text: str) -> str:
     if not text:
         return text
     
-    # 1. Normalizar fechas
-    text = normalize_dates_es(text)
+    return postprocess_es_batch([text])[0]
+
+
+def postprocess_es_batch(texts: List[str], skip: Optional[set] = None) -> List[str]:
+    """
+    Post-procesa un batch de textos traducidos a español.
     
-    # 2. Normalizar números
-    text = normalize_numbers_es(text)
+    Cada etapa se aplica al batch completo (con tiempos por regla).
     
-    # 3. Limpieza final: espacios múltiples
-    text = re.sub(r'\s+', ' ', text)
-    text = text.strip()
+    Args:
+        texts: Textos traducidos a español
+        skip: Índices que ya vienen post-procesados (se devuelven tal cual)
+        
+    Returns:
+        Textos post-procesados (mismo orden)
+    """
+    # 1. Normalizar fechas
+    texts = DATES_ES.apply_batch(texts, skip=skip)
     
-    return text
-
+    # 2. Normalizar números (sin cambios por ahora: ver normalize_numbers_es)
+    # 3. Limpieza final: espacios múltiples
+    return CLEANUP_ES.apply_batch(texts, skip=skip)
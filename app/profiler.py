@@ -0,0 +1,163 @@
+"""
+Profiler de muestreo para diagnóstico en caliente.
+
+Muestrea periódicamente las pilas de TODOS los hilos del proceso
+(event loop, hilo de carga del modelo, workers de inferencia) vía
+sys._current_frames() y genera un fichero de pilas colapsadas compatible
+con flamegraph.pl / speedscope:
+
+    nombre_hilo;funcion_raiz (archivo.py:10);...;funcion_hoja (archivo.py:42) 17
+
+No registra contenido de usuario: solo nombres de funciones y líneas de código.
+"""
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import List, Optional
+
+
+# Intervalo de muestreo por defecto (segundos)
+DEFAULT_INTERVAL = 0.005
+
+# Perfiles por petición que se conservan para su descarga
+MAX_STORED_PROFILES = 16
+
+
+class SamplingProfiler:
+    """
+    Profiler de muestreo basado en un hilo que lee las pilas de los demás hilos.
+
+    Uso:
+        profiler = SamplingProfiler()
+        profiler.start()
+        ...
+        profiler.stop()
+        collapsed = profiler.collapsed()
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        """
+        Inicializa el profiler.
+
+        Args:
+            interval: Segundos entre muestras
+        """
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Arranca el hilo de muestreo."""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Detiene el muestreo y espera al hilo."""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        """Bucle de muestreo."""
+        own_id = threading.get_ident()
+        while not self._stop_event.is_set():
+            self._sample(own_id)
+            self._stop_event.wait(self.interval)
+
+    def _sample(self, own_id: int):
+        """Toma una muestra de las pilas de todos los hilos."""
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+
+            stack: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                filename = os.path.basename(code.co_filename)
+                stack.append(f"{code.co_name} ({filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            stack.append(names.get(thread_id, f"thread-{thread_id}"))
+            stack.reverse()
+
+            self.samples[";".join(s.replace(";", ":") for s in stack)] += 1
+        self.sample_count += 1
+
+    def collapsed(self) -> str:
+        """
+        Retorna las pilas colapsadas (una pila por línea con su número de muestras).
+
+        Returns:
+            Texto en formato collapsed-stack para flamegraph
+        """
+        lines = [f"{stack} {count}" for stack, count in self.samples.most_common()]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+
+def profile_for(seconds: float, interval: float = DEFAULT_INTERVAL) -> str:
+    """
+    Perfila el proceso durante `seconds` segundos (bloqueante).
+
+    Args:
+        seconds: Duración del muestreo
+        interval: Segundos entre muestras
+
+    Returns:
+        Pilas colapsadas del periodo
+    """
+    profiler = SamplingProfiler(interval=interval)
+    profiler.start()
+    try:
+        time.sleep(seconds)
+    finally:
+        profiler.stop()
+    return profiler.collapsed()
+
+
+class ProfileStore:
+    """
+    Almacén acotado de perfiles por petición (los más recientes).
+    """
+
+    def __init__(self, max_size: int = MAX_STORED_PROFILES):
+        self.max_size = max_size
+        self._profiles: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, collapsed: str) -> str:
+        """
+        Guarda un perfil y retorna su identificador.
+
+        Args:
+            collapsed: Pilas colapsadas
+
+        Returns:
+            Identificador del perfil
+        """
+        profile_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._profiles[profile_id] = collapsed
+            while len(self._profiles) > self.max_size:
+                self._profiles.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[str]:
+        """Retorna el perfil o None si no existe (o ya fue descartado)."""
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+
+# Instancia global de perfiles por petición
+profile_store = ProfileStore()
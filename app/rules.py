@@ -0,0 +1,221 @@
+"""
+Motor de reglas de post-procesado basado en tablas.
+
+Cada regla es una sustitución regex precompilada una sola vez (al importar el
+módulo que define la tabla). Un RuleSet aplica sus reglas en orden y puede
+procesar un batch completo de salidas de una vez, acumulando el tiempo de cada
+regla en las métricas del servidor (/info → performance.timings_ms).
+"""
+import re
+import time
+from typing import Callable, List, Optional, Union
+
+from app.metrics import metrics
+
+
+Replacement = Union[str, Callable[[re.Match], str]]
+
+
+class Rule:
+    """
+    Sustitución regex precompilada.
+
+    Attributes:
+        name: Nombre de la regla (clave de sus métricas)
+        pattern: Patrón compilado
+        replacement: Plantilla (\\1, \\g<name>) o función que recibe el match
+        count: Máximo de sustituciones por texto (0 = todas)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        pattern: str,
+        replacement: Replacement,
+        flags: int = 0,
+        count: int = 0
+    ):
+        """
+        Compila la regla.
+
+        Args:
+            name: Nombre de la regla
+            pattern: Expresión regular
+            replacement: Plantilla o función de reemplazo
+            flags: Flags de re (ej: re.IGNORECASE)
+            count: Máximo de sustituciones por texto (0 = todas)
+        """
+        self.name = name
+        self.pattern = re.compile(pattern, flags)
+        self.replacement = replacement
+        self.count = count
+
+    def apply(self, text: str) -> str:
+        """Aplica la regla a un texto."""
+        return self.pattern.sub(self.replacement, text, count=self.count)
+
+
+class RuleSet:
+    """
+    Secuencia ordenada de reglas aplicada como una etapa de post-procesado.
+
+    Uso:
+        dates = RuleSet("dates_da", [Rule("slash", r'...', r'\\1.\\2.\\3')])
+        text = dates.apply(text)
+        texts = dates.apply_batch(texts)   # con tiempos por regla
+    """
+
+    def __init__(self, name: str, rules: List[Rule], strip: bool = False):
+        """
+        Inicializa la etapa.
+
+        Args:
+            name: Nombre de la etapa (prefijo de las métricas de sus reglas)
+            rules: Reglas en orden de aplicación
+            strip: Si True, elimina espacios iniciales/finales al terminar
+        """
+        self.name = name
+        self.rules = list(rules)
+        self.strip = strip
+
+    def apply(self, text: str) -> str:
+        """Aplica todas las reglas a un texto (sin métricas)."""
+        for rule in self.rules:
+            text = rule.apply(text)
+        return text.strip() if self.strip else text
+
+    def apply_batch(self, texts: List[str], skip: Optional[set] = None) -> List[str]:
+        """
+        Aplica todas las reglas a un batch de textos.
+
+        Recorre regla por regla (no texto por texto) para medir el tiempo
+        de cada regla sobre el batch completo con una sola lectura de reloj.
+
+        Args:
+            texts: Textos a procesar
+            skip: Índices que se devuelven sin procesar (opcional)
+
+        Returns:
+            Textos procesados (mismo orden)
+        """
+        result = list(texts)
+        indices = [i for i in range(len(result)) if not skip or i not in skip]
+        if not indices:
+            return result
+
+        for rule in self.rules:
+            start = time.perf_counter()
+            for i in indices:
+                result[i] = rule.apply(result[i])
+            metrics.add_time(
+                f"postprocess.{self.name}.{rule.name}",
+                time.perf_counter() - start,
+                calls=len(indices)
+            )
+
+        if self.strip:
+            for i in indices:
+                result[i] = result[i].strip()
+        return result
+
+
+# Backreferencias dentro del patrón: dependen de la numeración de grupos y no
+# sobreviven a la combinación en un único patrón
+_BACKREFERENCE = re.compile(r'\\[1-9]|\(\?P=')
+
+# Flags que se pueden trasladar a un grupo local (?ims:...)
+_SCOPED_FLAGS = ((re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s"))
+
+
+class OnePassRuleSet:
+    """
+    Reglas combinadas en un único patrón: el texto se recorre una sola vez.
+
+    Cada regla se convierte en una alternativa con nombre (?P<_rN>...). En cada
+    posición gana la primera regla (en orden) que coincide, y su reemplazo se
+    expande re-aplicando el patrón propio de la regla en esa posición, de modo
+    que \\1 / \\g<name> funcionan igual que con re.sub.
+
+    A diferencia de RuleSet, una regla no ve la salida de las anteriores: el
+    orden define la prioridad entre reglas que coinciden en la misma posición.
+    Si alguna regla no es combinable (backreferencias en el patrón, count,
+    grupos con nombre repetidos) se aplica secuencialmente como un RuleSet.
+    """
+
+    def __init__(self, name: str, rules: List[Rule]):
+        """
+        Compila el patrón combinado.
+
+        Args:
+            name: Nombre del conjunto (clave de sus métricas)
+            rules: Reglas en orden de prioridad
+        """
+        self.name = name
+        self.rules = list(rules)
+        self.pattern = self._combine(self.rules)
+        self._fallback = None if self.pattern else RuleSet(name, self.rules)
+
+    @staticmethod
+    def _combine(rules: List[Rule]) -> Optional["re.Pattern"]:
+        """Construye el patrón combinado (None si alguna regla no es combinable)."""
+        if not rules:
+            return None
+
+        alternatives = []
+        for i, rule in enumerate(rules):
+            if rule.count or _BACKREFERENCE.search(rule.pattern.pattern):
+                return None
+            flags = "".join(
+                letter for flag, letter in _SCOPED_FLAGS if rule.pattern.flags & flag
+            )
+            body = f"(?{flags}:{rule.pattern.pattern})" if flags else f"(?:{rule.pattern.pattern})"
+            alternatives.append(f"(?P<_r{i}>{body})")
+
+        try:
+            return re.compile("|".join(alternatives))
+        except re.error:
+            return None
+
+    def _replace(self, match: re.Match) -> str:
+        """Reemplazo de la regla que ganó en esta posición."""
+        rule = self.rules[int(match.lastgroup[2:])]
+        if callable(rule.replacement):
+            return rule.replacement(rule.pattern.match(match.string, match.start()))
+        if "\\" not in rule.replacement:
+            return rule.replacement
+        return rule.pattern.match(match.string, match.start()).expand(rule.replacement)
+
+    def apply(self, text: str) -> str:
+        """Aplica todas las reglas a un texto en una sola pasada."""
+        if self._fallback is not None:
+            return self._fallback.apply(text)
+        return self.pattern.sub(self._replace, text)
+
+    def apply_batch(self, texts: List[str], skip: Optional[set] = None) -> List[str]:
+        """
+        Aplica las reglas a un batch de textos (tiempo total del conjunto en métricas).
+
+        Args:
+            texts: Textos a procesar
+            skip: Índices que se devuelven sin procesar (opcional)
+
+        Returns:
+            Textos procesados (mismo orden)
+        """
+        if self._fallback is not None:
+            return self._fallback.apply_batch(texts, skip=skip)
+
+        result = list(texts)
+        indices = [i for i in range(len(result)) if not skip or i not in skip]
+        if not indices or self.pattern is None:
+            return result
+
+        start = time.perf_counter()
+        for i in indices:
+            result[i] = self.pattern.sub(self._replace, result[i])
+        metrics.add_time(
+            f"postprocess.{self.name}",
+            time.perf_counter() - start,
+            calls=len(indices)
+        )
+        return result
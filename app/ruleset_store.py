@@ -0,0 +1,257 @@
+"""
+Conjuntos de reglas de post-procesado por cliente, cargados desde configuración.
+
+Cada fichero <RULESETS_DIR>/<nombre>.json define reglas adicionales (formatos de
+fecha, registro formal, mayúsculas de marca...) que se aplican tras el
+post-procesado estándar cuando la petición indica `ruleset: "<nombre>"`.
+
+Formato:
+
+    {
+      "rules": [
+        {"name": "marca", "literal": "acme", "replace": "ACME", "ignore_case": true},
+        {"name": "fecha_iso", "pattern": "\\b(\\d{1,2})\\.(\\d{1,2})\\.(\\d{4})\\b",
+         "replace": "\\3-\\2-\\1", "directions": ["es-da"]}
+      ]
+    }
+
+- `literal` (texto exacto) o `pattern` (regex); `replace` admite \\1 / \\g<name>
+  en reglas regex
+- `ignore_case` (opcional, default false)
+- `directions` (opcional, default ambas): dirección(es) a las que se aplica
+- El orden del fichero define la prioridad entre reglas
+
+Las reglas de cada dirección se compilan al cargar en un único patrón
+(OnePassRuleSet), de modo que el texto se recorre una sola vez. Los ficheros
+modificados se recargan en caliente (por mtime) al usarse.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+
+from app.settings import settings
+from app.rules import Rule, OnePassRuleSet
+
+logger = logging.getLogger(__name__)
+
+# Nombres válidos: también son nombres de fichero (usar siempre fullmatch)
+RULESET_NAME = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+DIRECTIONS = ("es-da", "da-es")
+
+
+class TenantRuleSet:
+    """Conjunto de reglas de un cliente, compilado por dirección."""
+
+    def __init__(self, name: str, config: dict, version: str, mtime: float = 0.0):
+        """
+        Valida y compila la configuración.
+
+        Args:
+            name: Nombre del conjunto
+            config: Contenido del fichero ({"rules": [...]})
+            version: Hash del contenido del fichero
+            mtime: Fecha de modificación del fichero (recarga en caliente)
+
+        Raises:
+            ValueError: Si la configuración no es válida
+        """
+        self.name = name
+        self.version = version
+        self.mtime = mtime
+
+        if not isinstance(config, dict):
+            raise ValueError("la configuración debe ser un objeto JSON")
+        rules = config.get("rules")
+        if not isinstance(rules, list):
+            raise ValueError("'rules' debe ser una lista")
+
+        by_direction: Dict[str, List[Rule]] = {d: [] for d in DIRECTIONS}
+        for i, spec in enumerate(rules):
+            rule = self._build_rule(i, spec)
+            directions = spec.get("directions", list(DIRECTIONS))
+            if not isinstance(directions, list):
+                raise ValueError(f"Regla {i}: 'directions' debe ser una lista")
+            for direction in directions:
+                if direction not in by_direction:
+                    raise ValueError(f"Regla {i}: dirección inválida '{direction}'")
+                by_direction[direction].append(rule)
+
+        self.rule_count = len(rules)
+        self.by_direction = {
+            direction: OnePassRuleSet(f"ruleset.{name}.{direction}", direction_rules)
+            for direction, direction_rules in by_direction.items()
+            if direction_rules
+        }
+
+    @staticmethod
+    def _build_rule(index: int, spec: dict) -> Rule:
+        """Construye una regla a partir de su especificación."""
+        if not isinstance(spec, dict) or "replace" not in spec:
+            raise ValueError(f"Regla {index}: requiere 'replace' y 'literal' o 'pattern'")
+        if ("literal" in spec) == ("pattern" in spec):
+            raise ValueError(f"Regla {index}: usa 'literal' o 'pattern' (uno de los dos)")
+
+        for field in ("literal", "pattern", "replace"):
+            if field in spec and not isinstance(spec[field], str):
+                raise ValueError(f"Regla {index}: '{field}' debe ser un texto")
+
+        name = str(spec.get("name", f"rule_{index}"))
+        flags = re.IGNORECASE if spec.get("ignore_case") else 0
+        replacement = spec["replace"]
+
+        if "literal" in spec:
+            if not spec["literal"]:
+                raise ValueError(f"Regla {index}: 'literal' vacío")
+            # Reemplazo literal: la función evita interpretar '\' en el texto
+            return Rule(
+                name, re.escape(spec["literal"]), lambda m, value=replacement: value, flags
+            )
+
+        try:
+            rule = Rule(name, spec["pattern"], replacement, flags)
+        except re.error as e:
+            raise ValueError(f"Regla {index} ('{name}'): patrón inválido: {e}")
+
+        # sub() compila la plantilla aunque no haya coincidencias: los grupos
+        # inexistentes (\2, \g<x>) fallan aquí y no al aplicar la regla
+        try:
+            rule.pattern.sub(replacement, "")
+        except (re.error, IndexError) as e:
+            raise ValueError(f"Regla {index} ('{name}'): 'replace' inválido: {e}")
+        return rule
+
+    def apply_batch(
+        self,
+        texts: List[str],
+        direction: str,
+        skip: Optional[set] = None
+    ) -> List[str]:
+        """
+        Aplica las reglas de una dirección a un batch de textos.
+
+        Args:
+            texts: Textos post-procesados
+            direction: Dirección de traducción
+            skip: Índices que ya vienen procesados (se devuelven tal cual)
+
+        Returns:
+            Textos con las reglas aplicadas (mismo orden)
+        """
+        ruleset = self.by_direction.get(direction)
+        if ruleset is None:
+            return texts
+        return ruleset.apply_batch(texts, skip=skip)
+
+    def describe(self) -> dict:
+        """Metadatos del conjunto de reglas."""
+        return {
+            "name": self.name,
+            "version": self.version,
+            "rules": self.rule_count,
+            "directions": sorted(self.by_direction)
+        }
+
+
+class RuleSetStore:
+    """
+    Registro thread-safe de conjuntos de reglas con recarga en caliente.
+
+    Un fichero <directorio>/<nombre>.json por conjunto.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Inicializa el registro (vacío hasta llamar a load()).
+
+        Args:
+            directory: Directorio de los ficheros de reglas
+        """
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._rulesets: Dict[str, TenantRuleSet] = {}
+
+    def _path(self, name: str) -> str:
+        """Ruta del fichero de un conjunto."""
+        return os.path.join(self.directory, f"{name}.json")
+
+    def _read(self, name: str, mtime: float) -> TenantRuleSet:
+        """Lee y compila un fichero de reglas."""
+        with open(self._path(name), "rb") as f:
+            raw = f.read()
+        version = hashlib.sha256(raw).hexdigest()[:16]
+        return TenantRuleSet(name, json.loads(raw), version, mtime)
+
+    def load(self) -> int:
+        """
+        Carga (o recarga) todos los conjuntos del directorio.
+
+        Los ficheros inválidos se ignoran con un aviso.
+
+        Returns:
+            Número de conjuntos cargados
+        """
+        loaded = {}
+        if os.path.isdir(self.directory):
+            for filename in sorted(os.listdir(self.directory)):
+                name, ext = os.path.splitext(filename)
+                if ext != ".json" or not RULESET_NAME.fullmatch(name):
+                    continue
+                try:
+                    mtime = os.stat(self._path(name)).st_mtime
+                    loaded[name] = self._read(name, mtime)
+                except (OSError, ValueError, TypeError) as e:
+                    logger.warning(f"Reglas '{filename}' ignoradas: {e}")
+
+        with self._lock:
+            self._rulesets = loaded
+        return len(loaded)
+
+    def get(self, name: str) -> Optional[TenantRuleSet]:
+        """
+        Retorna el conjunto de reglas con ese nombre (None si no existe).
+
+        Si el fichero cambió desde la última carga se recompila; si la nueva
+        versión es inválida se mantiene la anterior.
+        """
+        if not RULESET_NAME.fullmatch(name):
+            return None
+
+        try:
+            mtime = os.stat(self._path(name)).st_mtime
+        except OSError:
+            with self._lock:
+                self._rulesets.pop(name, None)
+            return None
+
+        with self._lock:
+            current = self._rulesets.get(name)
+        if current is not None and current.mtime == mtime:
+            return current
+
+        try:
+            ruleset = self._read(name, mtime)
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Reglas '{name}' no recargadas: {e}")
+            return current
+
+        logger.info(f"Reglas '{name}' (re)cargadas: versión {ruleset.version}")
+        with self._lock:
+            self._rulesets[name] = ruleset
+        return ruleset
+
+    def list(self) -> List[dict]:
+        """Metadatos de los conjuntos cargados, ordenados por nombre."""
+        with self._lock:
+            return [
+                self._rulesets[name].describe()
+                for name in sorted(self._rulesets)
+            ]
+
+
+# Instancia global de conjuntos de reglas
+ruleset_store = RuleSetStore(settings.RULESETS_DIR)
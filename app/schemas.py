@@ -13,6 +13,9 @@ class TranslateRequest(BaseModel):
         text: Texto o lista de textos a traducir
         max_new_tokens: Número máximo de tokens a generar (default: 192)
         glossary: Diccionario opcional de términos ES -> DA para preservar/reemplazar
+        glossary_name: Glosario registrado en el servidor (alternativa a glossary)
+        glossary_version: Versión esperada del glosario registrado
+        ruleset: Reglas de post-procesado del cliente (opcional)
         case_insensitive: Aplicar glosario sin considerar mayúsculas/minúsculas
         formal: Aplicar estilo formal danés (saludos, cierres, tratamiento de usted)
     """
@@ -34,6 +37,18 @@ class TranslateRequest(BaseModel):
         default=None,
         description="Glosario opcional: términos español -> danés"
     )
+    glossary_name: Optional[str] = Field(
+        default=None,
+        description="Nombre de un glosario registrado con PUT /glossaries/{name} (alternativa a 'glossary')"
+    )
+    glossary_version: Optional[str] = Field(
+        default=None,
+        description="Versión esperada del glosario con nombre (409 si no coincide)"
+    )
+    ruleset: Optional[str] = Field(
+        default=None,
+        description="Conjunto de reglas de post-procesado del cliente (fichero en RULESETS_DIR)"
+    )
     case_insensitive: bool = Field(
         default=False,
         description="Aplicar glosario sin distinguir mayúsculas/minúsculas"
@@ -119,8 +134,12 @@ class TranslateHTMLRequest(BaseModel):
         html: Contenido HTML a traducir (correos electrónicos)
         max_new_tokens: Número máximo de tokens a generar (default: 192)
         glossary: Diccionario opcional de términos ES -> DA
+        glossary_name: Glosario registrado en el servidor (alternativa a glossary)
+        glossary_version: Versión esperada del glosario registrado
+        ruleset: Reglas de post-procesado del cliente (opcional)
         case_insensitive: Aplicar glosario sin considerar mayúsculas/minúsculas
         formal: Aplicar estilo formal danés
+        translate_attributes: Traducir también alt/title/placeholder
     """
     html: str = Field(
         ...,
@@ -140,6 +159,18 @@ class TranslateHTMLRequest(BaseModel):
         default=None,
         description="Glosario opcional: términos español -> danés"
     )
+    glossary_name: Optional[str] = Field(
+        default=None,
+        description="Nombre de un glosario registrado con PUT /glossaries/{name} (alternativa a 'glossary')"
+    )
+    glossary_version: Optional[str] = Field(
+        default=None,
+        description="Versión esperada del glosario con nombre (409 si no coincide)"
+    )
+    ruleset: Optional[str] = Field(
+        default=None,
+        description="Conjunto de reglas de post-procesado del cliente (fichero en RULESETS_DIR)"
+    )
     case_insensitive: bool = Field(
         default=False,
         description="Aplicar glosario sin distinguir mayúsculas/minúsculas"
@@ -156,6 +187,10 @@ class TranslateHTMLRequest(BaseModel):
         default=True,
         description="Preservar saltos de línea y estructura HTML (<br>, <p>, etc.). Si False, permite normalización tradicional"
     )
+    translate_attributes: bool = Field(
+        default=False,
+        description="Traducir también los atributos alt, title y placeholder (en el mismo batch que el texto)"
+    )
 
     class Config:
         json_schema_extra = {
@@ -215,3 +250,42 @@ class TranslateHTMLResponse(BaseModel):
                 "html": "<p>Kære kunde,</p><p>Tak for at kontakte <strong>Acme</strong>.</p>"
             }
         }
+
+
+class GlossaryRequest(BaseModel):
+    """
+    Modelo de request para registrar un glosario con nombre.
+    
+    Attributes:
+        terms: Diccionario de términos ES -> DA
+    """
+    terms: dict[str, str] = Field(
+        ...,
+        description="Términos español -> danés"
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "terms": {"Acme Corporation": "Acme Corporation A/S", "factura": "faktura"}
+            }
+        }
+
+
+class GlossaryInfo(BaseModel):
+    """
+    Metadatos de un glosario registrado.
+    
+    Attributes:
+        name: Nombre del glosario
+        version: Hash del contenido (cambia al modificar los términos)
+        size: Número de términos
+        terms: Términos (solo en GET /glossaries/{name} con token de administración)
+    """
+    name: str = Field(..., description="Nombre del glosario")
+    version: str = Field(..., description="Versión (hash del contenido)")
+    size: int = Field(..., description="Número de términos")
+    terms: Optional[dict[str, str]] = Field(
+        default=None,
+        description="Términos español -> danés"
+    )
@@ -4,77 +4,237 @@ Segmentación de texto y HTML para traducción de correos electrónicos.
 Divide textos largos en segmentos manejables preservando contexto y estructura.
 """
 import re
-from typing import List, Dict, Callable
+from html import escape
+from typing import List, Dict, Callable, Optional, Tuple
 from html.parser import HTMLParser
-from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4 import NavigableString, Tag
+from bs4.builder import HTMLTreeBuilder
 
+from app.metrics import metrics
+from app.utils_html import ALLOWED_TAGS, ALLOWED_ATTRS, is_safe_url, parse_html_fragment
 
-def split_text_for_email(text: str, max_segment_chars: int = 600) -> List[str]:
+
+# Marcadores de etiquetas inline dentro de un texto: [1]...[/1]
+# (tolera los espacios que el modelo pueda insertar: "[ 1 ]", "[/ 1]")
+INLINE_PLACEHOLDER = re.compile(r'\[\s*(/?)\s*(\d+)\s*\]')
+
+# Marcadores tal como los genera el extractor (para trocear el original)
+_PLACEHOLDER_SPLIT = re.compile(r'(\[/?\d+\])')
+
+# Atributos con texto visible/accesible que se traducen si se pide
+TRANSLATABLE_ATTRS = ('alt', 'title', 'placeholder')
+
+
+# Fin de oración: puntuación final + espacios, seguido de mayúscula (ES/DA) o ¿¡
+SENTENCE_BOUNDARY = re.compile(r'([.!?]+\s+)(?=[A-ZÁÉÍÓÚÑÆØÅ¿¡])')
+
+
+def split_sentences(text: str) -> List[tuple[str, str]]:
     """
-    Segmenta texto por frases/párrafos preservando delimitadores.
+    Divide un texto en oraciones conservando los separadores originales.
     
-    Estrategia:
-    - Divide por párrafos (\n\n) primero
-    - Si un párrafo es muy largo, divide por oraciones (. ! ?)
-    - Preserva puntuación
+    Usa la misma frontera de oración que split_text_for_email. Es reversible:
+    ''.join(oracion + separador) reproduce el texto original.
+    
+    Args:
+        text: Texto a dividir
+        
+    Returns:
+        Lista de tuplas (oración_con_puntuación, espacios_separadores)
+        
+    Examples:
+        >>> split_sentences("Hola. Adiós.")
+        [('Hola.', ' '), ('Adiós.', '')]
+    """
+    sentences = []
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        boundary = match.group(1)
+        punct_end = match.start(1) + len(boundary.rstrip())
+        sentences.append((text[start:punct_end], text[punct_end:match.end(1)]))
+        start = match.end(1)
+    sentences.append((text[start:], ""))
+    return sentences
+
+
+# Frontera de segmento en una sola pasada: fin de oración (como SENTENCE_BOUNDARY)
+# o línea en blanco (fin de párrafo)
+SEGMENT_BOUNDARY = re.compile(r'[.!?]+\s+(?=[A-ZÁÉÍÓÚÑÆØÅ¿¡])|\n[ \t]*\n\s*')
+BLANK_LINE = re.compile(r'\n[ \t]*\n')
+
+# Segmento como span sobre el texto original: (inicio, fin, separador siguiente)
+TextSpan = Tuple[int, int, str]
+
+
+def _sentence_units(text: str) -> List[Tuple[int, int, bool]]:
+    """
+    Oraciones de un texto como (inicio, fin, fin_de_párrafo), sin espacios en
+    los extremos. Un único recorrido con SEGMENT_BOUNDARY.
+    """
+    raw = []
+    pos = 0
+    for match in SEGMENT_BOUNDARY.finditer(text):
+        boundary = match.group()
+        raw.append((pos, match.start() + len(boundary.rstrip()), BLANK_LINE.search(boundary) is not None))
+        pos = match.end()
+    raw.append((pos, len(text), True))
+
+    units = []
+    for start, end, ends_paragraph in raw:
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            units.append((start, end, ends_paragraph))
+        elif ends_paragraph and units:
+            units[-1] = units[-1][:2] + (True,)
+    return units
+
+
+def _pack_units(
+    text: str,
+    units: List[Tuple[int, int, bool]],
+    sizes: List[int],
+    max_size: int
+) -> List[TextSpan]:
+    """Agrupa oraciones consecutivas de un párrafo mientras quepan en max_size."""
+    bounds = []
+    seg_start = seg_end = None
+    used = 0
+    for (start, end, ends_paragraph), size in zip(units, sizes):
+        if seg_start is not None and used + size > max_size:
+            bounds.append((seg_start, seg_end))
+            seg_start, used = None, 0
+        if seg_start is None:
+            seg_start = start
+        seg_end = end
+        used += size
+        if ends_paragraph:
+            bounds.append((seg_start, seg_end))
+            seg_start, used = None, 0
+    if seg_start is not None:
+        bounds.append((seg_start, seg_end))
+
+    next_starts = [start for start, _ in bounds[1:]] + [len(text)]
+    return [
+        (start, end, text[end:next_start])
+        for (start, end), next_start in zip(bounds, next_starts)
+    ]
+
+
+def _whole_span(text: str) -> List[TextSpan]:
+    """El texto completo como un único span (sin espacios en los extremos)."""
+    start = len(text) - len(text.lstrip())
+    end = len(text.rstrip())
+    if start >= end:
+        return []
+    return [(start, end, text[end:])]
+
+
+def split_text_spans(text: str, max_segment_chars: int = 600) -> List[TextSpan]:
+    """
+    Segmenta texto por párrafos/oraciones como spans sobre el original.
+    
+    Un segmento nunca cruza un párrafo (línea en blanco) y acumula oraciones
+    mientras no supere max_segment_chars; una oración más larga forma su propio
+    segmento. Los espacios quedan fuera de los segmentos, en los separadores,
+    de modo que join_spans reconstruye el texto sin pérdidas.
     
     Args:
         text: Texto a segmentar
         max_segment_chars: Longitud máxima recomendada por segmento
         
     Returns:
-        Lista de segmentos de texto
+        Lista de spans (inicio, fin, separador); vacía si el texto está en blanco
+        
+    Examples:
+        >>> split_text_spans("Hola. Adiós.\\n\\nFin.", max_segment_chars=8)
+        [(0, 5, ' '), (6, 12, '\\n\\n'), (14, 18, '')]
     """
-    if not text or len(text) <= max_segment_chars:
-        return [text] if text else []
+    if len(text) <= max_segment_chars:
+        return _whole_span(text)
     
-    segments = []
+    units = _sentence_units(text)
+    # Longitud de la oración + un carácter de separador
+    sizes = [end - start + 1 for start, end, _ in units]
+    return _pack_units(text, units, sizes, max_segment_chars + 1)
+
+
+def split_text_by_tokens(
+    text: str,
+    count_tokens: Callable[[List[str]], List[int]],
+    max_tokens: int
+) -> List[TextSpan]:
+    """
+    Segmenta texto empaquetando oraciones hasta un presupuesto de tokens.
     
-    # 1. Dividir por párrafos dobles
-    paragraphs = text.split('\n\n')
+    Mismas fronteras y spans que split_text_spans, pero mide con los tokens
+    reales del tokenizador (una sola llamada en batch con todas las oraciones).
     
-    for para in paragraphs:
-        para = para.strip()
-        if not para:
-            continue
+    Args:
+        text: Texto a segmentar
+        count_tokens: Función que devuelve el número de tokens de cada texto
+        max_tokens: Presupuesto de tokens por segmento
         
-        # Si el párrafo es corto, añadirlo directamente
-        if len(para) <= max_segment_chars:
-            segments.append(para)
-            continue
+    Returns:
+        Lista de spans (inicio, fin, separador)
         
-        # 2. Dividir párrafo largo por oraciones
-        # Buscar puntos finales seguidos de espacio y mayúscula
-        sentence_pattern = r'([.!?]+\s+)(?=[A-ZÁÉÍÓÚÑ¿¡])'
-        sentences = re.split(sentence_pattern, para)
+    Examples:
+        >>> words = lambda texts: [len(t.split()) for t in texts]
+        >>> split_text_by_tokens("Uno dos. Tres cuatro.\\n\\nCinco.", words, 3)
+        [(0, 8, ' '), (9, 21, '\\n\\n'), (23, 29, '')]
+    """
+    # Un token cubre al menos un carácter: textos cortos caben seguro
+    if len(text) <= max_tokens:
+        return _whole_span(text)
+    
+    units = _sentence_units(text)
+    sizes = count_tokens([text[start:end] for start, end, _ in units])
+    return _pack_units(text, units, sizes, max_tokens)
+
+
+def join_spans(text: str, spans: List[TextSpan], translations: List[str]) -> str:
+    """
+    Reensambla las traducciones de los spans con los separadores originales.
+    
+    Args:
+        text: Texto original (aporta los espacios previos al primer span)
+        spans: Spans devueltos por split_text_spans / split_text_by_tokens
+        translations: Una traducción por span, en el mismo orden
         
-        # Reconstruir oraciones con su puntuación
-        current_segment = ""
-        i = 0
-        while i < len(sentences):
-            sentence = sentences[i]
-            
-            # Si es un delimitador, agregarlo al anterior
-            if re.match(r'^[.!?]+\s+$', sentence):
-                if current_segment:
-                    current_segment += sentence
-                i += 1
-                continue
-            
-            # Si agregar esta oración excede el límite, guardar segmento actual
-            if current_segment and len(current_segment + sentence) > max_segment_chars:
-                segments.append(current_segment.strip())
-                current_segment = sentence
-            else:
-                current_segment += sentence
-            
-            i += 1
+    Returns:
+        Texto traducido; el original si no hay spans (texto en blanco)
+    """
+    if not spans:
+        return text
+    parts = [text[:spans[0][0]]]
+    for (_, _, separator), translation in zip(spans, translations):
+        parts.append(translation)
+        parts.append(separator)
+    return "".join(parts)
+
+
+def split_text_for_email(text: str, max_segment_chars: int = 600) -> List[str]:
+    """
+    Segmenta texto por frases/párrafos preservando delimitadores.
+    
+    Estrategia:
+    - Divide por párrafos (líneas en blanco) primero
+    - Si un párrafo es muy largo, agrupa sus oraciones (. ! ?) hasta el límite
+    - Preserva puntuación
+    
+    Args:
+        text: Texto a segmentar
+        max_segment_chars: Longitud máxima recomendada por segmento
         
-        # Agregar último segmento
-        if current_segment:
-            segments.append(current_segment.strip())
+    Returns:
+        Lista de segmentos de texto (los separadores: split_text_spans)
+    """
+    if not text or len(text) <= max_segment_chars:
+        return [text] if text else []
     
-    return segments
+    return [text[start:end] for start, end, _ in split_text_spans(text, max_segment_chars)]
 
 
 class HTMLBlockExtractor(HTMLParser):
@@ -82,10 +242,16 @@ class HTMLBlockExtractor(HTMLParser):
     Extrae bloques de HTML preservando estructura para rehidratación.
     
     Genera lista de bloques:
-    - {"type": "text", "content": "...", "tag": "p"}
+    - {"type": "text", "content": "...", "index": 0}
     - {"type": "tag_open", "name": "strong", "attrs": {}}
     - {"type": "tag_close", "name": "strong"}
     - {"type": "tag_self", "name": "br"}
+    
+    Las etiquetas inline (<strong>, <a>, <em>...) dentro de un texto no
+    cortan la frase: se sustituyen por marcadores [1]...[/1] en el contenido
+    y el bloque guarda en 'inline' la etiqueta de cada marcador, de modo que
+    "Haga clic <a href="...">aquí</a> para continuar" se traduce como un
+    solo segmento (ver restore_inline_tags).
     """
     
     # Tags que contienen texto traducible
@@ -94,13 +260,17 @@ class HTMLBlockExtractor(HTMLParser):
     # Tags inline que se preservan
     INLINE_TAGS = {'strong', 'b', 'em', 'i', 'u', 'a', 'span'}
     
+    # Tags inline que viajan dentro del texto como marcadores
+    PLACEHOLDER_TAGS = INLINE_TAGS - TEXT_CONTAINERS
+    
     # Tags self-closing
     SELF_CLOSING = {'br', 'hr', 'img'}
     
     def __init__(self):
         super().__init__()
         self.blocks = []
-        self.current_text = []
+        # Texto pendiente: ('text', str), ('open', tag, attrs) o ('close', tag)
+        self.current_tokens = []
         self.text_index = 0  # Índice para mapear traducciones
         
     def handle_starttag(self, tag, attrs):
@@ -115,7 +285,10 @@ class HTMLBlockExtractor(HTMLParser):
                 'name': tag,
                 'attrs': attrs_dict
             })
-        elif tag in self.TEXT_CONTAINERS or tag in self.INLINE_TAGS:
+        elif tag in self.PLACEHOLDER_TAGS:
+            # Inline: forma parte del texto en curso
+            self.current_tokens.append(('open', tag, attrs_dict))
+        elif tag in self.TEXT_CONTAINERS:
             # Guardar contexto de tag
             self.blocks.append({
                 'type': 'tag_open',
@@ -125,11 +298,11 @@ class HTMLBlockExtractor(HTMLParser):
     
     def handle_endtag(self, tag):
         """Maneja cierre de etiquetas."""
-        if tag in self.TEXT_CONTAINERS:
+        if tag in self.PLACEHOLDER_TAGS:
+            self.current_tokens.append(('close', tag))
+        elif tag in self.TEXT_CONTAINERS:
             # Flush texto antes de cerrar contenedor
             self._flush_text()
-        
-        if tag in self.TEXT_CONTAINERS or tag in self.INLINE_TAGS:
             self.blocks.append({
                 'type': 'tag_close',
                 'name': tag
@@ -143,26 +316,100 @@ class HTMLBlockExtractor(HTMLParser):
         """
         # Solo acumular si hay contenido (pero preservar espacios/\n)
         if data:
-            self.current_text.append(data)
+            self.current_tokens.append(('text', data))
     
     def _flush_text(self):
-        """Guarda el texto acumulado como bloque.
+        """Guarda el texto acumulado como bloque(s).
         
         IMPORTANTE: Preserva espacios/saltos de línea en el texto original.
         Solo hace strip() para evitar bloques completamente vacíos.
+        
+        Las etiquetas inline que abren y cierran dentro del texto pasan a
+        marcadores; las que quedan sin pareja (abiertas antes de un <br>,
+        cerradas tras él...) se emiten como bloques y cortan el texto.
         """
-        if self.current_text:
-            text = ''.join(self.current_text)
+        tokens, self.current_tokens = self.current_tokens, []
+        if not tokens:
+            return
+        
+        # Emparejar aperturas y cierres inline dentro del texto
+        paired = set()
+        stack = []
+        for position, token in enumerate(tokens):
+            if token[0] == 'open':
+                stack.append(position)
+            elif token[0] == 'close':
+                for depth in range(len(stack) - 1, -1, -1):
+                    if tokens[stack[depth]][1] == token[1]:
+                        paired.update((stack[depth], position))
+                        del stack[depth:]
+                        break
+        
+        # Cortar el texto en las etiquetas sin pareja
+        segment = []
+        for position, token in enumerate(tokens):
+            if token[0] == 'text' or position in paired:
+                segment.append(token)
+                continue
+            self._emit_segment(segment)
+            segment = []
+            if token[0] == 'open':
+                self.blocks.append({'type': 'tag_open', 'name': token[1], 'attrs': token[2]})
+            else:
+                self.blocks.append({'type': 'tag_close', 'name': token[1]})
+        self._emit_segment(segment)
+    
+    def _emit_segment(self, tokens):
+        """Emite un tramo de texto con etiquetas inline emparejadas."""
+        text = ''.join(token[1] for token in tokens if token[0] == 'text')
+        has_tags = any(token[0] != 'text' for token in tokens)
+        
+        if not has_tags:
             # Solo guardar si hay contenido real (no solo whitespace)
             if text.strip():
                 # Guardar texto SIN strip para preservar estructura
-                self.blocks.append({
-                    'type': 'text',
-                    'content': text,
-                    'index': self.text_index
-                })
-                self.text_index += 1
-            self.current_text = []
+                self._append_text(text)
+            return
+        
+        if not text.strip() or INLINE_PLACEHOLDER.search(text):
+            # Sin texto (o con algo que ya parece un marcador): etiquetas
+            # como bloques y cada fragmento de texto por separado
+            for token in tokens:
+                if token[0] == 'text':
+                    if token[1].strip():
+                        self._append_text(token[1])
+                elif token[0] == 'open':
+                    self.blocks.append({'type': 'tag_open', 'name': token[1], 'attrs': token[2]})
+                else:
+                    self.blocks.append({'type': 'tag_close', 'name': token[1]})
+            return
+        
+        parts = []
+        inline = {}
+        open_ids = []
+        for token in tokens:
+            if token[0] == 'text':
+                parts.append(token[1])
+            elif token[0] == 'open':
+                tag_id = len(inline) + 1
+                inline[tag_id] = {'name': token[1], 'attrs': token[2]}
+                open_ids.append(tag_id)
+                parts.append(f'[{tag_id}]')
+            else:
+                parts.append(f'[/{open_ids.pop()}]')
+        self._append_text(''.join(parts), inline)
+    
+    def _append_text(self, content, inline=None):
+        """Añade un bloque de texto traducible."""
+        block = {
+            'type': 'text',
+            'content': content,
+            'index': self.text_index
+        }
+        if inline:
+            block['inline'] = inline
+        self.blocks.append(block)
+        self.text_index += 1
     
     def get_blocks(self) -> List[Dict]:
         """Retorna bloques extraídos."""
@@ -170,6 +417,181 @@ class HTMLBlockExtractor(HTMLParser):
         return self.blocks
 
 
+class SanitizingHTMLBlockExtractor(HTMLBlockExtractor):
+    """
+    Sanitiza y extrae bloques en una sola pasada sobre el HTML original.
+    
+    Produce los mismos bloques que
+    split_html_preserving_structure(sanitize_html(html, parser="html.parser"))
+    sin construir el árbol de BeautifulSoup ni volver a serializarlo:
+    - Etiquetas fuera de ALLOWED_TAGS: se descartan conservando su contenido
+    - Atributos fuera de ALLOWED_ATTRS: se eliminan
+    - <a> con href inseguro → <span>; <img> con src inseguro → se elimina
+    - Como el árbol de BeautifulSoup: un cierre cierra también los elementos
+      abiertos dentro de él, los cierres sin apertura se ignoran y lo que
+      quede abierto se cierra al final
+    - Texto formado solo por espacios entre dos etiquetas → " " o "\n"
+    """
+    
+    # Elementos vacíos según BeautifulSoup (nunca tienen contenido ni cierre)
+    VOID_TAGS = frozenset(HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS)
+    
+    # Elementos donde BeautifulSoup conserva el whitespace tal cual
+    PRESERVE_WHITESPACE_TAGS = frozenset(HTMLTreeBuilder.DEFAULT_PRESERVE_WHITESPACE_TAGS)
+    
+    # Espacios ASCII (BeautifulSoup.ASCII_SPACES)
+    ASCII_SPACES = ' \n\t\x0c\r'
+    
+    def __init__(self):
+        super().__init__()
+        # Elementos abiertos: (nombre_original, nombre_emitido o None si se descartó)
+        self.open_elements = []
+        # Texto desde la última etiqueta (BeautifulSoup lo une en un solo string)
+        self.pending_data = []
+        # Elementos vacíos abiertos como <br>: un </br> posterior se ignora
+        self.already_closed_void = []
+    
+    def handle_data(self, data):
+        """Acumula el texto hasta la siguiente etiqueta."""
+        self.pending_data.append(data)
+    
+    def _end_data(self):
+        """
+        Emite el texto pendiente como lo haría BeautifulSoup.
+        
+        Un string formado solo por espacios ASCII se reduce a un espacio
+        (o a un salto de línea si contiene alguno), salvo dentro de <pre>/<textarea>.
+        """
+        if not self.pending_data:
+            return
+        data = ''.join(self.pending_data)
+        self.pending_data = []
+        
+        if not data.strip(self.ASCII_SPACES) and not any(
+            tag in self.PRESERVE_WHITESPACE_TAGS for tag, _ in self.open_elements
+        ):
+            data = '\n' if '\n' in data else ' '
+        super().handle_data(data)
+    
+    def handle_comment(self, data):
+        """Los comentarios separan strings (no se emiten)."""
+        self._end_data()
+    
+    def handle_decl(self, decl):
+        self._end_data()
+    
+    def handle_pi(self, data):
+        self._end_data()
+    
+    def unknown_decl(self, data):
+        self._end_data()
+    
+    def handle_starttag(self, tag, attrs):
+        """Sanitiza la etiqueta y la emite si está permitida."""
+        self._open_element(tag, attrs)
+        if tag in self.VOID_TAGS:
+            self.already_closed_void.append(tag)
+    
+    def handle_startendtag(self, tag, attrs):
+        """Etiqueta <tag/>: apertura y cierre inmediato."""
+        self._open_element(tag, attrs)
+        self._close_to(tag)
+    
+    def handle_endtag(self, tag):
+        """Cierra el elemento abierto más reciente con ese nombre (y los internos)."""
+        if tag in self.already_closed_void:
+            # Cierre redundante de un elemento vacío (<br></br>): no corta el texto
+            self.already_closed_void.remove(tag)
+            return
+        self._close_to(tag)
+    
+    def _open_element(self, tag, attrs):
+        """Abre un elemento, emitiéndolo solo si está permitido."""
+        self._end_data()
+        emitted = None
+        
+        if tag in ALLOWED_TAGS:
+            attrs_dict = {}
+            for name, value in attrs:
+                if name in ALLOWED_ATTRS:
+                    # BeautifulSoup: atributo sin valor → "", class normalizada
+                    value = value or ""
+                    attrs_dict[name] = " ".join(value.split()) if name == 'class' else value
+            
+            emitted = tag
+            if tag == 'a' and 'href' in attrs_dict and not is_safe_url(attrs_dict['href']):
+                del attrs_dict['href']
+                emitted = 'span'
+            elif tag == 'img' and 'src' in attrs_dict and not is_safe_url(attrs_dict['src']):
+                emitted = None
+            
+            if emitted:
+                super().handle_starttag(emitted, list(attrs_dict.items()))
+        
+        if tag not in self.VOID_TAGS:
+            self.open_elements.append((tag, emitted))
+    
+    def _close_to(self, tag):
+        """Cierra el elemento abierto más reciente con ese nombre (y los internos)."""
+        self._end_data()
+        if tag in self.VOID_TAGS:
+            return
+        
+        for depth in range(len(self.open_elements) - 1, -1, -1):
+            if self.open_elements[depth][0] == tag:
+                break
+        else:
+            return  # Cierre sin apertura
+        
+        while len(self.open_elements) > depth:
+            self._close_element()
+    
+    def _close_element(self):
+        """Cierra el elemento abierto más interno."""
+        _, emitted = self.open_elements.pop()
+        if emitted:
+            super().handle_endtag(emitted)
+    
+    def get_blocks(self) -> List[Dict]:
+        """Procesa lo pendiente, cierra los elementos abiertos y retorna los bloques."""
+        self.close()
+        self._end_data()
+        while self.open_elements:
+            self._close_element()
+        return super().get_blocks()
+
+
+def sanitize_and_split_html(html: str) -> tuple[List[Dict], List[str]]:
+    """
+    Sanitiza el HTML y extrae bloques y textos para traducir en una sola pasada.
+    
+    Equivale a split_html_preserving_structure(sanitize_html(html)) con el
+    backend html.parser, pero sin parsear y serializar el HTML dos veces
+    (relevante en emails de marketing grandes).
+    
+    Args:
+        html: HTML del correo (sin sanitizar)
+        
+    Returns:
+        Tupla (bloques_estructura, textos_a_traducir), ver split_html_preserving_structure
+    """
+    if not html or not html.strip():
+        return [], []
+    
+    parser = SanitizingHTMLBlockExtractor()
+    
+    try:
+        parser.feed(html)
+        blocks = parser.get_blocks()
+    except Exception:
+        # Si el parsing falla, usar el camino en dos pasadas
+        from app.utils_html import sanitize_html
+        return split_html_preserving_structure(sanitize_html(html, parser="html.parser"))
+    
+    texts = [block['content'] for block in blocks if block['type'] == 'text']
+    return blocks, texts
+
+
 def split_html_preserving_structure(html: str) -> tuple[List[Dict], List[str]]:
     """
     Extrae bloques de HTML y textos para traducir.
@@ -204,13 +626,173 @@ def split_html_preserving_structure(html: str) -> tuple[List[Dict], List[str]]:
     return blocks, texts
 
 
+def collect_attribute_texts(blocks: List[Dict], texts: List[str]) -> List[str]:
+    """
+    Añade los atributos traducibles (alt, title, placeholder) a los textos.
+    
+    Los valores se numeran a continuación de los textos para traducirlos en
+    el mismo batch (y deduplicarlos con ellos); cada bloque guarda en
+    'attr_indices' el índice de la traducción de cada atributo, que
+    rehydrate_html usa al reconstruir.
+    
+    Args:
+        blocks: Bloques de split_html_preserving_structure (se modifican)
+        texts: Textos a traducir de esos bloques
+        
+    Returns:
+        Textos a traducir: los de los bloques seguidos de los atributos
+    """
+    texts = list(texts)
+    for block in blocks:
+        if block['type'] in ('tag_open', 'tag_self'):
+            tags = [block]
+        elif block['type'] == 'text' and 'inline' in block:
+            # Etiquetas inline dentro del texto (ej: <a title="...">)
+            tags = list(block['inline'].values())
+        else:
+            continue
+        for tag in tags:
+            attrs = tag.get('attrs', {})
+            for name in TRANSLATABLE_ATTRS:
+                value = attrs.get(name)
+                if value and value.strip():
+                    tag.setdefault('attr_indices', {})[name] = len(texts)
+                    texts.append(value)
+    return texts
+
+
+def restore_inline_tags(
+    text: str,
+    inline: Dict[int, Dict],
+    translations: List[str] = ()
+) -> Optional[str]:
+    """
+    Sustituye los marcadores [n]...[/n] de un texto por sus etiquetas inline.
+    
+    Args:
+        text: Texto (traducido) con marcadores
+        inline: Etiqueta de cada marcador ({n: {"name", "attrs"}}) del bloque
+        translations: Traducciones de atributos (ver collect_attribute_texts)
+        
+    Returns:
+        HTML con las etiquetas, o None si los marcadores no son válidos
+        (falta alguno, aparece duplicado o desconocido, o no anidan bien)
+    """
+    parts = []
+    stack = []
+    seen = set()
+    last = 0
+    for match in INLINE_PLACEHOLDER.finditer(text):
+        tag_id = int(match.group(2))
+        tag = inline.get(tag_id)
+        if tag is None:
+            return None
+        if match.group(1):
+            if not stack or stack[-1] != tag_id:
+                return None
+            stack.pop()
+            parts.append(text[last:match.start()])
+            parts.append(f'</{tag["name"]}>')
+        else:
+            if tag_id in seen:
+                return None
+            seen.add(tag_id)
+            stack.append(tag_id)
+            parts.append(text[last:match.start()])
+            parts.append(f'<{tag["name"]}{_render_attrs(tag, translations)}>')
+        last = match.end()
+    
+    if stack or len(seen) != len(inline):
+        return None
+    parts.append(text[last:])
+    return ''.join(parts)
+
+
+def translate_text_blocks(
+    blocks: List[Dict],
+    texts: List[str],
+    translate_many: Callable[[List[str]], List[str]]
+) -> List[str]:
+    """
+    Traduce los textos de los bloques validando los marcadores inline.
+    
+    Los textos se traducen en un batch. Si en la traducción de un bloque con
+    etiquetas inline los marcadores no se pueden restaurar, ese bloque se
+    traduce por fragmentos (el texto entre etiquetas, en un segundo batch
+    común a todos los bloques fallidos) y se recompone con sus marcadores.
+    
+    Args:
+        blocks: Bloques de split_html_preserving_structure
+        texts: Textos a traducir (con los de atributos al final, si los hay)
+        translate_many: Traduce una lista de textos (mismo orden)
+        
+    Returns:
+        Traducciones listas para rehydrate_html
+    """
+    translations = list(translate_many(texts))
+    
+    failed = [
+        block for block in blocks
+        if block['type'] == 'text' and 'inline' in block
+        and block['index'] < len(translations)
+        and restore_inline_tags(translations[block['index']], block['inline']) is None
+    ]
+    if not failed:
+        return translations
+    
+    metrics.incr("inline_placeholder_fallbacks", len(failed))
+    
+    # Fragmentos de texto de cada bloque fallido: marcadores tal cual,
+    # texto como índice en el batch (conservando espacios de los extremos)
+    fragments = []
+    layouts = []
+    for block in failed:
+        layout = []
+        for part in _PLACEHOLDER_SPLIT.split(block['content']):
+            core = part.strip()
+            if not core or _PLACEHOLDER_SPLIT.fullmatch(part):
+                layout.append(part)
+                continue
+            leading = part[:len(part) - len(part.lstrip())]
+            trailing = part[len(part.rstrip()):]
+            layout.append((leading, len(fragments), trailing))
+            fragments.append(core)
+        layouts.append(layout)
+    
+    fragment_translations = translate_many(fragments) if fragments else []
+    for block, layout in zip(failed, layouts):
+        translations[block['index']] = ''.join(
+            part if isinstance(part, str)
+            else part[0] + fragment_translations[part[1]] + part[2]
+            for part in layout
+        )
+    return translations
+
+
+def _render_attrs(block: Dict, translations: List[str]) -> str:
+    """Atributos de un bloque de etiqueta (escapados, con traducciones si las hay)."""
+    attrs = block.get('attrs', {})
+    if not attrs:
+        return ''
+    
+    attr_indices = block.get('attr_indices', {})
+    parts = []
+    for name, value in attrs.items():
+        idx = attr_indices.get(name)
+        if idx is not None and idx < len(translations):
+            value = translations[idx]
+        parts.append(f'{name}="{escape(value or "", quote=True)}"')
+    return ' ' + ' '.join(parts)
+
+
 def rehydrate_html(blocks: List[Dict], translations: List[str]) -> str:
     """
     Reconstruye HTML insertando traducciones.
     
     Args:
         blocks: Bloques de estructura original
-        translations: Traducciones correspondientes a bloques de texto (mismo orden)
+        translations: Traducciones correspondientes a bloques de texto (mismo orden),
+                      seguidas de las de atributos si se usó collect_attribute_texts
         
     Returns:
         HTML reconstruido con textos traducidos
@@ -222,52 +804,58 @@ def rehydrate_html(blocks: List[Dict], translations: List[str]) -> str:
             # Insertar traducción correspondiente
             idx = block.get('index', 0)
             if idx < len(translations):
-                html_parts.append(translations[idx])
+                text = translations[idx]
             else:
                 # Fallback: usar contenido original
-                html_parts.append(block['content'])
-                
-        elif block['type'] == 'tag_open':
-            # Reconstruir tag de apertura con atributos
-            tag = block['name']
-            attrs = block.get('attrs', {})
+                text = block['content']
             
-            if attrs:
-                attrs_str = ' '.join(f'{k}="{v}"' for k, v in attrs.items())
-                html_parts.append(f'<{tag} {attrs_str}>')
-            else:
-                html_parts.append(f'<{tag}>')
+            if 'inline' in block:
+                # Marcadores [n]...[/n] → etiquetas inline; si no son válidos
+                # (ver translate_text_blocks) se conserva solo el texto
+                restored = restore_inline_tags(text, block['inline'], translations)
+                text = restored if restored is not None else INLINE_PLACEHOLDER.sub('', text)
+            html_parts.append(text)
+                
+        elif block['type'] in ('tag_open', 'tag_self'):
+            # Reconstruir tag de apertura (o vacía) con atributos
+            html_parts.append(f'<{block["name"]}{_render_attrs(block, translations)}>')
                 
         elif block['type'] == 'tag_close':
             html_parts.append(f'</{block["name"]}>')
-            
-        elif block['type'] == 'tag_self':
-            tag = block['name']
-            attrs = block.get('attrs', {})
-            
-            if attrs:
-                attrs_str = ' '.join(f'{k}="{v}"' for k, v in attrs.items())
-                html_parts.append(f'<{tag} {attrs_str}>')
-            else:
-                html_parts.append(f'<{tag}>')
     
     return ''.join(html_parts)
 
 
+def _is_inline_content(node) -> bool:
+    """True si el nodo es texto o una etiqueta inline que solo contiene eso."""
+    if isinstance(node, Tag):
+        return (
+            node.name in HTMLBlockExtractor.PLACEHOLDER_TAGS
+            and all(_is_inline_content(child) for child in node.children)
+        )
+    # Texto plano (no comentarios, CDATA, etc.)
+    return type(node) is NavigableString
+
+
 def translate_html_preserving_structure(
     html: str,
-    translate_fn: Callable[[str], str]
+    translate_fn: Callable[[str], str],
+    translate_attributes: bool = False
 ) -> str:
     """
     Traduce HTML preservando TODA la estructura: etiquetas, <br>, <p>, etc.
     
-    Usa BeautifulSoup para navegar el DOM y solo traduce nodos de texto,
-    dejando todas las etiquetas intactas.
+    Usa BeautifulSoup para navegar el DOM y solo traduce nodos de texto
+    (y opcionalmente alt/title/placeholder), dejando todas las etiquetas
+    intactas. El texto partido por etiquetas inline se traduce como un solo
+    segmento con marcadores [n]...[/n]. Cada texto distinto se traduce una
+    sola vez.
     
     Args:
         html: HTML a traducir
         translate_fn: Función que traduce un string de texto plano
                      Firma: fn(text: str) -> str
+        translate_attributes: Traducir también los atributos de TRANSLATABLE_ATTRS
         
     Returns:
         HTML traducido con estructura idéntica
@@ -276,11 +864,78 @@ def translate_html_preserving_structure(
         return html
     
     try:
-        soup = BeautifulSoup(html, 'html.parser')
+        soup = parse_html_fragment(html)
     except Exception:
         # Si falla el parsing, traducir como texto plano
         return translate_fn(html)
     
+    translations = {}
+    
+    def translate(text):
+        """translate_fn con dedup: textos y atributos repetidos se traducen una vez."""
+        if text not in translations:
+            translations[text] = translate_fn(text)
+        return translations[text]
+    
+    def translated_attrs(tag):
+        """Atributos de una etiqueta (traducibles ya traducidos, si se pide)."""
+        attrs = {}
+        for name, value in tag.attrs.items():
+            if isinstance(value, list):
+                value = ' '.join(value)
+            if translate_attributes and name in TRANSLATABLE_ATTRS and value.strip():
+                value = translate(value.strip())
+            attrs[name] = value
+        return attrs
+    
+    def placeholders(nodes, inline):
+        """Texto de un tramo inline con marcadores [n]...[/n] (None si ya los tiene)."""
+        parts = []
+        for node in nodes:
+            if isinstance(node, Tag):
+                tag_id = len(inline) + 1
+                inline[tag_id] = {'name': node.name, 'attrs': translated_attrs(node)}
+                inner = placeholders(node.children, inline)
+                if inner is None:
+                    return None
+                parts.append(f'[{tag_id}]{inner}[/{tag_id}]')
+            elif INLINE_PLACEHOLDER.search(node):
+                return None
+            else:
+                parts.append(str(node))
+        return ''.join(parts)
+    
+    def translate_run(run):
+        """
+        Traduce un tramo de texto con etiquetas inline como un solo segmento.
+        
+        Si el tramo no tiene etiquetas, ya contiene algo parecido a un
+        marcador o la traducción no conserva los marcadores, se traduce
+        nodo a nodo.
+        """
+        if any(isinstance(node, Tag) for node in run):
+            inline = {}
+            text = placeholders(run, inline)
+            if text is not None and text.strip():
+                leading_space = text[:len(text) - len(text.lstrip())]
+                trailing_space = text[len(text.rstrip()):]
+                restored = restore_inline_tags(
+                    escape(translate(text.strip()), quote=False), inline
+                )
+                if restored is not None:
+                    fragment = parse_html_fragment(
+                        escape(leading_space) + restored + escape(trailing_space)
+                    )
+                    for new_node in list(fragment.contents):
+                        run[0].insert_before(new_node)
+                    for node in run:
+                        node.extract()
+                    return
+                metrics.incr("inline_placeholder_fallbacks")
+        
+        for node in run:
+            translate_node(node)
+    
     def translate_node(node):
         """Recorre recursivamente y traduce solo texto."""
         if isinstance(node, NavigableString):
@@ -293,14 +948,27 @@ def translate_html_preserving_structure(
                 core_text = text.strip()
                 
                 if core_text:
-                    translated_core = translate_fn(core_text)
+                    translated_core = translate(core_text)
                     node.replace_with(NavigableString(leading_space + translated_core + trailing_space))
         
         elif isinstance(node, Tag):
-            # Es una etiqueta: procesar hijos recursivamente
-            # NO traducir atributos (como alt, title, etc.) por ahora
+            # Es una etiqueta: atributos traducibles (si se pide) e hijos
+            if translate_attributes:
+                for name in TRANSLATABLE_ATTRS:
+                    value = node.attrs.get(name)
+                    if isinstance(value, str) and value.strip():
+                        node.attrs[name] = translate(value.strip())
+            
+            # Texto y etiquetas inline consecutivos se traducen juntos
+            run = []
             for child in list(node.children):
+                if _is_inline_content(child):
+                    run.append(child)
+                    continue
+                translate_run(run)
+                run = []
                 translate_node(child)
+            translate_run(run)
     
     # Traducir todos los nodos
     translate_node(soup)
@@ -16,9 +16,22 @@ class Settings:
     MODEL_DIR: str = os.getenv("MODEL_DIR", "./models/nllb-600m")
     CT2_DIR: str = os.getenv("CT2_DIR", "./models/nllb-600m-ct2-int8")
     
+    # Tokenizador: hf (transformers.AutoTokenizer) o sentencepiece (modelo
+    # sentencepiece.bpe.model de MODEL_DIR, sin cargar transformers)
+    TOKENIZER_BACKEND: str = os.getenv("TOKENIZER_BACKEND", "hf")
+    
     # CTranslate2 performance (valores conservadores para evitar cuelgues)
     CT2_INTER_THREADS: int = int(os.getenv("CT2_INTER_THREADS", "4"))
     CT2_INTRA_THREADS: int = int(os.getenv("CT2_INTRA_THREADS", "4"))
+    # Tipo de cómputo de ct.Translator (int8, int8_float32, int16, float32...)
+    CT2_COMPUTE_TYPE: str = os.getenv("CT2_COMPUTE_TYPE", "int8")
+    # Segmentos por chunk del pipeline de inferencia: el chunk siguiente se
+    # tokeniza y envía a CT2 mientras se post-procesa el anterior (0 = un chunk)
+    PIPELINE_BATCH_SIZE: int = int(os.getenv("PIPELINE_BATCH_SIZE", "32"))
+    # Repartir los segmentos de una petición entre las réplicas libres
+    SPLIT_BATCH_ACROSS_REPLICAS: bool = os.getenv("SPLIT_BATCH_ACROSS_REPLICAS", "true").lower() == "true"
+    # Restringir el vocabulario de salida con CT2_DIR/vmap.txt (scripts/build_vmap.py)
+    CT2_USE_VMAP: bool = os.getenv("CT2_USE_VMAP", "false").lower() == "true"
     BEAM_SIZE: int = int(os.getenv("BEAM_SIZE", "3"))
     
     # Tokens: configuración dinámica según hardware y caso de uso
@@ -31,6 +44,24 @@ class Settings:
     AUTO_SEGMENT_THRESHOLD: float = 0.9
     MAX_SEGMENT_CHARS: int = int(os.getenv("MAX_SEGMENT_CHARS", "10000"))  # muy alto para evitar segmentación innecesaria
     
+    # Presupuesto de tokens por segmento (NLLB se entrenó con ~512 tokens): se
+    # empaquetan oraciones de un mismo párrafo hasta este límite. 0 = desactivado
+    # (solo se segmenta por MAX_SEGMENT_CHARS)
+    MAX_SEGMENT_TOKENS: int = int(os.getenv("MAX_SEGMENT_TOKENS", "256"))
+    
+    # Caché a nivel de oración (reutiliza oraciones de párrafos largos)
+    SENTENCE_CACHE: bool = os.getenv("SENTENCE_CACHE", "false").lower() == "true"
+    SENTENCE_CACHE_MIN_CHARS: int = int(os.getenv("SENTENCE_CACHE_MIN_CHARS", "200"))
+    
+    # Glosarios con nombre (PUT /glossaries/{name}), persistidos como JSON
+    GLOSSARY_DIR: str = os.getenv("GLOSSARY_DIR", "./data/glossaries")
+    
+    # Reglas de post-procesado por cliente (<nombre>.json, recarga en caliente)
+    RULESETS_DIR: str = os.getenv("RULESETS_DIR", "./data/rulesets")
+    
+    # Backend de parsing HTML: auto (lxml si está instalado), lxml o html.parser
+    HTML_PARSER: str = os.getenv("HTML_PARSER", "auto")
+    
     # Servidor
     HOST: str = os.getenv("HOST", "0.0.0.0")
     PORT: int = int(os.getenv("PORT", "8000"))
@@ -45,6 +76,15 @@ class Settings:
     # Post-procesado danés
     FORMAL_DA: bool = os.getenv("FORMAL_DA", "false").lower() == "true"
     
+    # Validación de salida: proporción mínima de caracteres latinos por idioma
+    # destino (por debajo se reintenta con beam mayor)
+    LATIN_MIN_RATIO_DA: float = float(os.getenv("LATIN_MIN_RATIO_DA", "0.8"))
+    LATIN_MIN_RATIO_ES: float = float(os.getenv("LATIN_MIN_RATIO_ES", "0.8"))
+    
+    # Administración (vacío = endpoints /admin deshabilitados)
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+    PROFILE_MAX_SECONDS: int = int(os.getenv("PROFILE_MAX_SECONDS", "60"))
+    
     # Límites
     MAX_BATCH_SIZE: int = int(os.getenv("MAX_BATCH_SIZE", "16"))
     REQUEST_TIMEOUT: int = int(os.getenv("REQUEST_TIMEOUT", "300"))
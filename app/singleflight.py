@@ -0,0 +1,75 @@
+"""
+Coalescencia "single-flight" de traducciones idénticas en curso.
+
+Cuando varias peticiones concurrentes necesitan el mismo segmento (misma clave
+de caché) y ninguna lo encuentra en caché, solo la primera (líder) lo traduce;
+las demás esperan el mismo Future y reciben su resultado.
+"""
+import threading
+from concurrent.futures import Future
+from typing import Dict, Tuple
+
+
+class SingleFlight:
+    """
+    Registro thread-safe de cálculos en curso indexados por clave.
+
+    Uso:
+        is_leader, future = inflight.claim(key)
+        if is_leader:
+            try:
+                value = compute()
+            except Exception as e:
+                inflight.fail(key, e)
+                raise
+            inflight.resolve(key, value)
+        else:
+            value = future.result(timeout=...)
+    """
+
+    def __init__(self):
+        """Inicializa el registro vacío."""
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+
+    def claim(self, key: str) -> Tuple[bool, Future]:
+        """
+        Reclama el cálculo de una clave.
+
+        Args:
+            key: Clave del cálculo (clave de caché)
+
+        Returns:
+            Tupla (es_líder, future). Si es_líder es False, otro hilo ya
+            está calculando la clave y basta con esperar el future.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return False, future
+            future = Future()
+            self._calls[key] = future
+            return True, future
+
+    def resolve(self, key: str, value):
+        """Publica el resultado de una clave y la libera."""
+        with self._lock:
+            future = self._calls.pop(key, None)
+        if future is not None:
+            future.set_result(value)
+
+    def fail(self, key: str, exc: BaseException):
+        """Propaga un error a los que esperan la clave y la libera."""
+        with self._lock:
+            future = self._calls.pop(key, None)
+        if future is not None:
+            future.set_exception(exc)
+
+    def __len__(self) -> int:
+        """Número de claves en curso."""
+        with self._lock:
+            return len(self._calls)
+
+
+# Instancia global de traducciones en curso
+inflight_translations = SingleFlight()
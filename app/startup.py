@@ -8,13 +8,18 @@ import os
 import logging
 import traceback
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
 
 import ctranslate2 as ct
-from transformers import AutoTokenizer
 
 from app.settings import settings
+from app.tokenization import (
+    TOKENIZER_BACKENDS,
+    build_direction_tokenizers,
+    build_sentencepiece_direction_tokenizers,
+    load_trimmed_vocabulary,
+)
 
 
 logger = logging.getLogger(__name__)
@@ -42,9 +47,15 @@ class ModelManager:
             return
             
         self.translator: Optional[ct.Translator] = None
-        self.tokenizer: Optional[AutoTokenizer] = None
+        self.tokenizer = None  # AutoTokenizer HF (solo con TOKENIZER_BACKEND=hf)
         self.tgt_bos_tok: Optional[str] = None
         self.tgt_lang_id: Optional[int] = None
+        # Tokenización inmutable por dirección ("es-da", "da-es")
+        self.direction_tokenizers: Dict[str, object] = {}
+        # Piezas del modelo CT2 recortado (scripts/trim_vocab.py); 0 = vocabulario completo
+        self.trimmed_vocab_size: int = 0
+        # Vocabulario de salida restringido (CT2_USE_VMAP y CT2_DIR/vmap.txt)
+        self.use_vmap: bool = False
         
         self.model_loaded: bool = False
         self.last_error: Optional[str] = None
@@ -159,43 +170,28 @@ class ModelManager:
                 logger.error(self.last_error)
                 return False
             
-            # 2. Cargar tokenizador HuggingFace
-            logger.info(f"Cargando tokenizador desde {settings.MODEL_DIR}...")
-            self.tokenizer = AutoTokenizer.from_pretrained(settings.MODEL_DIR)
-            
-            # 3. Configurar idioma source
-            if hasattr(self.tokenizer, 'src_lang'):
-                self.tokenizer.src_lang = settings.SOURCE_LANG
-                logger.info(f"✓ Idioma source configurado: {settings.SOURCE_LANG}")
-            
-            # 4. Obtener token de idioma target
-            if not hasattr(self.tokenizer, 'lang_code_to_id'):
-                raise ValueError("El tokenizador no soporta lang_code_to_id (no es NLLB)")
-            
-            self.tgt_lang_id = self.tokenizer.lang_code_to_id.get(settings.TARGET_LANG)
-            if self.tgt_lang_id is None:
-                raise ValueError(f"No se encontró ID para idioma {settings.TARGET_LANG}")
-            
-            self.tgt_bos_tok = self.tokenizer.convert_ids_to_tokens(self.tgt_lang_id)
-            logger.info(f"✓ Token idioma target: {self.tgt_bos_tok} (ID: {self.tgt_lang_id})")
+            # 2. Tokenizadores por dirección (el idioma source va fijo en cada
+            #    uno; ningún tokenizador compartido se modifica por petición)
+            self._load_tokenizers()
             
-            # 5. Cargar traductor CTranslate2
+            # 3. Cargar traductor CTranslate2
             logger.info(f"Cargando modelo CT2 desde {settings.CT2_DIR}...")
             self.translator = ct.Translator(
                 settings.CT2_DIR,
                 device="cpu",
                 inter_threads=settings.CT2_INTER_THREADS if settings.CT2_INTER_THREADS > 0 else 0,
                 intra_threads=settings.CT2_INTRA_THREADS if settings.CT2_INTRA_THREADS > 0 else 0,
-                compute_type="int8"
+                compute_type=settings.CT2_COMPUTE_TYPE
             )
             logger.info("✓ Modelo CT2 cargado")
+            self.use_vmap = self._resolve_vmap()
             
-            # 6. Warmup (OMITIDO - causa hang en Windows con CTranslate2)
+            # 4. Warmup (OMITIDO - causa hang en Windows con CTranslate2)
             # El modelo funciona perfectamente sin warmup
             logger.info("Omitiendo warmup (puede causar hang en Windows)")
             logger.info("✓ Modelo listo - primera traducción será ~2s más lenta")
             
-            # 7. Marcar como cargado
+            # 5. Marcar como cargado
             self.model_loaded = True
             self.last_error = None
             self.load_completed_at = datetime.now()
@@ -233,6 +229,74 @@ class ModelManager:
             
             return False
     
+    def _load_tokenizers(self):
+        """
+        Carga la tokenización según TOKENIZER_BACKEND.
+        
+        - sentencepiece: MODEL_DIR/sentencepiece.bpe.model, sin transformers
+        - hf (defecto): AutoTokenizer de transformers (import diferido)
+        
+        Si CT2_DIR es un modelo recortado, ambos backends se limitan a su vocabulario.
+        Un TOKENIZER_BACKEND desconocido es un error (no se cae a hf en silencio).
+        """
+        if settings.TOKENIZER_BACKEND not in TOKENIZER_BACKENDS:
+            raise ValueError(
+                f"TOKENIZER_BACKEND inválido: '{settings.TOKENIZER_BACKEND}' "
+                f"(valores admitidos: {', '.join(TOKENIZER_BACKENDS)})"
+            )
+        
+        vocabulary = load_trimmed_vocabulary(settings.CT2_DIR)
+        self.trimmed_vocab_size = len(vocabulary) if vocabulary is not None else 0
+        if vocabulary is not None:
+            logger.info(f"Modelo CT2 recortado: {len(vocabulary)} piezas de vocabulario")
+        
+        if settings.TOKENIZER_BACKEND == "sentencepiece":
+            logger.info(f"Cargando SentencePiece desde {settings.MODEL_DIR}...")
+            self.tokenizer = None
+            self.direction_tokenizers = build_sentencepiece_direction_tokenizers(
+                settings.MODEL_DIR, vocabulary
+            )
+            self.tgt_lang_id = None
+            self.tgt_bos_tok = self.direction_tokenizers["es-da"].tgt_bos_tok
+        else:
+            from transformers import AutoTokenizer
+            
+            logger.info(f"Cargando tokenizador desde {settings.MODEL_DIR}...")
+            self.tokenizer = AutoTokenizer.from_pretrained(settings.MODEL_DIR)
+            self.direction_tokenizers = build_direction_tokenizers(self.tokenizer, vocabulary)
+            
+            self.tgt_lang_id = self.tokenizer.lang_code_to_id.get(settings.TARGET_LANG)
+            if self.tgt_lang_id is None:
+                raise ValueError(f"No se encontró ID para idioma {settings.TARGET_LANG}")
+            self.tgt_bos_tok = self.tokenizer.convert_ids_to_tokens(self.tgt_lang_id)
+        
+        logger.info(
+            f"✓ Tokenización {settings.TOKENIZER_BACKEND} por dirección: "
+            f"{', '.join(self.direction_tokenizers)} (token target: {self.tgt_bos_tok})"
+        )
+
+    def _resolve_vmap(self) -> bool:
+        """
+        Decide si las traducciones usan el vmap de CT2_DIR.
+
+        El vmap lo copia ct2-transformers-converter (--vocab_mapping) como
+        vmap.txt; si se pide con CT2_USE_VMAP pero no existe, se avisa y se
+        traduce con el vocabulario completo.
+        """
+        if not settings.CT2_USE_VMAP:
+            return False
+
+        vmap_path = Path(settings.CT2_DIR) / "vmap.txt"
+        if not vmap_path.exists():
+            logger.warning(
+                f"CT2_USE_VMAP=true pero no existe {vmap_path} "
+                "(convierte con: make vmap); se usa el vocabulario completo"
+            )
+            return False
+
+        logger.info(f"✓ Vocabulario de salida restringido: {vmap_path}")
+        return True
+
     def health(self) -> dict:
         """
         Retorna información de salud y estado del modelo.
@@ -257,6 +321,10 @@ class ModelManager:
                 "source_lang": settings.SOURCE_LANG,
                 "target_lang": settings.TARGET_LANG,
                 "beam_size": settings.BEAM_SIZE,
+                "tokenizer_backend": settings.TOKENIZER_BACKEND,
+                "compute_type": settings.CT2_COMPUTE_TYPE,
+                "use_vmap": self.use_vmap,
+                "trimmed_vocab_size": self.trimmed_vocab_size,
                 "inter_threads": settings.CT2_INTER_THREADS,
                 "intra_threads": settings.CT2_INTRA_THREADS
             },
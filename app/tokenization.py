@@ -0,0 +1,333 @@
+"""
+Tokenización por dirección de traducción sin estado mutable compartido.
+
+El tokenizador HF de NLLB decide el token de idioma origen a partir de
+`tokenizer.src_lang`, un atributo mutable compartido por todas las peticiones.
+Cambiarlo en cada llamada obligaba a serializar la tokenización con un lock.
+
+DirectionTokenizer fija el idioma de cada dirección al construirse y añade el
+prefijo manualmente (`[src_lang] tokens </s>`, formato NLLB no legacy), de modo
+que tokenizar es de solo lectura y puede ejecutarse en paralelo entre hilos.
+
+Dos backends con la misma interfaz (TOKENIZER_BACKEND):
+- hf: tokenizador HF de transformers (DirectionTokenizer)
+- sentencepiece: el modelo sentencepiece.bpe.model directamente, sin importar
+  transformers ni pasar por IDs (SentencePieceDirectionTokenizer)
+
+Con un modelo CT2 recortado (scripts/trim_vocab.py) ambos backends reciben el
+vocabulario conservado y re-segmentan las piezas que no están en él.
+"""
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# Códigos NLLB (origen, destino) por dirección de traducción
+DIRECTION_LANGS: Dict[str, Tuple[str, str]] = {
+    "es-da": ("spa_Latn", "dan_Latn"),
+    "da-es": ("dan_Latn", "spa_Latn"),
+}
+
+# Fichero SentencePiece del modelo NLLB en MODEL_DIR
+SPM_MODEL_FILE = "sentencepiece.bpe.model"
+
+# Valores admitidos de TOKENIZER_BACKEND
+TOKENIZER_BACKENDS = ("hf", "sentencepiece")
+
+# Tokens especiales que HF descarta al decodificar (skip_special_tokens=True)
+SPECIAL_TOKENS = frozenset(["<s>", "</s>", "<pad>", "<unk>", "<mask>"])
+LANG_CODE_TOKEN = re.compile(r'^[a-z]{3}_[A-Z][a-z]{3}$')
+
+# Vocabulario conservado por scripts/trim_vocab.py (una pieza por línea, en CT2_DIR)
+TRIMMED_VOCAB_FILE = "trimmed_vocab.txt"
+
+
+def clean_up_tokenization(text: str) -> str:
+    """Réplica de clean_up_tokenization_spaces=True de transformers."""
+    return (
+        text.replace(" .", ".")
+        .replace(" ?", "?")
+        .replace(" !", "!")
+        .replace(" ,", ",")
+        .replace(" ' ", "'")
+        .replace(" n't", "n't")
+        .replace(" 'm", "'m")
+        .replace(" 's", "'s")
+        .replace(" 've", "'ve")
+        .replace(" 're", "'re")
+    )
+
+
+class RestrictedVocabulary:
+    """
+    Vocabulario recortado: re-segmenta las piezas que el modelo CT2 no conoce.
+
+    Una pieza fuera del vocabulario se divide de izquierda a derecha en la pieza
+    conservada más larga (manteniendo el prefijo ▁ de inicio de palabra); los
+    caracteres sin pieza propia pasan a <unk>, como haría el modelo completo con
+    un carácter desconocido. Las divisiones se memorizan: el vocabulario de
+    entrada es finito y el resultado no depende del contexto.
+    """
+
+    def __init__(self, pieces: Iterable[str]):
+        self.pieces = frozenset(pieces)
+        self.max_piece_len = max((len(piece) for piece in self.pieces), default=1)
+        self._splits: Dict[str, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.pieces)
+
+    def split(self, piece: str) -> List[str]:
+        """Piezas conservadas equivalentes a `piece`."""
+        if piece in self.pieces:
+            return [piece]
+
+        cached = self._splits.get(piece)
+        if cached is not None:
+            return cached
+
+        parts = []
+        start = 0
+        while start < len(piece):
+            for end in range(min(len(piece), start + self.max_piece_len), start, -1):
+                if piece[start:end] in self.pieces:
+                    parts.append(piece[start:end])
+                    start = end
+                    break
+            else:
+                parts.append("<unk>")
+                start += 1
+
+        # Escritura idempotente: no necesita lock entre hilos
+        self._splits[piece] = parts
+        return parts
+
+    def apply(self, tokens: List[str]) -> List[str]:
+        """Re-segmenta una secuencia de piezas."""
+        if all(token in self.pieces for token in tokens):
+            return tokens
+        return [part for token in tokens for part in self.split(token)]
+
+
+class DirectionTokenizer:
+    """
+    Codificador/decodificador de una dirección (inmutable tras construirse).
+
+    Envuelve el tokenizador HF compartido sin modificarlo: siempre lo llama con
+    los mismos argumentos (sin tokens especiales, sin truncado ni padding), así
+    el backend rápido no reconfigura su estado interno entre llamadas.
+    """
+
+    def __init__(
+        self,
+        tokenizer,
+        src_lang: str,
+        tgt_lang: str,
+        vocabulary: Optional[RestrictedVocabulary] = None
+    ):
+        """
+        Args:
+            tokenizer: Tokenizador HF de NLLB (compartido, solo lectura)
+            src_lang: Código NLLB del idioma origen (p.ej. spa_Latn)
+            tgt_lang: Código NLLB del idioma destino (p.ej. dan_Latn)
+            vocabulary: Vocabulario del modelo CT2 recortado (None = completo)
+
+        Raises:
+            ValueError: Si el tokenizador no es NLLB o no conoce los idiomas
+        """
+        if not hasattr(tokenizer, 'lang_code_to_id'):
+            raise ValueError("El tokenizador no soporta lang_code_to_id (no es NLLB)")
+
+        for lang in (src_lang, tgt_lang):
+            if tokenizer.lang_code_to_id.get(lang) is None:
+                raise ValueError(f"No se encontró token para idioma {lang}")
+
+        self.tokenizer = tokenizer
+        self.src_lang = src_lang
+        self.tgt_lang = tgt_lang
+        self.src_lang_tok: str = tokenizer.convert_ids_to_tokens(tokenizer.lang_code_to_id[src_lang])
+        self.tgt_bos_tok: str = tokenizer.convert_ids_to_tokens(tokenizer.lang_code_to_id[tgt_lang])
+        self.eos_tok: str = getattr(tokenizer, 'eos_token', None) or "</s>"
+        self.vocabulary = vocabulary
+
+    def _pieces(self, texts: List[str]) -> List[List[str]]:
+        """Piezas de cada texto, sin tokens especiales."""
+        encoded = self.tokenizer(
+            texts,
+            add_special_tokens=False,
+            return_attention_mask=False,
+            return_token_type_ids=False
+        )
+        pieces = [self.tokenizer.convert_ids_to_tokens(ids) for ids in encoded["input_ids"]]
+        if self.vocabulary is not None:
+            pieces = [self.vocabulary.apply(tokens) for tokens in pieces]
+        return pieces
+
+    def encode_batch(self, texts: List[str], max_length: int) -> List[List[str]]:
+        """
+        Tokeniza textos como tokens de entrada para CTranslate2.
+
+        Args:
+            texts: Textos ya normalizados
+            max_length: Longitud máxima por secuencia, tokens especiales incluidos
+
+        Returns:
+            Lista de secuencias `[src_lang] ... </s>` (sin padding)
+        """
+        if not texts:
+            return []
+
+        # Truncado manual (mismo resultado que truncation=True de HF)
+        body_limit = max(0, max_length - 2)
+        return [
+            [self.src_lang_tok] + pieces[:body_limit] + [self.eos_tok]
+            for pieces in self._pieces(texts)
+        ]
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Número de tokens de cada texto (sin tokens especiales)."""
+        if not texts:
+            return []
+        if self.vocabulary is not None:
+            return [len(pieces) for pieces in self._pieces(texts)]
+        encoded = self.tokenizer(
+            texts,
+            add_special_tokens=False,
+            return_attention_mask=False,
+            return_token_type_ids=False
+        )
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def decode_batch(self, hypotheses: List[List[str]]) -> List[str]:
+        """Convierte hipótesis (tokens) a texto sin tokens especiales."""
+        return [
+            self.tokenizer.decode(
+                self.tokenizer.convert_tokens_to_ids(tokens),
+                skip_special_tokens=True,
+                clean_up_tokenization_spaces=True
+            )
+            for tokens in hypotheses
+        ]
+
+
+class SentencePieceDirectionTokenizer:
+    """
+    Codificador/decodificador de una dirección sobre SentencePiece directo.
+
+    CTranslate2 recibe y devuelve piezas (strings), así que no hacen falta los
+    IDs de HF: se codifica a piezas y se decodifican las piezas en batch. Los
+    tokens de idioma NLLB son el propio código (spa_Latn), igual que en HF.
+    """
+
+    def __init__(
+        self,
+        processor,
+        src_lang: str,
+        tgt_lang: str,
+        vocabulary: Optional[RestrictedVocabulary] = None
+    ):
+        """
+        Args:
+            processor: sentencepiece.SentencePieceProcessor cargado (solo lectura)
+            src_lang: Código NLLB del idioma origen (p.ej. spa_Latn)
+            tgt_lang: Código NLLB del idioma destino (p.ej. dan_Latn)
+            vocabulary: Vocabulario del modelo CT2 recortado (None = completo)
+        """
+        self.processor = processor
+        self.src_lang = src_lang
+        self.tgt_lang = tgt_lang
+        self.src_lang_tok: str = src_lang
+        self.tgt_bos_tok: str = tgt_lang
+        self.eos_tok: str = "</s>"
+        self.vocabulary = vocabulary
+
+    def _pieces(self, texts: List[str]) -> List[List[str]]:
+        """Piezas de cada texto, sin tokens especiales."""
+        pieces = self.processor.encode(texts, out_type=str)
+        if self.vocabulary is not None:
+            pieces = [self.vocabulary.apply(tokens) for tokens in pieces]
+        return pieces
+
+    def encode_batch(self, texts: List[str], max_length: int) -> List[List[str]]:
+        """Igual que DirectionTokenizer.encode_batch."""
+        if not texts:
+            return []
+
+        body_limit = max(0, max_length - 2)
+        return [
+            [self.src_lang_tok] + pieces[:body_limit] + [self.eos_tok]
+            for pieces in self._pieces(texts)
+        ]
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Igual que DirectionTokenizer.count_tokens."""
+        if not texts:
+            return []
+        if self.vocabulary is not None:
+            return [len(pieces) for pieces in self._pieces(texts)]
+        return [len(ids) for ids in self.processor.encode(texts)]
+
+    def decode_batch(self, hypotheses: List[List[str]]) -> List[str]:
+        """Igual que DirectionTokenizer.decode_batch (mismo texto que HF)."""
+        pieces = [
+            [t for t in tokens if t not in SPECIAL_TOKENS and not LANG_CODE_TOKEN.match(t)]
+            for tokens in hypotheses
+        ]
+        if not pieces:
+            return []
+        return [clean_up_tokenization(text) for text in self.processor.decode(pieces)]
+
+
+def load_trimmed_vocabulary(ct2_dir: str) -> Optional[RestrictedVocabulary]:
+    """
+    Lee el vocabulario de un modelo CT2 recortado por scripts/trim_vocab.py.
+
+    Returns:
+        RestrictedVocabulary, o None si el modelo tiene el vocabulario completo
+    """
+    path = Path(ct2_dir) / TRIMMED_VOCAB_FILE
+    if not path.exists():
+        return None
+    return RestrictedVocabulary(
+        line for line in path.read_text(encoding="utf-8").splitlines() if line
+    )
+
+
+def build_direction_tokenizers(
+    tokenizer,
+    vocabulary: Optional[RestrictedVocabulary] = None
+) -> Dict[str, DirectionTokenizer]:
+    """Crea un DirectionTokenizer por cada dirección soportada."""
+    return {
+        direction: DirectionTokenizer(tokenizer, src_lang, tgt_lang, vocabulary)
+        for direction, (src_lang, tgt_lang) in DIRECTION_LANGS.items()
+    }
+
+
+def build_sentencepiece_direction_tokenizers(
+    model_path: str,
+    vocabulary: Optional[RestrictedVocabulary] = None
+) -> Dict[str, SentencePieceDirectionTokenizer]:
+    """
+    Carga el modelo SentencePiece y crea un tokenizador por dirección.
+
+    Args:
+        model_path: Ruta a sentencepiece.bpe.model (o al directorio que lo contiene)
+        vocabulary: Vocabulario del modelo CT2 recortado (None = completo)
+
+    Raises:
+        FileNotFoundError: Si no existe el modelo SentencePiece
+    """
+    import sentencepiece as spm
+
+    path = Path(model_path)
+    if path.is_dir():
+        path = path / SPM_MODEL_FILE
+    if not path.exists():
+        raise FileNotFoundError(f"No se encontró el modelo SentencePiece: {path}")
+
+    processor = spm.SentencePieceProcessor(model_file=str(path))
+    return {
+        direction: SentencePieceDirectionTokenizer(processor, src_lang, tgt_lang, vocabulary)
+        for direction, (src_lang, tgt_lang) in DIRECTION_LANGS.items()
+    }
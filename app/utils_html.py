@@ -3,17 +3,103 @@ Utilidades centralizadas para sanitización y procesamiento HTML seguro.
 
 Garantiza que todo HTML procesado sea sanitizado consistentemente.
 """
+import importlib.util
+import logging
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from bs4 import BeautifulSoup, NavigableString, Tag
 
+from app.settings import settings
 
-def sanitize_html(html_content: str) -> str:
+logger = logging.getLogger(__name__)
+
+# Backends de parsing soportados (HTML_PARSER)
+HTML_PARSERS = ("auto", "lxml", "html.parser")
+
+# lxml es opcional: si está instalado se usa por defecto (mucho más rápido)
+LXML_AVAILABLE = importlib.util.find_spec("lxml") is not None
+
+# Atributo del contenedor con el que se parsea un fragmento con lxml
+_FRAGMENT_ROOT = "data-fragment-root"
+
+
+# Etiquetas permitidas para emails/correos
+ALLOWED_TAGS = frozenset({
+    'p', 'br', 'strong', 'em', 'b', 'i', 'u', 'span', 'div',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'ul', 'ol', 'li', 'blockquote',
+    'a', 'img', 'table', 'tr', 'td', 'th', 'thead', 'tbody'
+})
+
+# Atributos permitidos
+ALLOWED_ATTRS = frozenset({
+    'href', 'src', 'alt', 'title', 'class', 'id', 'style',
+    'width', 'height', 'align', 'valign', 'colspan', 'rowspan', 'placeholder'
+})
+
+
+def resolve_html_parser(name: Optional[str] = None) -> str:
+    """
+    Resuelve el backend de parsing de BeautifulSoup a usar.
+    
+    Args:
+        name: "auto", "lxml" o "html.parser" (default: settings.HTML_PARSER)
+        
+    Returns:
+        "lxml" si se pidió (o "auto") y está instalado; si no, "html.parser"
+    """
+    name = (name or settings.HTML_PARSER).lower()
+    if name not in HTML_PARSERS:
+        logger.warning(f"HTML_PARSER='{name}' no soportado, usando html.parser")
+        return "html.parser"
+    if name == "html.parser":
+        return name
+    if LXML_AVAILABLE:
+        return "lxml"
+    if name == "lxml":
+        logger.warning("HTML_PARSER=lxml pero lxml no está instalado, usando html.parser")
+    return "html.parser"
+
+
+def parse_html_fragment(html: str, parser: Optional[str] = None) -> BeautifulSoup:
+    """
+    Parsea un fragmento HTML con el backend configurado.
+    
+    lxml trata la entrada como documento completo: añade <html><body> y
+    envuelve en <p> el texto suelto. Para que str(soup) devuelva solo el
+    fragmento (como con html.parser) se parsea dentro de un contenedor y
+    sus nodos se trasladan a un documento vacío.
+    
+    Args:
+        html: Fragmento HTML
+        parser: Backend (default: settings.HTML_PARSER, ver resolve_html_parser)
+        
+    Returns:
+        BeautifulSoup cuyo contenido es el fragmento parseado
+    """
+    backend = resolve_html_parser(parser)
+    if backend == "html.parser":
+        return BeautifulSoup(html, "html.parser")
+    
+    document = BeautifulSoup(f'<div {_FRAGMENT_ROOT}="">{html}</div>', backend)
+    root = document.find(attrs={_FRAGMENT_ROOT: True})
+    if root is not None:
+        root.unwrap()
+    
+    fragment = BeautifulSoup("", "html.parser")
+    container = document.body or document
+    for node in list(container.contents):
+        fragment.append(node.extract())
+    return fragment
+
+
+def sanitize_html(html_content: str, parser: Optional[str] = None) -> str:
     """
     Sanitiza HTML eliminando contenido peligroso.
     
     Args:
         html_content: HTML de entrada
+        parser: Backend de parsing (default: settings.HTML_PARSER)
         
     Returns:
         HTML sanitizado y seguro
@@ -21,33 +107,19 @@ def sanitize_html(html_content: str) -> str:
     if not html_content or not html_content.strip():
         return ""
     
-    # Parsear HTML con BeautifulSoup
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    # Etiquetas permitidas para emails/correos
-    allowed_tags = {
-        'p', 'br', 'strong', 'em', 'b', 'i', 'u', 'span', 'div',
-        'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
-        'ul', 'ol', 'li', 'blockquote',
-        'a', 'img', 'table', 'tr', 'td', 'th', 'thead', 'tbody'
-    }
-    
-    # Atributos permitidos
-    allowed_attrs = {
-        'href', 'src', 'alt', 'title', 'class', 'id', 'style',
-        'width', 'height', 'align', 'valign', 'colspan', 'rowspan'
-    }
+    # Parsear HTML con BeautifulSoup (backend según HTML_PARSER)
+    soup = parse_html_fragment(html_content, parser)
     
     # Limpiar etiquetas no permitidas pero mantener su contenido
     for tag in soup.find_all():
-        if tag.name not in allowed_tags:
+        if tag.name not in ALLOWED_TAGS:
             tag.unwrap()
         else:
             # Limpiar atributos no permitidos
             if hasattr(tag, 'attrs'):
                 attrs_to_remove = []
                 for attr in tag.attrs:
-                    if attr.lower() not in allowed_attrs:
+                    if attr.lower() not in ALLOWED_ATTRS:
                         attrs_to_remove.append(attr)
                 for attr in attrs_to_remove:
                     del tag.attrs[attr]
@@ -55,14 +127,14 @@ def sanitize_html(html_content: str) -> str:
             # Sanitizar URLs en href/src para evitar javascript:, data:, etc.
             if tag.name == 'a' and 'href' in tag.attrs:
                 href = tag.attrs['href']
-                if not _is_safe_url(href):
+                if not is_safe_url(href):
                     # Convertir a texto si la URL no es segura
                     tag.name = 'span'
                     del tag.attrs['href']
             
             if tag.name == 'img' and 'src' in tag.attrs:
                 src = tag.attrs['src']
-                if not _is_safe_url(src):
+                if not is_safe_url(src):
                     # Eliminar imagen si src no es segura
                     tag.decompose()
     
@@ -73,7 +145,7 @@ def sanitize_html(html_content: str) -> str:
     return str(soup)
 
 
-def _is_safe_url(url: str) -> bool:
+def is_safe_url(url: str) -> bool:
     """
     Verifica si una URL es segura para mostrar.
     
@@ -117,7 +189,7 @@ def extract_text_for_translation(html_content: str) -> List[Dict[str, Any]]:
     
     # Sanitizar primero
     sanitized_html = sanitize_html(html_content)
-    soup = BeautifulSoup(sanitized_html, 'html.parser')
+    soup = parse_html_fragment(sanitized_html)
     
     blocks = []
     
@@ -47,6 +47,43 @@ def normalize_preserving_newlines(text: str) -> str:
     return "\n".join(lines)
 
 
+def translate_blocks_preserving_structure(
+    text: str,
+    translate_blocks_fn: Callable[[List[str]], List[str]],
+) -> str:
+    """
+    Como translate_preserving_structure, pero traduce todos los bloques en una llamada.
+    
+    Permite que el llamador envíe los párrafos de un texto al modelo en un
+    único batch (reparto entre réplicas, pipeline por chunks) en lugar de uno
+    por uno.
+    
+    Args:
+        text: Texto a traducir
+        translate_blocks_fn: Función que recibe los bloques con contenido y
+                             retorna sus traducciones en el mismo orden
+                             Firma: fn(blocks: List[str]) -> List[str]
+        
+    Returns:
+        Texto traducido con estructura preservada
+    """
+    # Normalizar primero (sin aplanar \n)
+    text = normalize_preserving_newlines(text)
+    
+    # [chunk, sep, chunk, sep, ...]: los separadores (impares) se conservan tal cual
+    parts = SPLIT_PARA.split(text)
+    indices = [
+        i for i, part in enumerate(parts)
+        if i % 2 == 0 and part.strip() != ""
+    ]
+    if indices:
+        translations = translate_blocks_fn([parts[i] for i in indices])
+        for i, translated in zip(indices, translations):
+            parts[i] = translated
+    
+    return "".join(parts)
+
+
 def translate_preserving_structure(
     text: str,
     translate_fn: Callable[[str], str],
@@ -80,28 +117,9 @@ def translate_preserving_structure(
         >>> translate_preserving_structure(text, fake_tr)
         'hej\\n\\nadiós'
     """
-    # Normalizar primero (sin aplanar \n)
-    text = normalize_preserving_newlines(text)
-    
-    # Dividir por separadores de párrafo capturándolos
-    # split() con grupo de captura retorna: [chunk, sep, chunk, sep, ...]
-    parts = SPLIT_PARA.split(text)
-    
-    out = []
-    for i, part in enumerate(parts):
-        if i % 2 == 0:  # Posiciones pares = contenido
-            if part.strip() == "":
-                # Bloque vacío: conservar tal cual
-                out.append(part)
-            else:
-                # Bloque con contenido: traducir
-                translated = translate_fn(part)
-                out.append(translated)
-        else:  # Posiciones impares = separadores capturados
-            # Preservar el separador exacto (puede ser \n\n, \n\n\n, \n  \n, etc.)
-            out.append(part)
-    
-    return "".join(out)
+    return translate_blocks_preserving_structure(
+        text, lambda blocks: [translate_fn(block) for block in blocks]
+    )
 
 
 def looks_like_html(text: str) -> bool:
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark del pre-procesado HTML de /translate/html por backend de parsing.
+
+Mide, sobre un correo de marketing sintético (o un fichero --html), el tiempo
+de sanitizar + extraer bloques con cada camino:
+
+- html.parser: sanitize_html (BeautifulSoup, Python puro) + split_html_preserving_structure
+- lxml:        igual, con BeautifulSoup sobre lxml (si está instalado)
+- una pasada:  sanitize_and_split_html (el camino usado por el endpoint)
+
+Uso:
+    python scripts/bench_html.py
+    python scripts/bench_html.py --size-kb 500 --repeat 20
+    python scripts/bench_html.py --html correo.html
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Optional
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from app.segment import sanitize_and_split_html, split_html_preserving_structure  # noqa: E402
+from app.utils_html import LXML_AVAILABLE, sanitize_html  # noqa: E402
+
+
+# Bloque típico de un correo de marketing (tablas anidadas, estilos en línea)
+EMAIL_BLOCK = """<table width="100%" cellpadding="0" style="border:0">
+<tr><td align="left" style="font-family:Arial;font-size:14px;color:#333">
+<p class="intro">Estimado cliente, le informamos de nuestras <strong>ofertas</strong>
+de temporada &amp; novedades.</p>
+<p>Consulte el <a href="https://ejemplo.es/catalogo?utm_source=email" title="Catálogo">catálogo
+completo</a><br>o escríbanos a <a href="mailto:info@ejemplo.es">info@ejemplo.es</a>.</p>
+<img src="https://ejemplo.es/banner.png" alt="Banner" width="600" height="200">
+<ul><li>Envío gratuito desde 50&nbsp;€</li><li>Devoluciones en 30 días</li></ul>
+<font face="Arial" onclick="track()">Precios válidos hasta fin de existencias.</font><o:p></o:p>
+</td></tr>
+</table>
+"""
+
+
+def build_email(size_kb: int) -> str:
+    """Genera un correo HTML de aproximadamente size_kb KB."""
+    repeats = max(1, (size_kb * 1024) // len(EMAIL_BLOCK.encode("utf-8")))
+    return f"<html><body>{EMAIL_BLOCK * repeats}</body></html>"
+
+
+def time_call(fn: Callable[[], object], repeat: int) -> List[float]:
+    """Ejecuta fn `repeat` veces y devuelve los tiempos en ms."""
+    fn()  # calentamiento
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parsea argumentos de línea de comandos."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark de sanitización + extracción HTML por backend"
+    )
+    parser.add_argument("--html", default=None, help="Fichero HTML a medir (opcional)")
+    parser.add_argument("--size-kb", type=int, default=200,
+                        help="Tamaño del correo sintético en KB")
+    parser.add_argument("--repeat", type=int, default=10, help="Repeticiones por camino")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Punto de entrada."""
+    args = parse_args(argv)
+    if args.html:
+        html = Path(args.html).read_text(encoding="utf-8")
+    else:
+        html = build_email(args.size_kb)
+
+    paths = {
+        "html.parser": lambda: split_html_preserving_structure(
+            sanitize_html(html, parser="html.parser")
+        ),
+    }
+    if LXML_AVAILABLE:
+        paths["lxml"] = lambda: split_html_preserving_structure(
+            sanitize_html(html, parser="lxml")
+        )
+    else:
+        print("(lxml no instalado: pip install lxml para medir ese backend)")
+    paths["una pasada"] = lambda: sanitize_and_split_html(html)
+
+    print(f"HTML: {len(html.encode('utf-8')) / 1024:.0f} KB, {args.repeat} repeticiones")
+    print(f"{'camino':>12} {'p50ms':>9} {'minms':>9} {'speedup':>8}")
+
+    baseline = None
+    for name, fn in paths.items():
+        timings = time_call(fn, args.repeat)
+        median = statistics.median(timings)
+        baseline = baseline or median
+        print(f"{name:>12} {median:>9.1f} {min(timings):>9.1f} {baseline / median:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
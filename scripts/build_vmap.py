@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Genera un mapa de vocabulario (vmap) de CTranslate2 para destinos danés y español.
+
+NLLB-200 tiene ~256k piezas de salida, pero el servicio solo genera dan_Latn o
+spa_Latn. Con un vmap, CTranslate2 (use_vmap=True) restringe la proyección de
+salida de cada batch a las piezas permitidas por sus tokens de entrada, lo que
+reduce el coste del softmax en cada paso de decodificación.
+
+Formato (vocabulary_map de CTranslate2), una línea por token origen:
+    <token origen>\\t<piezas destino permitidas separadas por espacios>
+La clave vacía lista las piezas siempre permitidas.
+
+Claves generadas:
+- ""        → tokens especiales, códigos de idioma y caracteres latinos sueltos
+- spa_Latn  → piezas del corpus danés (destino de es-da)
+- dan_Latn  → piezas del corpus español (destino de da-es)
+- cada pieza del vocabulario → sí misma (copia de nombres, cifras, URLs y
+  centinelas de glosario presentes en la entrada)
+
+Control de calidad: una parte del corpus (--holdout) no se usa para construir
+el vmap y se mide qué fracción de sus piezas destino quedaría permitida. El
+script termina con error si la cobertura baja de --min-coverage.
+
+Uso:
+    python scripts/build_vmap.py --tsv corpus_es_da.tsv --out models/vmap.txt
+    python scripts/build_vmap.py --es corpus_es.txt --da corpus_da.txt --min-count 2
+    bash scripts/convert_to_ct2.sh --in models/nllb-600m \\
+        --out models/nllb-600m-ct2-int8-vmap --vocab_mapping models/vmap.txt
+"""
+import argparse
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from app.tokenization import DIRECTION_LANGS, SPECIAL_TOKENS, SPM_MODEL_FILE  # noqa: E402
+
+
+# Último punto de código de "Latin Extended-B": caracteres sueltos siempre permitidos
+LATIN_MAX_CODEPOINT = 0x024F
+
+
+def read_corpora(
+    tsv_paths: List[Path],
+    es_paths: List[Path],
+    da_paths: List[Path]
+) -> Tuple[List[Tuple[str, str]], Dict[str, List[str]]]:
+    """
+    Lee los corpus de entrada.
+
+    Args:
+        tsv_paths: Ficheros paralelos "es<TAB>da" (una pareja por línea)
+        es_paths: Ficheros monolingües en español (una frase por línea)
+        da_paths: Ficheros monolingües en danés (una frase por línea)
+
+    Returns:
+        Tupla (parejas es/da, {"spa_Latn": [...], "dan_Latn": [...]})
+    """
+    pairs = []
+    for path in tsv_paths:
+        for line in path.read_text(encoding="utf-8").splitlines():
+            columns = line.split("\t")
+            if len(columns) >= 2 and columns[0].strip() and columns[1].strip():
+                pairs.append((columns[0].strip(), columns[1].strip()))
+
+    mono = {"spa_Latn": [], "dan_Latn": []}
+    for lang, paths in (("spa_Latn", es_paths), ("dan_Latn", da_paths)):
+        for path in paths:
+            mono[lang].extend(
+                line.strip()
+                for line in path.read_text(encoding="utf-8").splitlines()
+                if line.strip()
+            )
+    return pairs, mono
+
+
+def split_holdout(items: list, holdout: float) -> Tuple[list, list]:
+    """Separa de forma determinista 1 de cada N elementos para el control de calidad."""
+    if holdout <= 0 or len(items) < 2:
+        return items, []
+    step = max(2, round(1 / holdout))
+    build = [item for i, item in enumerate(items) if i % step != step - 1]
+    check = [item for i, item in enumerate(items) if i % step == step - 1]
+    return build, check
+
+
+def always_allowed(vocab: List[str]) -> Set[str]:
+    """Tokens especiales, códigos de idioma y caracteres latinos sueltos."""
+    allowed = set(SPECIAL_TOKENS) | {lang for pair in DIRECTION_LANGS.values() for lang in pair}
+    for piece in vocab:
+        char = piece[1:] if piece.startswith("▁") else piece
+        if len(char) <= 1 and (not char or ord(char) <= LATIN_MAX_CODEPOINT):
+            allowed.add(piece)
+    return allowed
+
+
+def build_vmap(
+    processor,
+    target_texts: Dict[str, List[str]],
+    min_count: int = 1,
+    identity: bool = True
+) -> Dict[str, Set[str]]:
+    """
+    Construye el vmap a partir de textos de cada idioma destino.
+
+    Args:
+        processor: sentencepiece.SentencePieceProcessor del modelo NLLB
+        target_texts: {código_idioma_destino: textos}
+        min_count: Apariciones mínimas de una pieza para incluirla
+        identity: Si True, cada pieza del vocabulario se permite a sí misma
+
+    Returns:
+        Dict {token_origen: piezas permitidas}; la clave "" son las siempre permitidas
+    """
+    vocab = [processor.id_to_piece(i) for i in range(processor.get_piece_size())]
+    vmap: Dict[str, Set[str]] = {"": always_allowed(vocab)}
+
+    # El token de idioma origen de cada dirección habilita el vocabulario destino
+    for src_lang, tgt_lang in DIRECTION_LANGS.values():
+        counts = Counter()
+        for pieces in processor.encode(target_texts.get(tgt_lang, []), out_type=str):
+            counts.update(pieces)
+        vmap[src_lang] = {piece for piece, n in counts.items() if n >= min_count}
+
+    if identity:
+        for piece in vocab:
+            if piece not in SPECIAL_TOKENS and piece not in vmap:
+                vmap[piece] = {piece}
+    return vmap
+
+
+def coverage(
+    processor,
+    vmap: Dict[str, Set[str]],
+    pairs: List[Tuple[str, str]],
+    direction: str
+) -> Tuple[float, float]:
+    """
+    Cobertura del vmap sobre parejas paralelas de control.
+
+    Args:
+        processor: sentencepiece.SentencePieceProcessor
+        vmap: Mapa construido por build_vmap
+        pairs: Parejas (origen, destino) de la dirección
+        direction: "es-da" o "da-es"
+
+    Returns:
+        Tupla (fracción de piezas destino permitidas, fracción de frases cubiertas)
+    """
+    if not pairs:
+        return 1.0, 1.0
+
+    src_lang, _ = DIRECTION_LANGS[direction]
+    sources = processor.encode([src for src, _ in pairs], out_type=str)
+    targets = processor.encode([tgt for _, tgt in pairs], out_type=str)
+
+    covered_pieces = total_pieces = covered_sentences = 0
+    for src_pieces, tgt_pieces in zip(sources, targets):
+        allowed = set(vmap[""]) | vmap.get(src_lang, set())
+        for piece in src_pieces:
+            allowed |= vmap.get(piece, set())
+        hits = sum(piece in allowed for piece in tgt_pieces)
+        covered_pieces += hits
+        total_pieces += len(tgt_pieces)
+        covered_sentences += hits == len(tgt_pieces)
+    return covered_pieces / max(total_pieces, 1), covered_sentences / len(pairs)
+
+
+def write_vmap(vmap: Dict[str, Set[str]], path: Path):
+    """Escribe el vmap en el formato de CTranslate2 (clave vacía primero)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        for source in sorted(vmap, key=lambda key: (key != "", key)):
+            f.write(f"{source}\t{' '.join(sorted(vmap[source]))}\n")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parsea argumentos de línea de comandos."""
+    parser = argparse.ArgumentParser(description="Genera un vmap de CTranslate2 para ES/DA")
+    parser.add_argument("--model-dir", default=str(ROOT_DIR / "models" / "nllb-600m"),
+                        help=f"Directorio con {SPM_MODEL_FILE} (MODEL_DIR)")
+    parser.add_argument("--tsv", action="append", default=[], type=Path,
+                        help="Corpus paralelo es<TAB>da (repetible)")
+    parser.add_argument("--es", action="append", default=[], type=Path,
+                        help="Corpus monolingüe en español (repetible)")
+    parser.add_argument("--da", action="append", default=[], type=Path,
+                        help="Corpus monolingüe en danés (repetible)")
+    parser.add_argument("--out", default=str(ROOT_DIR / "models" / "vmap.txt"), type=Path,
+                        help="Fichero vmap de salida")
+    parser.add_argument("--min-count", type=int, default=1,
+                        help="Apariciones mínimas de una pieza destino")
+    parser.add_argument("--no-identity", action="store_true",
+                        help="No permitir copiar piezas de la entrada")
+    parser.add_argument("--holdout", type=float, default=0.1,
+                        help="Fracción de parejas TSV reservada para medir cobertura")
+    parser.add_argument("--min-coverage", type=float, default=0.995,
+                        help="Cobertura mínima de piezas en el control (error si es menor)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Punto de entrada."""
+    args = parse_args(argv)
+    if not (args.tsv or args.es or args.da):
+        print("Error: indica al menos un corpus (--tsv, --es o --da)")
+        return 2
+
+    import sentencepiece as spm
+
+    model_path = Path(args.model_dir) / SPM_MODEL_FILE
+    if not model_path.exists():
+        print(f"Error: no existe {model_path} (ejecuta: make download)")
+        return 2
+    processor = spm.SentencePieceProcessor(model_file=str(model_path))
+
+    pairs, mono = read_corpora(args.tsv, args.es, args.da)
+    build_pairs, check_pairs = split_holdout(pairs, args.holdout)
+    target_texts = {
+        "spa_Latn": mono["spa_Latn"] + [es for es, _ in build_pairs],
+        "dan_Latn": mono["dan_Latn"] + [da for _, da in build_pairs],
+    }
+
+    vmap = build_vmap(processor, target_texts, args.min_count, identity=not args.no_identity)
+    write_vmap(vmap, args.out)
+
+    print(f"vmap: {args.out} ({len(vmap)} claves)")
+    for src_lang, tgt_lang in DIRECTION_LANGS.values():
+        print(f"  {src_lang} → {len(vmap[src_lang])} piezas {tgt_lang}")
+    print(f"  siempre permitidas: {len(vmap[''])} piezas")
+
+    if not check_pairs:
+        print("Sin parejas de control (--tsv): cobertura no medida")
+        return 0
+
+    ok = True
+    checks = {
+        "es-da": check_pairs,
+        "da-es": [(da, es) for es, da in check_pairs],
+    }
+    for direction, direction_pairs in checks.items():
+        piece_cov, sentence_cov = coverage(processor, vmap, direction_pairs, direction)
+        status = "OK" if piece_cov >= args.min_coverage else "BAJA"
+        print(f"  cobertura {direction}: {piece_cov:.2%} piezas, "
+              f"{sentence_cov:.2%} frases ({len(direction_pairs)} parejas) [{status}]")
+        ok = ok and piece_cov >= args.min_coverage
+
+    if not ok:
+        print(f"Cobertura por debajo de {args.min_coverage:.1%}: amplía el corpus o baja --min-count")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,10 @@
 #
 # Uso:
 #   bash scripts/convert_to_ct2.sh --in models/nllb-600m --out models/nllb-600m-ct2-int8
+#
+# Con vocabulario restringido (vmap generado por scripts/build_vmap.py):
+#   bash scripts/convert_to_ct2.sh --in models/nllb-600m --out models/nllb-600m-ct2-int8 \
+#       --vocab_mapping models/vmap.txt
 
 set -euo pipefail
 
@@ -15,6 +19,7 @@ NC='\033[0m' # No Color
 # Variables
 INPUT_DIR=""
 OUTPUT_DIR=""
+VOCAB_MAPPING=""
 
 # Parsear argumentos
 while [[ $# -gt 0 ]]; do
@@ -27,9 +32,13 @@ while [[ $# -gt 0 ]]; do
             OUTPUT_DIR="$2"
             shift 2
             ;;
+        --vocab_mapping)
+            VOCAB_MAPPING="$2"
+            shift 2
+            ;;
         *)
             echo -e "${RED}Error: Argumento desconocido: $1${NC}"
-            echo "Uso: $0 --in <input_dir> --out <output_dir>"
+            echo "Uso: $0 --in <input_dir> --out <output_dir> [--vocab_mapping <vmap.txt>]"
             exit 1
             ;;
     esac
@@ -38,7 +47,7 @@ done
 # Validar argumentos
 if [ -z "$INPUT_DIR" ] || [ -z "$OUTPUT_DIR" ]; then
     echo -e "${RED}Error: Faltan argumentos${NC}"
-    echo "Uso: $0 --in <input_dir> --out <output_dir>"
+    echo "Uso: $0 --in <input_dir> --out <output_dir> [--vocab_mapping <vmap.txt>]"
     echo ""
     echo "Ejemplo:"
     echo "  $0 --in models/nllb-600m --out models/nllb-600m-ct2-int8"
@@ -56,6 +65,19 @@ if [ ! -d "$INPUT_DIR" ]; then
     exit 1
 fi
 
+# Verificar el vmap si se indicó
+CONVERTER_EXTRA_ARGS=()
+if [ -n "$VOCAB_MAPPING" ]; then
+    if [ ! -f "$VOCAB_MAPPING" ]; then
+        echo -e "${RED}Error: No existe el vmap: $VOCAB_MAPPING${NC}"
+        echo ""
+        echo "Genéralo ejecutando:"
+        echo "  python scripts/build_vmap.py --tsv <corpus_es_da.tsv> --out $VOCAB_MAPPING"
+        exit 1
+    fi
+    CONVERTER_EXTRA_ARGS+=(--vocab_mapping "$VOCAB_MAPPING")
+fi
+
 # Información
 echo "======================================================================"
 echo -e "${GREEN}Convirtiendo modelo NLLB a CTranslate2 (INT8)${NC}"
@@ -63,6 +85,7 @@ echo "======================================================================"
 echo "Entrada:  $INPUT_DIR"
 echo "Salida:   $OUTPUT_DIR"
 echo "Quantization: INT8"
+echo "Vmap:     ${VOCAB_MAPPING:-(ninguno)}"
 echo "======================================================================"
 echo ""
 
@@ -88,7 +111,8 @@ ct2-transformers-converter \
     --model "$INPUT_DIR" \
     --output_dir "$OUTPUT_DIR" \
     --quantization int8 \
-    --force
+    --force \
+    ${CONVERTER_EXTRA_ARGS[@]+"${CONVERTER_EXTRA_ARGS[@]}"}
 
 # Verificar resultado
 if [ $? -eq 0 ]; then
@@ -101,6 +125,10 @@ if [ $? -eq 0 ]; then
     echo "Archivos generados:"
     ls -lh "$OUTPUT_DIR"
     echo ""
+    if [ -n "$VOCAB_MAPPING" ]; then
+        echo "vmap copiado como $OUTPUT_DIR/vmap.txt (actívalo con CT2_USE_VMAP=true)"
+        echo ""
+    fi
     echo "======================================================================"
     echo "Siguiente paso:"
     echo "  Inicia el servidor ejecutando:"
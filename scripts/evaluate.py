@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Evaluación offline de calidad frente a latencia por configuración de decodificación.
+
+Traduce un corpus paralelo ES↔DA local con translate_batch (mismo pipeline que
+el servidor: normalización, post-procesado, reintentos) bajo una matriz de
+configuraciones, y reporta para cada una y cada dirección:
+- chrF y BLEU de corpus (implementación propia equivalente a sacrebleu con
+  sus valores por defecto: chrF2 y BLEU con tokenizador 13a; sin dependencias ni red)
+- tokens de salida por segundo y latencia p50/p95 por batch
+- Frontera de Pareto calidad (chrF) vs latencia p95 (marcada con ★)
+
+Matriz de configuraciones (producto cartesiano):
+- --ct2-dir: modelos CT2 (600M, 1.3B, recortado con trim_vocab.py...)
+- --compute-types: CT2_COMPUTE_TYPE (int8, int8_float32, int16, float32)
+- --beam-sizes: tamaño del beam
+- --vmap: sin/con vocabulario restringido (solo modelos con vmap.txt)
+
+Todos los modelos NLLB-200 comparten tokenizador: MODEL_DIR sirve para todos.
+El corpus por defecto (data/eval/es_da.tsv) es pequeño y sirve para detectar
+regresiones gruesas; para decisiones finas usa un corpus propio con --tsv.
+
+Uso:
+    python scripts/evaluate.py
+    python scripts/evaluate.py --beam-sizes 1,2,3,4 --compute-types int8,int8_float32
+    python scripts/evaluate.py --ct2-dir models/nllb-600m-ct2-int8 \\
+        --ct2-dir models/nllb-600m-ct2-int8-esda --vmap both --json eval.json
+"""
+import argparse
+import itertools
+import json
+import math
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from scripts.stats import percentile  # noqa: E402
+
+DEFAULT_TSV = ROOT_DIR / "data" / "eval" / "es_da.tsv"
+
+# chrF (como sacrebleu chrF2): n-gramas de caracteres 1..6 sin espacios, beta=2
+CHRF_ORDER = 6
+CHRF_BETA = 2
+# BLEU: n-gramas de palabras 1..4 sobre la tokenización 13a (mteval-v13a)
+BLEU_ORDER = 4
+TOKENIZE_13A = [
+    # Símbolos y puntuación (salvo punto, coma, guion y apóstrofo)
+    (re.compile(r"([\{-\~\[-\` -\&\(-\+\:-\@\/])"), r" \1 "),
+    # Punto o coma, salvo si van precedidos de dígito
+    (re.compile(r"([^0-9])([\.,])"), r"\1 \2 "),
+    # Punto o coma, salvo si van seguidos de dígito
+    (re.compile(r"([\.,])([^0-9])"), r" \1 \2"),
+    # Guion precedido de dígito
+    (re.compile(r"([0-9])(-)"), r"\1 \2 "),
+]
+
+# Parámetros de settings que load_model cambia por configuración
+MODEL_SETTINGS = ("CT2_DIR", "CT2_COMPUTE_TYPE", "CT2_USE_VMAP")
+
+
+def _ngrams(items, n: int) -> Counter:
+    """Cuenta los n-gramas de una secuencia (string o lista)."""
+    return Counter(tuple(items[i:i + n]) for i in range(len(items) - n + 1))
+
+
+def tokenize_13a(line: str) -> List[str]:
+    """Tokenización 13a de sacrebleu (la de BLEU por defecto)."""
+    line = line.replace("<skipped>", "").replace("-\n", "").replace("\n", " ")
+    if "&" in line:
+        line = (line.replace("&quot;", '"').replace("&amp;", "&")
+                .replace("&lt;", "<").replace("&gt;", ">"))
+    line = f" {line} "
+    for pattern, replacement in TOKENIZE_13A:
+        line = pattern.sub(replacement, line)
+    return line.split()
+
+
+def chrf(hypotheses: List[str], references: List[str]) -> float:
+    """
+    chrF de corpus (0-100): estadísticas sumadas sobre todas las frases.
+
+    Misma definición que sacrebleu 2.x con sus valores por defecto (chrF2,
+    char_order=6, word_order=0, espacios eliminados).
+    """
+    matches = [0] * CHRF_ORDER
+    hyp_total = [0] * CHRF_ORDER
+    ref_total = [0] * CHRF_ORDER
+
+    for hyp, ref in zip(hypotheses, references):
+        hyp_chars = "".join(hyp.split())
+        ref_chars = "".join(ref.split())
+        for n in range(1, CHRF_ORDER + 1):
+            hyp_ngrams = _ngrams(hyp_chars, n)
+            ref_ngrams = _ngrams(ref_chars, n)
+            matches[n - 1] += sum((hyp_ngrams & ref_ngrams).values())
+            hyp_total[n - 1] += sum(hyp_ngrams.values())
+            ref_total[n - 1] += sum(ref_ngrams.values())
+
+    # Precisión y recall medios sobre los órdenes efectivos y un único F-beta
+    beta2 = CHRF_BETA ** 2
+    precision = recall = 0.0
+    effective_order = 0
+    for n in range(CHRF_ORDER):
+        if hyp_total[n] > 0 and ref_total[n] > 0:
+            precision += matches[n] / hyp_total[n]
+            recall += matches[n] / ref_total[n]
+            effective_order += 1
+    if effective_order == 0:
+        return 0.0
+
+    precision /= effective_order
+    recall /= effective_order
+    denominator = beta2 * precision + recall
+    return 100 * (1 + beta2) * precision * recall / denominator if denominator > 0 else 0.0
+
+
+def bleu(hypotheses: List[str], references: List[str]) -> float:
+    """
+    BLEU de corpus (0-100) con una referencia por frase.
+
+    Misma definición que sacrebleu 2.x con sus valores por defecto: tokenizador
+    13a, penalización por brevedad y suavizado "exp" para órdenes sin coincidencias.
+    """
+    matches = [0] * BLEU_ORDER
+    totals = [0] * BLEU_ORDER
+    hyp_len = ref_len = 0
+
+    for hyp, ref in zip(hypotheses, references):
+        hyp_tokens = tokenize_13a(hyp)
+        ref_tokens = tokenize_13a(ref)
+        hyp_len += len(hyp_tokens)
+        ref_len += len(ref_tokens)
+        for n in range(1, BLEU_ORDER + 1):
+            hyp_ngrams = _ngrams(hyp_tokens, n)
+            matches[n - 1] += sum((hyp_ngrams & _ngrams(ref_tokens, n)).values())
+            totals[n - 1] += sum(hyp_ngrams.values())
+
+    if hyp_len == 0:
+        return 0.0
+
+    log_precision = 0.0
+    smooth = 1.0
+    for n in range(BLEU_ORDER):
+        if totals[n] == 0:
+            return 0.0
+        if matches[n] == 0:
+            smooth *= 2
+            log_precision += math.log(1 / (smooth * totals[n]))
+        else:
+            log_precision += math.log(matches[n] / totals[n])
+
+    brevity = 1.0 if hyp_len >= ref_len else math.exp(1 - ref_len / hyp_len)
+    return 100 * brevity * math.exp(log_precision / BLEU_ORDER)
+
+
+def load_pairs(paths: List[Path], limit: Optional[int] = None) -> List[Tuple[str, str]]:
+    """Lee parejas "es<TAB>da" (ignora líneas vacías y comentarios #)."""
+    pairs = []
+    for path in paths:
+        for line in path.read_text(encoding="utf-8").splitlines():
+            if not line.strip() or line.startswith("#"):
+                continue
+            columns = line.split("\t")
+            if len(columns) >= 2:
+                pairs.append((columns[0].strip(), columns[1].strip()))
+    return pairs[:limit] if limit else pairs
+
+
+def build_matrix(args: argparse.Namespace) -> List[dict]:
+    """Producto cartesiano de configuraciones a evaluar."""
+    vmap_modes = {"off": [False], "on": [True], "both": [False, True]}[args.vmap]
+    return [
+        {"ct2_dir": ct2_dir, "compute_type": compute_type, "beam_size": beam_size, "vmap": vmap}
+        for ct2_dir, compute_type, vmap, beam_size in itertools.product(
+            args.ct2_dir,
+            args.compute_types.split(","),
+            vmap_modes,
+            [int(b) for b in args.beam_sizes.split(",")],
+        )
+    ]
+
+
+@contextmanager
+def restored_settings():
+    """
+    Restaura los MODEL_SETTINGS que cambia load_model al terminar la evaluación.
+
+    El modelo cargado con otra configuración se descarta para que model_manager
+    no quede desalineado con settings.
+    """
+    from app.settings import settings
+    from app.startup import model_manager
+
+    saved = {name: getattr(settings, name) for name in MODEL_SETTINGS}
+    try:
+        yield
+    finally:
+        if any(getattr(settings, name) != value for name, value in saved.items()):
+            model_manager.model_loaded = False
+            model_manager.translator = None
+        for name, value in saved.items():
+            setattr(settings, name, value)
+
+
+def load_model(config: dict) -> Optional[str]:
+    """
+    Carga el modelo de una configuración (recarga solo si cambia el modelo).
+
+    Cambia MODEL_SETTINGS: llámala dentro de restored_settings().
+
+    Returns:
+        None si está listo, o el motivo por el que se omite la configuración
+    """
+    from app.settings import settings
+    from app.startup import model_manager
+
+    wanted = (config["ct2_dir"], config["compute_type"], config["vmap"])
+    current = (settings.CT2_DIR, settings.CT2_COMPUTE_TYPE, settings.CT2_USE_VMAP)
+    if model_manager.model_loaded and wanted == current:
+        return None
+
+    settings.CT2_DIR, settings.CT2_COMPUTE_TYPE, settings.CT2_USE_VMAP = wanted
+    model_manager.model_loaded = False
+    model_manager.translator = None
+    if not model_manager.load():
+        lines = (model_manager.last_error or "error de carga").splitlines()
+        return " ".join(line.strip() for line in lines[:2])
+    if config["vmap"] and not model_manager.use_vmap:
+        return "sin vmap.txt en el modelo"
+    return None
+
+
+def evaluate_direction(
+    pairs: List[Tuple[str, str]],
+    direction: str,
+    beam_size: int,
+    batch_size: int
+) -> dict:
+    """
+    Traduce el corpus en una dirección y mide calidad y latencia.
+
+    Returns:
+        Dict con chrf, bleu, tokens_per_s, p50_ms, p95_ms y segments
+    """
+    from app.inference import count_tokens, translate_batch
+
+    sources = [es if direction == "es-da" else da for es, da in pairs]
+    references = [da if direction == "es-da" else es for es, da in pairs]
+
+    # Calentamiento: la primera llamada a CT2 paga la inicialización
+    translate_batch(sources[:1], direction=direction, beam_size=beam_size, use_cache=False)
+
+    hypotheses = []
+    latencies = []
+    for start in range(0, len(sources), batch_size):
+        batch = sources[start:start + batch_size]
+        t0 = time.perf_counter()
+        hypotheses.extend(
+            translate_batch(batch, direction=direction, beam_size=beam_size, use_cache=False)
+        )
+        latencies.append(time.perf_counter() - t0)
+
+    output_tokens = sum(count_tokens(hypotheses, direction))
+    elapsed = sum(latencies)
+    return {
+        "chrf": chrf(hypotheses, references),
+        "bleu": bleu(hypotheses, references),
+        "tokens_per_s": output_tokens / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "segments": len(sources),
+        "hypotheses": hypotheses,
+    }
+
+
+def mark_pareto(results: List[dict]):
+    """Marca las filas no dominadas en chrF (mayor) y p95 (menor) por dirección."""
+    for result in results:
+        result["pareto"] = not any(
+            other is not result
+            and other["direction"] == result["direction"]
+            and other["chrf"] >= result["chrf"]
+            and other["p95_ms"] <= result["p95_ms"]
+            and (other["chrf"] > result["chrf"] or other["p95_ms"] < result["p95_ms"])
+            for other in results
+        )
+
+
+def print_report(results: List[dict]):
+    """Imprime una tabla por dirección, ordenada por chrF."""
+    for direction in sorted({r["direction"] for r in results}):
+        rows = sorted(
+            (r for r in results if r["direction"] == direction),
+            key=lambda r: (-r["chrf"], r["p95_ms"])
+        )
+        print("=" * 96)
+        print(f"Dirección: {direction} ({rows[0]['segments']} segmentos)")
+        print("=" * 96)
+        print(f"  {'modelo':<32} {'compute':<13} {'beam':>4} {'vmap':>4} "
+              f"{'chrF':>6} {'BLEU':>6} {'tok/s':>8} {'p50ms':>8} {'p95ms':>8}")
+        for r in rows:
+            mark = "★" if r["pareto"] else " "
+            print(
+                f"{mark} {Path(r['ct2_dir']).name[:32]:<32} {r['compute_type']:<13} "
+                f"{r['beam_size']:>4} {'sí' if r['vmap'] else 'no':>4} "
+                f"{r['chrf']:6.1f} {r['bleu']:6.1f} {r['tokens_per_s']:8.1f} "
+                f"{r['p50_ms']:8.1f} {r['p95_ms']:8.1f}"
+            )
+        print("")
+    print("★ = frontera de Pareto (ninguna otra configuración tiene más chrF y menos p95)")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parsea argumentos de línea de comandos."""
+    from app.settings import settings
+
+    parser = argparse.ArgumentParser(
+        description="Evaluación offline calidad vs latencia de configuraciones de decodificación"
+    )
+    parser.add_argument("--tsv", action="append", default=[], type=Path,
+                        help=f"Corpus paralelo es<TAB>da (repetible; defecto {DEFAULT_TSV.relative_to(ROOT_DIR)})")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="Máximo de parejas a evaluar")
+    parser.add_argument("--directions", default="es-da,da-es",
+                        help="Direcciones: es-da, da-es")
+    parser.add_argument("--ct2-dir", action="append", default=[],
+                        help=f"Modelo CT2 a evaluar (repetible; defecto {settings.CT2_DIR})")
+    parser.add_argument("--compute-types", default=settings.CT2_COMPUTE_TYPE,
+                        help="Tipos de cómputo separados por comas")
+    parser.add_argument("--beam-sizes", default="1,2,3,4",
+                        help="Tamaños de beam separados por comas")
+    parser.add_argument("--vmap", choices=["off", "on", "both"], default="off",
+                        help="Evaluar sin vmap, con vmap o ambos")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="Segmentos por llamada a translate_batch (1 = latencia por frase)")
+    parser.add_argument("--json", dest="json_out", default=None,
+                        help="Guardar resultados (con traducciones) en JSON")
+    args = parser.parse_args(argv)
+    args.tsv = args.tsv or [DEFAULT_TSV]
+    args.ct2_dir = args.ct2_dir or [settings.CT2_DIR]
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Punto de entrada."""
+    args = parse_args(argv)
+
+    pairs = load_pairs(args.tsv, args.limit)
+    if not pairs:
+        print("Error: corpus vacío")
+        return 2
+
+    results = []
+    with restored_settings():
+        for config in build_matrix(args):
+            name = (f"{config['ct2_dir']} {config['compute_type']} beam={config['beam_size']} "
+                    f"vmap={'sí' if config['vmap'] else 'no'}")
+            skipped = load_model(config)
+            if skipped:
+                print(f"- Omitida: {name} ({skipped})")
+                continue
+
+            for direction in args.directions.split(","):
+                print(f"Evaluando {direction}: {name}...")
+                result = evaluate_direction(pairs, direction, config["beam_size"], args.batch_size)
+                results.append({**config, "direction": direction, **result})
+
+    if not results:
+        print("✗ Ninguna configuración se pudo evaluar")
+        return 1
+
+    mark_pareto(results)
+    print("")
+    print_report(results)
+
+    if args.json_out:
+        Path(args.json_out).write_text(
+            json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8"
+        )
+        print(f"✓ Resultados guardados en {args.json_out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Generador de carga HTTP contra un servidor local del traductor.
+
+Ejecuta barridos de concurrencia con distintas mezclas de peticiones
+(texto vs HTML, es-da vs da-es, caché caliente vs fría) y reporta curvas de
+throughput/latencia y el punto de saturación de cada configuración.
+
+Los payloads se obtienen de:
+- Ejemplos de examples/curl_examples.sh (bloques -d '{...}' de /translate)
+- Ejemplos de los schemas del API (app/schemas.py)
+- Corpus de pruebas (test_frontend_backend.json y ficheros --corpus)
+
+Uso:
+    python scripts/loadtest.py --url http://localhost:8000 --concurrency 1,2,4,8,16
+    python scripts/loadtest.py --kinds text,html --directions es-da,da-es --cache both
+    python scripts/loadtest.py --corpus corpus_es.txt --duration 30 --json resultados.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from scripts.stats import percentile  # noqa: E402
+
+CURL_EXAMPLES = ROOT_DIR / "examples" / "curl_examples.sh"
+DEFAULT_CORPORA = [ROOT_DIR / "test_frontend_backend.json"]
+
+# Textos daneses de respaldo para la dirección da-es
+DANISH_SAMPLES = [
+    "Hej verden",
+    "Hej, hvordan har du det?",
+    "Tak for din henvendelse. Vi vender tilbage hurtigst muligt.",
+    "Kære kunde,\n\nDin ordre er afsendt og forventes leveret inden for tre dage.\n\nMed venlig hilsen",
+]
+
+# Umbral de ganancia mínima de throughput para considerar que aún escala
+SATURATION_GAIN = 0.10
+
+# Campos de /translate que también acepta /translate/html
+HTML_FIELDS = ("direction", "glossary", "max_new_tokens", "formal")
+
+# Fin de oración seguido de más texto (para marcar cada oración en modo frío)
+SENTENCE_END = re.compile(r'([.!?])([ \t]+)(?=\S)')
+HTML_TAG = re.compile(r'(<[^>]+>)')
+
+
+def load_curl_payloads(path: Path = CURL_EXAMPLES) -> List[dict]:
+    """
+    Extrae los payloads JSON de /translate de un script de ejemplos cURL.
+
+    Args:
+        path: Ruta al script con llamadas curl
+
+    Returns:
+        Lista de payloads (dict) con campo "text"
+    """
+    if not path.exists():
+        return []
+
+    content = path.read_text(encoding="utf-8")
+    payloads = []
+    for match in re.finditer(r"-d\s+'(\{.*?\})'", content, flags=re.DOTALL):
+        try:
+            payload = json.loads(match.group(1))
+        except json.JSONDecodeError:
+            continue
+        if "text" in payload:
+            payloads.append(payload)
+    return payloads
+
+
+def load_schema_payloads() -> Dict[str, List[dict]]:
+    """
+    Obtiene los ejemplos declarados en los schemas del API.
+
+    Returns:
+        Dict {"text": [...], "html": [...]} con los payloads de ejemplo
+    """
+    sys.path.insert(0, str(ROOT_DIR))
+    try:
+        from app.schemas import TranslateRequest, TranslateHTMLRequest
+    except Exception:
+        return {"text": [], "html": []}
+
+    return {
+        "text": list(TranslateRequest.Config.json_schema_extra["examples"]),
+        "html": list(TranslateHTMLRequest.Config.json_schema_extra["examples"]),
+    }
+
+
+def load_corpus(path: Path) -> List[dict]:
+    """
+    Carga un corpus de pruebas.
+
+    Formatos soportados:
+    - .json: un payload o una lista de payloads / textos
+    - otros: un texto por línea (líneas vacías ignoradas)
+
+    Args:
+        path: Ruta al fichero de corpus
+
+    Returns:
+        Lista de payloads con campo "text"
+    """
+    if not path.exists():
+        return []
+
+    if path.suffix == ".json":
+        data = json.loads(path.read_text(encoding="utf-8"))
+        items = data if isinstance(data, list) else [data]
+        return [
+            item if isinstance(item, dict) else {"text": item}
+            for item in items
+            if isinstance(item, (dict, str))
+        ]
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    return [{"text": line} for line in lines if line.strip()]
+
+
+def build_payload_pool(corpora: List[Path]) -> Dict[str, Dict[str, List[dict]]]:
+    """
+    Construye el pool de payloads agrupado por tipo y dirección.
+
+    Args:
+        corpora: Ficheros de corpus adicionales
+
+    Returns:
+        Dict {kind: {direction: [payloads]}} con kind en (text, html)
+    """
+    pool: Dict[str, Dict[str, List[dict]]] = {
+        "text": {"es-da": [], "da-es": []},
+        "html": {"es-da": [], "da-es": []},
+    }
+
+    text_payloads = load_curl_payloads()
+    for corpus in corpora:
+        text_payloads.extend(load_corpus(corpus))
+
+    schema_payloads = load_schema_payloads()
+    text_payloads.extend(schema_payloads["text"])
+
+    # Se conservan todos los campos (glossary, max_new_tokens, formal,
+    # preserve_newlines...) para ejercitar esos caminos del servidor
+    for payload in text_payloads:
+        direction = payload.get("direction", "es-da")
+        pool["text"][direction].append({**payload, "direction": direction})
+
+    for text in DANISH_SAMPLES:
+        pool["text"]["da-es"].append({"text": text, "direction": "da-es"})
+
+    for payload in schema_payloads["html"]:
+        direction = payload.get("direction", "es-da")
+        pool["html"][direction].append({"html": payload["html"], "direction": direction})
+
+    # Derivar HTML de los textos: cada párrafo en un <p>
+    for direction, payloads in pool["text"].items():
+        for payload in payloads:
+            text = payload["text"]
+            if isinstance(text, list):
+                text = "\n\n".join(text)
+            paragraphs = [p for p in text.split("\n\n") if p.strip()]
+            html = "".join(f"<p>{p.replace(chr(10), '<br>')}</p>" for p in paragraphs)
+            extra = {field: payload[field] for field in HTML_FIELDS if field in payload}
+            pool["html"][direction].append({**extra, "html": html})
+
+    return pool
+
+
+def mark_text(text: str, marker: str) -> str:
+    """Antepone el marcador a cada línea y a cada oración del texto."""
+    def mark_line(line: str) -> str:
+        if not line.strip():
+            return line
+        lead = len(line) - len(line.lstrip())
+        body = SENTENCE_END.sub(lambda m: f"{m.group(1)}{m.group(2)}{marker} ", line[lead:])
+        return f"{line[:lead]}{marker} {body}"
+
+    return "".join(mark_line(part) for part in re.split(r'(\n)', text))
+
+
+def make_cold(payload: dict, serial: int) -> dict:
+    """
+    Convierte un payload en único para forzar un fallo de caché.
+
+    El caché trabaja por segmento (bloque HTML, párrafo, oración), así que el
+    marcador se inserta en cada línea y oración de cada texto o nodo de texto:
+    ningún segmento de la petición puede acertar en caché.
+
+    Args:
+        payload: Payload original
+        serial: Número único de la petición
+
+    Returns:
+        Copia del payload con un marcador único en cada segmento
+    """
+    cold = dict(payload)
+    marker = f"Ref {serial}."
+    if "html" in cold:
+        cold["html"] = "".join(
+            part if part.startswith("<") else mark_text(part, marker)
+            for part in HTML_TAG.split(cold["html"])
+        )
+    elif isinstance(cold["text"], list):
+        cold["text"] = [mark_text(text, marker) for text in cold["text"]]
+    else:
+        cold["text"] = mark_text(cold["text"], marker)
+    return cold
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    requests_pool: List[dict],
+    concurrency: int,
+    duration: float,
+    max_requests: Optional[int],
+    cold: bool,
+    serial_start: int,
+) -> dict:
+    """
+    Ejecuta un nivel de concurrencia durante `duration` segundos.
+
+    Args:
+        client: Cliente HTTP asíncrono
+        requests_pool: Payloads a enviar (cada uno con su endpoint en "_path")
+        concurrency: Número de workers concurrentes
+        duration: Duración máxima del nivel en segundos
+        max_requests: Límite opcional de peticiones totales
+        cold: Si True, cada petición se hace única (caché fría)
+        serial_start: Número inicial para los marcadores únicos
+
+    Returns:
+        Dict con métricas del nivel
+    """
+    latencies: List[float] = []
+    errors = 0
+    counter = itertools.count(serial_start)
+    cycle = itertools.cycle(requests_pool)
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            serial = next(counter)
+            if max_requests is not None and serial - serial_start >= max_requests:
+                return
+            payload = dict(next(cycle))
+            path = payload.pop("_path")
+            if cold:
+                payload = make_cold(payload, serial)
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, json=payload)
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            elapsed = time.perf_counter() - start
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    level_start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - level_start
+
+    result = {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / wall if wall > 0 else 0.0,
+        "p50_ms": None,
+        "p95_ms": None,
+        "p99_ms": None,
+        "mean_ms": None,
+    }
+    if latencies:
+        result.update({
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "mean_ms": statistics.mean(latencies) * 1000,
+        })
+    return result
+
+
+def find_saturation(levels: List[dict], min_gain: float = SATURATION_GAIN) -> Optional[int]:
+    """
+    Determina el punto de saturación de una curva de throughput.
+
+    Es el primer nivel de concurrencia a partir del cual aumentar la
+    concurrencia ya no mejora el throughput al menos `min_gain` (relativo).
+
+    Args:
+        levels: Resultados por nivel, ordenados por concurrencia
+        min_gain: Ganancia relativa mínima para considerar que aún escala
+
+    Returns:
+        Concurrencia de saturación, o None si la curva sigue escalando
+    """
+    for previous, current in zip(levels, levels[1:]):
+        base = previous["throughput_rps"]
+        if base <= 0:
+            continue
+        if (current["throughput_rps"] - base) / base < min_gain:
+            return previous["concurrency"]
+    return None
+
+
+def print_report(name: str, levels: List[dict], saturation: Optional[int]):
+    """Imprime la tabla de resultados de una configuración."""
+    print("=" * 70)
+    print(f"Configuración: {name}")
+    print("=" * 70)
+    print(f"{'conc':>6} {'req':>7} {'err':>5} {'rps':>8} {'p50ms':>9} {'p95ms':>9} {'p99ms':>9}")
+
+    def fmt(value: Optional[float]) -> str:
+        return f"{value:9.1f}" if value is not None else f"{'-':>9}"
+
+    for level in levels:
+        print(
+            f"{level['concurrency']:>6} {level['requests']:>7} {level['errors']:>5} "
+            f"{level['throughput_rps']:8.2f} {fmt(level['p50_ms'])} "
+            f"{fmt(level['p95_ms'])} {fmt(level['p99_ms'])}"
+        )
+    if saturation is None:
+        print("Saturación: no alcanzada en el rango probado")
+    else:
+        print(f"Saturación: concurrencia {saturation}")
+    print("")
+
+
+async def run_sweep(args: argparse.Namespace) -> List[dict]:
+    """Ejecuta todas las configuraciones y niveles de concurrencia."""
+    corpora = DEFAULT_CORPORA + [Path(p) for p in args.corpus]
+    pool = build_payload_pool(corpora)
+
+    kinds = args.kinds.split(",")
+    directions = args.directions.split(",")
+    cache_modes = ["hot", "cold"] if args.cache == "both" else [args.cache]
+    levels_to_run = [int(c) for c in args.concurrency.split(",")]
+
+    paths = {"text": "/translate", "html": "/translate/html"}
+    reports = []
+    serial = random.randint(0, 10_000) * 100_000
+
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=max(levels_to_run))
+    async with httpx.AsyncClient(base_url=args.url, timeout=timeout, limits=limits) as client:
+        for kind, direction, cache_mode in itertools.product(kinds, directions, cache_modes):
+            requests_pool = [
+                dict(payload, _path=paths[kind])
+                for payload in pool[kind][direction]
+            ]
+            if not requests_pool:
+                continue
+
+            name = f"{kind} {direction} cache-{cache_mode}"
+
+            # Caché caliente: una pasada previa para poblar el caché
+            if cache_mode == "hot":
+                for payload in requests_pool:
+                    body = {k: v for k, v in payload.items() if k != "_path"}
+                    await client.post(payload["_path"], json=body)
+
+            levels = []
+            for concurrency in levels_to_run:
+                level = await run_level(
+                    client,
+                    requests_pool,
+                    concurrency=concurrency,
+                    duration=args.duration,
+                    max_requests=args.requests,
+                    cold=cache_mode == "cold",
+                    serial_start=serial,
+                )
+                serial += 1_000_000
+                levels.append(level)
+
+            saturation = find_saturation(levels)
+            print_report(name, levels, saturation)
+            reports.append({
+                "configuration": name,
+                "kind": kind,
+                "direction": direction,
+                "cache": cache_mode,
+                "levels": levels,
+                "saturation_concurrency": saturation,
+            })
+    return reports
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parsea argumentos de línea de comandos."""
+    parser = argparse.ArgumentParser(
+        description="Barridos de concurrencia contra el servidor de traducción local"
+    )
+    parser.add_argument("--url", default="http://localhost:8000", help="URL base del servidor")
+    parser.add_argument("--concurrency", default="1,2,4,8,16",
+                        help="Niveles de concurrencia separados por comas")
+    parser.add_argument("--duration", type=float, default=15.0,
+                        help="Segundos por nivel de concurrencia")
+    parser.add_argument("--requests", type=int, default=None,
+                        help="Máximo de peticiones por nivel (opcional)")
+    parser.add_argument("--kinds", default="text,html",
+                        help="Tipos de petición: text, html")
+    parser.add_argument("--directions", default="es-da,da-es",
+                        help="Direcciones: es-da, da-es")
+    parser.add_argument("--cache", choices=["hot", "cold", "both"], default="both",
+                        help="Modo de caché a medir")
+    parser.add_argument("--corpus", action="append", default=[],
+                        help="Fichero de corpus adicional (repetible)")
+    parser.add_argument("--timeout", type=float, default=300.0,
+                        help="Timeout por petición en segundos")
+    parser.add_argument("--json", dest="json_out", default=None,
+                        help="Guardar resultados en JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Punto de entrada."""
+    args = parse_args(argv)
+
+    try:
+        health = httpx.get(f"{args.url}/health", timeout=10).json()
+    except httpx.HTTPError as e:
+        print(f"✗ Servidor no disponible en {args.url}: {e}")
+        return 1
+    if not health.get("model_loaded"):
+        print("✗ El modelo no está cargado (consulta /health)")
+        return 1
+
+    reports = asyncio.run(run_sweep(args))
+
+    if args.json_out:
+        Path(args.json_out).write_text(
+            json.dumps(reports, indent=2, ensure_ascii=False), encoding="utf-8"
+        )
+        print(f"✓ Resultados guardados en {args.json_out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
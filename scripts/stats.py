@@ -0,0 +1,15 @@
+"""
+Estadísticas compartidas por los scripts de medición (loadtest, evaluate).
+
+Sin dependencias: se puede importar sin httpx ni el modelo.
+"""
+from typing import List
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentil por interpolación lineal (values no vacío)."""
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Convierte NLLB a CTranslate2 conservando solo el vocabulario español/danés.
+
+NLLB-200 comparte ~256k piezas entre 200 idiomas; las matrices de embeddings
+(encoder y decoder) y la proyección de salida ocupan una parte importante del
+modelo. Este script hace la misma conversión que scripts/convert_to_ct2.sh pero
+recorta esas matrices a las piezas que aparecen en corpus ES/DA, más los tokens
+especiales, los códigos spa_Latn/dan_Latn y los caracteres latinos sueltos.
+
+El modelo resultante guarda la lista de piezas conservadas en trimmed_vocab.txt:
+al arrancar con CT2_DIR apuntando a él, la tokenización re-segmenta las piezas
+que ya no existen (app/tokenization.py, RestrictedVocabulary), de modo que los
+IDs de CT2 y el tokenizador siguen siendo coherentes.
+
+Requiere torch y transformers (igual que ct2-transformers-converter).
+
+Uso:
+    python scripts/trim_vocab.py --in models/nllb-600m \\
+        --out models/nllb-600m-ct2-int8-esda --tsv corpus_es_da.tsv
+    CT2_DIR=./models/nllb-600m-ct2-int8-esda make run
+"""
+import argparse
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, List, Optional, Set
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from app.tokenization import SPM_MODEL_FILE, TRIMMED_VOCAB_FILE  # noqa: E402
+from scripts.build_vmap import always_allowed, read_corpora  # noqa: E402
+
+
+def select_pieces(processor, texts: Iterable[str], min_count: int = 1) -> Set[str]:
+    """
+    Piezas a conservar: las del corpus más las siempre permitidas.
+
+    Args:
+        processor: sentencepiece.SentencePieceProcessor del modelo NLLB
+        texts: Textos en español y danés
+        min_count: Apariciones mínimas de una pieza del corpus
+
+    Returns:
+        Conjunto de piezas (incluye tokens especiales y códigos de idioma)
+    """
+    counts = Counter()
+    for pieces in processor.encode(list(texts), out_type=str):
+        counts.update(pieces)
+
+    vocab = [processor.id_to_piece(i) for i in range(processor.get_piece_size())]
+    keep = always_allowed(vocab)
+    keep.update(piece for piece, n in counts.items() if n >= min_count)
+    return keep
+
+
+def _take_rows(value, ids: List[int]):
+    """Filas `ids` de una matriz (tensor de torch o array de numpy)."""
+    if hasattr(value, "detach"):
+        value = value.detach()
+    return value[ids]
+
+
+def make_converter(model_dir: str, keep: Set[str]):
+    """
+    Crea un TransformersConverter que recorta el vocabulario a `keep`.
+
+    El recorte se aplica sobre la especificación ya cargada (antes de validar y
+    cuantizar), así que el resto de la conversión es la de ct2-transformers-converter.
+    """
+    from ctranslate2.converters import TransformersConverter
+
+    class TrimmedTransformersConverter(TransformersConverter):
+        """Conversión Transformers → CT2 con embeddings y proyección recortados."""
+
+        trimmed_tokens: List[str] = []
+
+        def _load(self):
+            spec = super()._load()
+            vocabulary = spec._vocabularies["source"][0]
+
+            required = {spec.config.bos_token, spec.config.eos_token, spec.config.unk_token}
+            keep_ids = [
+                i for i, token in enumerate(vocabulary)
+                if token in keep or token in required
+            ]
+
+            spec.encoder.embeddings[0].weight = _take_rows(spec.encoder.embeddings[0].weight, keep_ids)
+            spec.decoder.embeddings.weight = _take_rows(spec.decoder.embeddings.weight, keep_ids)
+            spec.decoder.projection.weight = _take_rows(spec.decoder.projection.weight, keep_ids)
+            # El bias es opcional (NLLB no lo define: queda el marcador de CT2, un str)
+            bias = spec.decoder.projection.bias
+            if bias is not None and not isinstance(bias, str):
+                spec.decoder.projection.bias = _take_rows(bias, keep_ids)
+
+            # Vocabulario compartido con los mismos índices que las filas conservadas
+            self.trimmed_tokens = [vocabulary[i] for i in keep_ids]
+            spec._vocabularies["source"] = [self.trimmed_tokens]
+            spec._vocabularies["target"] = [self.trimmed_tokens]
+            return spec
+
+    return TrimmedTransformersConverter(model_dir)
+
+
+def _size_mb(path: Path) -> float:
+    """Tamaño de model.bin en MB (0 si no existe)."""
+    model_bin = path / "model.bin"
+    return model_bin.stat().st_size / (1024 * 1024) if model_bin.exists() else 0.0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parsea argumentos de línea de comandos."""
+    parser = argparse.ArgumentParser(description="Convierte NLLB a CT2 con vocabulario ES/DA recortado")
+    parser.add_argument("--in", dest="input_dir", required=True,
+                        help="Modelo HuggingFace (MODEL_DIR)")
+    parser.add_argument("--out", dest="output_dir", required=True,
+                        help="Directorio del modelo CT2 recortado (CT2_DIR)")
+    parser.add_argument("--tsv", action="append", default=[], type=Path,
+                        help="Corpus paralelo es<TAB>da (repetible)")
+    parser.add_argument("--es", action="append", default=[], type=Path,
+                        help="Corpus monolingüe en español (repetible)")
+    parser.add_argument("--da", action="append", default=[], type=Path,
+                        help="Corpus monolingüe en danés (repetible)")
+    parser.add_argument("--min-count", type=int, default=1,
+                        help="Apariciones mínimas de una pieza del corpus")
+    parser.add_argument("--quantization", default="int8",
+                        help="Cuantización de los pesos (como convert_to_ct2.sh)")
+    parser.add_argument("--force", action="store_true",
+                        help="Sobrescribir el directorio de salida")
+    parser.add_argument("--reference", default=None,
+                        help="Modelo CT2 completo para comparar tamaños (opcional)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Punto de entrada."""
+    args = parse_args(argv)
+    if not (args.tsv or args.es or args.da):
+        print("Error: indica al menos un corpus (--tsv, --es o --da)")
+        return 2
+
+    import sentencepiece as spm
+
+    model_path = Path(args.input_dir) / SPM_MODEL_FILE
+    if not model_path.exists():
+        print(f"Error: no existe {model_path} (ejecuta: make download)")
+        return 2
+    processor = spm.SentencePieceProcessor(model_file=str(model_path))
+
+    pairs, mono = read_corpora(args.tsv, args.es, args.da)
+    texts = mono["spa_Latn"] + mono["dan_Latn"] + [text for pair in pairs for text in pair]
+    keep = select_pieces(processor, texts, args.min_count)
+    print(f"Piezas seleccionadas: {len(keep)} de {processor.get_piece_size()} ({len(texts)} frases)")
+
+    print(f"Convirtiendo {args.input_dir} → {args.output_dir} ({args.quantization})...")
+    converter = make_converter(args.input_dir, keep)
+    converter.convert(args.output_dir, quantization=args.quantization, force=args.force)
+
+    output_dir = Path(args.output_dir)
+    (output_dir / TRIMMED_VOCAB_FILE).write_text(
+        "\n".join(converter.trimmed_tokens) + "\n", encoding="utf-8"
+    )
+
+    print(f"✓ Vocabulario CT2: {len(converter.trimmed_tokens)} piezas ({TRIMMED_VOCAB_FILE})")
+    print(f"  model.bin: {_size_mb(output_dir):.0f} MB")
+    if args.reference:
+        print(f"  referencia: {_size_mb(Path(args.reference)):.0f} MB ({args.reference})")
+    print(f"Actívalo con: CT2_DIR={args.output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,8 +8,15 @@ Verifica:
 """
 import pytest
 from app.segment import (
+    split_sentences,
     split_text_for_email,
+    split_text_by_tokens,
+    split_text_spans,
+    join_spans,
     split_html_preserving_structure,
+    collect_attribute_texts,
+    restore_inline_tags,
+    translate_text_blocks,
     rehydrate_html
 )
 
@@ -160,6 +167,59 @@ def test_split_and_rehydrate_roundtrip():
     assert '<strong>' in reconstructed or 'importante' in reconstructed
 
 
+def test_translate_attributes_same_batch():
+    """alt/title se añaden tras los textos y se reinsertan escapados."""
+    html = '<p title="Hola">Hola</p><img src="/a.png" alt="Foto del equipo">'
+    blocks, texts = split_html_preserving_structure(html)
+
+    all_texts = collect_attribute_texts(blocks, texts)
+    assert all_texts == ['Hola', 'Hola', 'Foto del equipo']
+
+    translations = ['Hej', 'Hej "du"', 'Foto af <holdet>']
+    result = rehydrate_html(blocks, translations)
+
+    assert result == (
+        '<p title="Hej &quot;du&quot;">Hej</p>'
+        '<img src="/a.png" alt="Foto af &lt;holdet&gt;">'
+    )
+
+
+def test_inline_tags_single_segment():
+    """Las etiquetas inline viajan como marcadores: una frase, un segmento."""
+    html = '<p>Haga clic <a href="/x">aquí</a> para <strong>continuar</strong>.</p>'
+    blocks, texts = split_html_preserving_structure(html)
+
+    assert texts == ['Haga clic [1]aquí[/1] para [2]continuar[/2].']
+    assert rehydrate_html(blocks, texts) == html
+    assert rehydrate_html(blocks, ['Klik [1]her[/1] for at [2]fortsætte[/2].']) == (
+        '<p>Klik <a href="/x">her</a> for at <strong>fortsætte</strong>.</p>'
+    )
+
+
+def test_restore_inline_tags_validates():
+    """Marcadores que faltan, se repiten o se cruzan invalidan la restauración."""
+    inline = {1: {'name': 'b', 'attrs': {}}, 2: {'name': 'i', 'attrs': {}}}
+
+    assert restore_inline_tags('[ 1 ]a[/1] [2]b[/2]', inline) == '<b>a</b> <i>b</i>'
+    for broken in ['[1]a[/1] b', '[1]a[/1][1]c[/1] [2]b[/2]', '[1]a[2]b[/1][/2]', '[3]x[/3]']:
+        assert restore_inline_tags(broken, inline) is None
+
+
+def test_inline_fallback_translates_fragments():
+    """Si el modelo pierde los marcadores, el bloque se traduce por fragmentos."""
+    blocks, texts = split_html_preserving_structure('<p>Hola <b>mundo</b> feliz</p><p>Adiós</p>')
+    calls = []
+
+    def translate_many(batch):
+        calls.append(list(batch))
+        return [t.replace('[/1]', '').upper() for t in batch]
+
+    translations = translate_text_blocks(blocks, texts, translate_many)
+
+    assert calls == [['Hola [1]mundo[/1] feliz', 'Adiós'], ['Hola', 'mundo', 'feliz']]
+    assert rehydrate_html(blocks, translations) == '<p>HOLA <b>MUNDO</b> FELIZ</p><p>ADIÓS</p>'
+
+
 def test_split_html_empty():
     """Test con HTML vacío."""
     blocks, texts = split_html_preserving_structure("")
@@ -169,6 +229,87 @@ def test_split_html_empty():
     assert isinstance(texts, list)
 
 
+def test_split_sentences_reversible():
+    """La división en oraciones conserva puntuación y separadores originales."""
+    text = "Hola Juan. ¿Cómo estás?  Todo bien!\nTak for sidst. Øl i morgen."
+    sentences = split_sentences(text)
+
+    assert [s for s, _ in sentences] == [
+        "Hola Juan.", "¿Cómo estás?", "Todo bien!", "Tak for sidst.", "Øl i morgen."
+    ]
+    assert "".join(s + sep for s, sep in sentences) == text
+
+
+def test_split_sentences_single():
+    """Un texto sin fronteras de oración devuelve una sola oración."""
+    assert split_sentences("sin frontera. minúscula") == [("sin frontera. minúscula", "")]
+
+
+def _count_words(texts):
+    """Contador de 'tokens' por palabras para los tests de segmentación."""
+    return [len(text.split()) for text in texts]
+
+
+def _segments(text, spans):
+    """Textos de los spans."""
+    return [text[start:end] for start, end, _ in spans]
+
+
+def test_split_text_by_tokens_packs_sentences():
+    """Las oraciones se empaquetan hasta el presupuesto sin cruzar párrafos."""
+    text = "Uno dos. Tres cuatro. Cinco seis.\n\nSiete ocho. Nueve."
+    spans = split_text_by_tokens(text, _count_words, max_tokens=4)
+
+    assert _segments(text, spans) == ["Uno dos. Tres cuatro.", "Cinco seis.", "Siete ocho. Nueve."]
+    assert [sep for _, _, sep in spans] == [" ", "\n\n", ""]
+
+
+def test_split_text_by_tokens_reversible():
+    """join_spans con el propio segmento reproduce el texto, espacios incluidos."""
+    text = "\n\nHola amigo. Qué tal.\n \n\nAdiós. Hasta pronto otra vez.  "
+    spans = split_text_by_tokens(text, _count_words, max_tokens=2)
+
+    assert join_spans(text, spans, _segments(text, spans)) == text
+    assert "Hasta pronto otra vez." in _segments(text, spans)  # mayor que el presupuesto
+
+
+def test_split_text_by_tokens_short_text_not_counted():
+    """Un texto más corto que el presupuesto no llama al tokenizador."""
+    def fail(texts):
+        raise AssertionError("no debería contar tokens")
+
+    assert split_text_by_tokens("Hola. Adiós.", fail, max_tokens=256) == [(0, 12, "")]
+
+
+def test_split_text_spans_lossless():
+    """Los separadores (saltos de línea incluidos) se restauran exactamente."""
+    text = "  Hola Juan. ¿Cómo estás?\n\n\nTak for sidst.\nØl i morgen!\t\n"
+    spans = split_text_spans(text, max_segment_chars=15)
+    upper = [segment.upper() for segment in _segments(text, spans)]
+
+    assert _segments(text, spans) == ["Hola Juan.", "¿Cómo estás?", "Tak for sidst.", "Øl i morgen!"]
+    assert join_spans(text, spans, upper) == (
+        "  HOLA JUAN. ¿CÓMO ESTÁS?\n\n\nTAK FOR SIDST.\nØL I MORGEN!\t\n"
+    )
+
+
+def test_split_text_spans_blank_and_short():
+    """Texto en blanco: sin spans; texto corto: un span sin los espacios extremos."""
+    assert split_text_spans("  \n ") == []
+    assert join_spans("  \n ", [], []) == "  \n "
+    assert split_text_spans(" Hola. ") == [(1, 6, " ")]
+
+
+def test_split_text_for_email_large_input_matches_spans():
+    """En textos grandes, split_text_for_email son los spans de split_text_spans."""
+    paragraph = "Estimado cliente. Su pedido está en camino. " * 40
+    text = "\n\n".join([paragraph] * 60)  # ~100 KB
+    segments = split_text_for_email(text, max_segment_chars=600)
+
+    assert segments == _segments(text, split_text_spans(text, 600))
+    assert all(len(segment) <= 600 for segment in segments)
+    assert "".join(segments).replace(" ", "") == text.replace(" ", "").replace("\n", "")
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
 
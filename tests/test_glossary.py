@@ -12,7 +12,10 @@ from app.glossary import (
     apply_glossary_post,
     clean_glossary_markers,
     _protect_entities,
-    _restore_entities
+    _restore_entities,
+    compile_glossary,
+    markers_to_sentinels,
+    sentinels_to_markers
 )
 
 
@@ -221,6 +224,101 @@ def test_glossary_special_characters():
     assert ".NET" in result or "[[" in result
 
 
+def test_glossary_longest_match_without_nesting():
+    """Términos solapados: gana el más largo y no se anidan marcadores."""
+    glossary = {
+        "Acme": "Acme",
+        "Acme Corporation": "Acme Corporation A/S"
+    }
+
+    result = apply_glossary_pre("Acme Corporation y acme", glossary)
+
+    assert result == "[[TERM::Acme Corporation]] y [[TERM::acme]]"
+
+
+def test_glossary_longest_falls_back_on_word_boundary():
+    """Si el término largo no termina en frontera de palabra, se usa el corto."""
+    glossary = {"pedido": "ordre", "pedido urgente": "hasteordre"}
+
+    result = apply_glossary_pre("pedido urgentes", glossary)
+
+    assert result == "[[TERM::pedido]] urgentes"
+
+
+def test_compiled_glossary_matches_dict():
+    """El matcher compilado produce lo mismo que el diccionario y se reutiliza."""
+    glossary = {"factura": "faktura", "cliente": "kunde"}
+    text = "La factura del cliente, ver https://factura.com"
+
+    matcher = compile_glossary(glossary)
+
+    assert compile_glossary(dict(glossary)) is matcher
+    assert apply_glossary_pre(text, matcher) == apply_glossary_pre(text, glossary)
+    marked = apply_glossary_pre(text, matcher)
+    assert "https://factura.com" in marked
+    assert apply_glossary_post(marked, matcher) == apply_glossary_post(marked, glossary)
+
+
+def test_protect_entities_replaces_in_place():
+    """Cada entidad se sustituye en su posición, no en la primera aparición."""
+    text = "Modelo A1 cuesta 1 EUR, ver www.a1.dk o info@a1.dk"
+    protected, entities = _protect_entities(text)
+
+    assert protected == "Modelo A1 cuesta __NUM_0__ EUR, ver __URL_0__ o __EMAIL_0__"
+    assert _restore_entities(protected, entities) == text
+
+
+def test_number_heavy_roundtrip():
+    """Facturas con muchos números: pre + post devuelve los valores intactos."""
+    text = " ".join(f"Línea {i}: {i * 3},50 DKK" for i in range(1, 300))
+    marked = apply_glossary_pre(text, {"Línea": "Linje"})
+
+    assert "[[KEEP::897,50]]" in marked
+    assert apply_glossary_post(marked, {"Línea": "Linje"}) == text.replace("Línea", "Linje")
+
+
+def test_inline_tag_markers_not_protected():
+    """Los marcadores de etiquetas inline [1]...[/1] no se tratan como números."""
+    marked = apply_glossary_pre("Pague [1]3 facturas[/1] hoy", {"facturas": "fakturaer"})
+
+    assert marked == "Pague [1][[KEEP::3]] [[TERM::facturas]][/1] hoy"
+
+
+def test_bracketed_numbers_in_plain_text_protected():
+    """Sin pareja [n]...[/n] los corchetes son texto: sus números se protegen enteros."""
+    marked = apply_glossary_pre("Ver [1] y 3.5] y 2024", {"ver": "se"})
+
+    assert marked == "[[TERM::Ver]] [[[KEEP::1]]] y [[KEEP::3.5]]] y [[KEEP::2024]]"
+    assert apply_glossary_post(marked, {"ver": "se"}) == "se [1] y 3.5] y 2024"
+
+
+def test_clean_nested_markers():
+    """Marcadores anidados también se limpian."""
+    assert clean_glossary_markers("[[KEEP::[[TERM::a]]]] b") == "a b"
+
+
+def test_markers_to_sentinels_roundtrip():
+    """Los marcadores se sustituyen por §n y se restauran aunque haya espacios."""
+    text = "Pague [[KEEP::1.250,00]] a [[TERM::Acme Corporation]] en [[KEEP::https://acme.dk]]"
+    compact, markers = markers_to_sentinels(text)
+
+    assert compact == "Pague §1 a §2 en §3"
+    restored, missing = sentinels_to_markers("Betal § 1 til §2 på §3", markers)
+    assert restored == (
+        "Betal [[KEEP::1.250,00]] til [[TERM::Acme Corporation]] på [[KEEP::https://acme.dk]]"
+    )
+    assert missing == 0
+
+
+def test_sentinels_missing_and_existing():
+    """Centinelas perdidos se cuentan; textos con '§<n>' propio no se convierten."""
+    _, markers = markers_to_sentinels("[[KEEP::10]] y [[KEEP::20]]")
+    assert sentinels_to_markers("§2", markers) == ("[[KEEP::20]]", 1)
+
+    text = "Ver § 3 de [[TERM::Acme]]"
+    assert markers_to_sentinels(text) == (text, [])
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
 
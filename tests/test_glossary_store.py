@@ -0,0 +1,141 @@
+"""
+Tests para los glosarios con nombre (glossary_store.py y endpoints /glossaries).
+
+Verifica:
+- Versión estable por contenido
+- Persistencia y recarga desde disco
+- Resolución de glosario por nombre/versión en las peticiones
+"""
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import app.app as app_module
+from app.glossary import apply_glossary_pre
+from app.glossary_store import GlossaryStore, glossary_version
+from app.schemas import TranslateRequest
+
+
+TERMS = {"Acme Corporation": "Acme Corporation A/S", "factura": "faktura"}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Registro temporal instalado en la app."""
+    store = GlossaryStore(str(tmp_path / "glossaries"))
+    monkeypatch.setattr(app_module, "glossary_store", store)
+    return store
+
+
+def test_version_is_order_independent():
+    """La versión depende del contenido, no del orden de las claves."""
+    reordered = dict(reversed(list(TERMS.items())))
+
+    assert glossary_version(TERMS) == glossary_version(reordered)
+    assert glossary_version(TERMS) != glossary_version({"factura": "regning"})
+
+
+def test_put_persists_and_reloads(store):
+    """Un glosario registrado sobrevive a una recarga desde disco."""
+    named = store.put("acme", TERMS)
+
+    reloaded = GlossaryStore(store.directory)
+    assert reloaded.load() == 1
+    assert reloaded.get("acme").version == named.version
+    assert reloaded.get("acme").terms == TERMS
+
+
+def test_named_glossary_is_precompiled(store):
+    """El matcher se compila al registrar y marca igual que el diccionario."""
+    named = store.put("acme", TERMS)
+    text = "Factura de Acme Corporation"
+
+    assert apply_glossary_pre(text, named.matcher) == apply_glossary_pre(text, TERMS)
+
+
+def test_invalid_name_rejected(store):
+    """Los nombres no pueden salir del directorio de glosarios."""
+    with pytest.raises(ValueError):
+        store.put("../etc", TERMS)
+    with pytest.raises(ValueError):
+        store.put("acme\n", TERMS)
+
+
+def test_delete_removes_file(store):
+    """Eliminar borra el registro y el fichero."""
+    store.put("acme", TERMS)
+
+    assert store.delete("acme") is True
+    assert store.delete("acme") is False
+    assert GlossaryStore(store.directory).load() == 0
+
+
+def test_resolve_named_glossary(store):
+    """Por nombre: matcher registrado y namespace con la versión."""
+    named = store.put("acme", TERMS)
+
+    matcher, namespace = app_module.resolve_glossary(
+        TranslateRequest(text="hola", glossary_name="acme")
+    )
+
+    assert matcher is named.matcher
+    assert namespace == f"glossary:{named.version}"
+
+
+def test_resolve_glossary_errors(store):
+    """Nombre inexistente → 404, versión distinta → 409, ambos → 400."""
+    store.put("acme", TERMS)
+
+    cases = [
+        (TranslateRequest(text="x", glossary_name="otro"), 404),
+        (TranslateRequest(text="x", glossary_name="acme", glossary_version="0" * 16), 409),
+        (TranslateRequest(text="x", glossary_name="acme", glossary=TERMS), 400),
+    ]
+    for request, expected in cases:
+        with pytest.raises(HTTPException) as exc_info:
+            app_module.resolve_glossary(request)
+        assert exc_info.value.status_code == expected
+
+
+def test_glossary_endpoints(store, monkeypatch):
+    """PUT/GET/DELETE /glossaries/{name} y listado."""
+    monkeypatch.setattr(app_module.settings, "ADMIN_TOKEN", "secreto")
+    client = TestClient(app_module.app)
+    admin = {"X-Admin-Token": "secreto"}
+
+    response = client.put("/glossaries/acme", json={"terms": TERMS}, headers=admin)
+    assert response.status_code == 200
+    version = response.json()["version"]
+    assert response.json()["size"] == 2
+
+    assert client.get("/glossaries").json() == [
+        {"name": "acme", "version": version, "size": 2, "terms": None}
+    ]
+    assert client.get("/glossaries/acme", headers=admin).json()["terms"] == TERMS
+    public = client.get("/glossaries/acme").json()
+    assert public == {"name": "acme", "version": version, "size": 2, "terms": None}
+
+    assert client.delete("/glossaries/acme", headers=admin).status_code == 200
+    assert client.get("/glossaries/acme").status_code == 404
+    assert client.put("/glossaries/a.b", json={"terms": TERMS}, headers=admin).status_code == 400
+
+
+def test_glossary_writes_require_admin(store, monkeypatch):
+    """Registrar y eliminar glosarios exige el token de administración."""
+    client = TestClient(app_module.app)
+    store.put("acme", TERMS)
+
+    monkeypatch.setattr(app_module.settings, "ADMIN_TOKEN", "")
+    assert client.put("/glossaries/otro", json={"terms": TERMS}).status_code == 404
+    assert client.delete("/glossaries/acme").status_code == 404
+
+    monkeypatch.setattr(app_module.settings, "ADMIN_TOKEN", "secreto")
+    bad = {"X-Admin-Token": "otro"}
+    assert client.put("/glossaries/otro", json={"terms": TERMS}, headers=bad).status_code == 403
+    assert client.delete("/glossaries/acme", headers=bad).status_code == 403
+    assert store.get("acme") is not None
+    assert store.get("otro") is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
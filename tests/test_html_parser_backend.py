@@ -0,0 +1,75 @@
+"""
+Tests para el backend de parsing HTML configurable (HTML_PARSER en utils_html.py).
+
+Verifica:
+- Resolución del backend (auto, lxml sin instalar, valores inválidos)
+- Fragmentos sin envoltorios <html>/<body>
+- Equivalencia lxml ↔ html.parser sobre los correos de los tests de HTML
+"""
+import pytest
+
+import app.utils_html as utils_html
+from app.segment import split_html_preserving_structure
+from app.utils_html import LXML_AVAILABLE, parse_html_fragment, resolve_html_parser, sanitize_html
+
+
+# HTML de tests/test_email_html.py y tests/test_preserve_html_structure.py
+EMAILS = [
+    "<p>Hola mundo</p><p>Segunda línea</p>",
+    '<p>Visita <a href="https://example.com">nuestro sitio</a></p>',
+    "Línea 1<br><br>Línea 2",
+    "<ul><li>Hola</li><li>mundo</li></ul>",
+    "<div><br><br></div>",
+    "<p>Estimado cliente,</p>\n<p>Gracias por contactar con nosotros.</p>\n"
+    "<p>Atentamente,<br>\nEl equipo</p>",
+    "<p>Estimado cliente,</p>\n<p>Le informamos que su pedido está <strong>listo</strong>.</p>\n"
+    '<p>Para más información:<br>\nTeléfono: <a href="tel:123">123-456</a><br>\n'
+    'Email: <a href="mailto:info@example.com">info@example.com</a></p>',
+    "<table>\n<tr><td>Celda 1</td><td>Celda 2</td></tr>\n"
+    "<tr><td>Celda 3</td><td>Celda 4</td></tr>\n</table>",
+    '<p onclick="x()">Texto <a href="javascript:alert(1)">enlace</a>'
+    '<script>alert(1)</script> &amp; más</p>',
+]
+
+
+def _structure(html, parser):
+    """Bloques tras sanitizar con un backend (texto sin espacios de los extremos)."""
+    blocks, _ = split_html_preserving_structure(sanitize_html(html, parser=parser))
+    return [
+        (b['type'], b.get('name'), b.get('attrs'), b.get('content', '').strip())
+        for b in blocks
+    ]
+
+
+def test_resolve_html_parser(monkeypatch):
+    """auto usa lxml solo si está instalado; valores desconocidos → html.parser."""
+    monkeypatch.setattr(utils_html, "LXML_AVAILABLE", False)
+    assert resolve_html_parser("auto") == "html.parser"
+    assert resolve_html_parser("lxml") == "html.parser"
+
+    monkeypatch.setattr(utils_html, "LXML_AVAILABLE", True)
+    assert resolve_html_parser("auto") == "lxml"
+    assert resolve_html_parser("html.parser") == "html.parser"
+    assert resolve_html_parser("html5lib") == "html.parser"
+
+
+@pytest.mark.parametrize("parser", [
+    "html.parser",
+    pytest.param("lxml", marks=pytest.mark.skipif(not LXML_AVAILABLE, reason="lxml no instalado")),
+])
+def test_fragment_without_document_wrappers(parser):
+    """El fragmento se serializa sin <html>/<body> ni <p> añadidos."""
+    soup = parse_html_fragment("Texto suelto<br><b>negrita</b>", parser=parser)
+
+    assert str(soup) == "Texto suelto<br/><b>negrita</b>"
+
+
+@pytest.mark.skipif(not LXML_AVAILABLE, reason="lxml no instalado")
+@pytest.mark.parametrize("html", EMAILS)
+def test_lxml_matches_html_parser(html):
+    """Mismos bloques y textos a traducir con ambos backends."""
+    assert _structure(html, "lxml") == _structure(html, "html.parser")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,87 @@
+"""
+Tests para la sanitización + extracción de HTML en una sola pasada (segment.py).
+
+Verifica:
+- Equivalencia con split_html_preserving_structure(sanitize_html(html))
+- Eliminación de etiquetas, atributos y URLs peligrosas
+- HTML mal formado (cierres cruzados, sin apertura, elementos sin cerrar)
+"""
+import random
+
+import pytest
+from app.segment import sanitize_and_split_html, split_html_preserving_structure
+from app.utils_html import sanitize_html
+
+
+def _two_pass(html):
+    """Camino de referencia: sanitizar, serializar y volver a parsear."""
+    return split_html_preserving_structure(sanitize_html(html, parser="html.parser"))
+
+
+@pytest.mark.parametrize("html", [
+    "<p>Hola <strong>mundo</strong></p>",
+    "<div><p>Uno</p>\n  <p>Dos<br>tres</p></div>",
+    '<p onclick="x()" class="a   b">Texto <a href="javascript:alert(1)">enlace</a></p>',
+    '<p>Foto <img src="data:image/png;base64,AAAA" alt="x"> y <img src="/a.png"></p>',
+    "<script>alert(1)</script><style>p{}</style><p>Visible</p>",
+    "<table><tr><td>Celda <font color=red>roja</font></td></tr></table>",
+    "<p>Cruzado <b>negrita <i>cursiva</b> fuera</i></p>",
+    "</span>Sin apertura</p><p>Sin cierre <em>abierto",
+    "<p>Entidades &amp; &lt;tags&gt; &nbsp;y ñ</p><!-- comentario --><p>fin</p>",
+    "<p>  <span> </span>\n<br></br>  texto  </p><pre>  \n  </pre>",
+])
+def test_matches_two_pass(html):
+    """Los bloques y textos coinciden con el camino en dos pasadas."""
+    assert sanitize_and_split_html(html) == _two_pass(html)
+
+
+def test_removes_dangerous_content():
+    """Sin atributos peligrosos ni URLs inseguras en los bloques."""
+    blocks, texts = sanitize_and_split_html(
+        '<p onclick="x()"><a href="javascript:alert(1)">clic</a>'
+        '<a href="https://ejemplo.dk" title="T">web</a></p>'
+    )
+
+    opened = [b for b in blocks if b['type'] == 'tag_open']
+    assert [b['name'] for b in opened] == ['p', 'span']
+    assert opened[0]['attrs'] == {}
+    assert texts == ['clic', '[1]web[/1]']
+    assert blocks[-2]['inline'] == {1: {'name': 'a', 'attrs': {'href': 'https://ejemplo.dk', 'title': 'T'}}}
+
+
+def test_empty_html():
+    """HTML vacío → sin bloques."""
+    assert sanitize_and_split_html("") == ([], [])
+    assert sanitize_and_split_html("  \n ") == ([], [])
+
+
+def test_random_tag_soup_matches_two_pass():
+    """HTML aleatorio mal formado: misma salida que el camino en dos pasadas."""
+    tags = ["p", "b", "a", "span", "div", "li", "ul", "td", "tr", "font", "center",
+            "script", "img", "br", "hr", "h1", "em", "u", "o:p", "input", "pre"]
+    attrs = ['href="http://x.dk"', 'href="javascript:x()"', 'src="/a.png"', 'src="data:x"',
+             'alt="Foto"', 'class="a  b"', 'onclick="x()"', 'nowrap']
+    words = ["Hola", "mundo", "&amp;", "&lt;", "&nbsp;", "5 < 6", "\n", "  ", "<!-- c -->"]
+
+    rng = random.Random(7)
+    for _ in range(500):
+        parts = []
+        for _ in range(rng.randint(1, 20)):
+            tag, roll = rng.choice(tags), rng.random()
+            if roll < 0.35:
+                parts.append(f"<{tag}" + "".join(
+                    " " + rng.choice(attrs) for _ in range(rng.randint(0, 2))
+                ) + ">")
+            elif roll < 0.6:
+                parts.append(f"</{tag}>")
+            elif roll < 0.65:
+                parts.append(f"<{tag}/>")
+            else:
+                parts.append(rng.choice(words))
+        html = "".join(parts)
+
+        assert sanitize_and_split_html(html) == _two_pass(html), html
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,436 @@
+"""
+Tests de la lógica de batch de translate_batch (inference.py) sin modelo real.
+
+Sustituye el tokenizador y el traductor CTranslate2 del ModelManager por
+dobles deterministas para verificar:
+- Deduplicación de segmentos idénticos dentro de un batch
+- Uso del caché por dirección
+- Coalescencia single-flight entre peticiones concurrentes
+- Caché a nivel de oración para párrafos largos
+- Centinelas compactos para los marcadores de glosario
+- Reglas de post-procesado por cliente
+"""
+import threading
+import time
+
+import pytest
+
+from app.cache import translation_cache
+from app.settings import settings
+from app.metrics import metrics
+from app.startup import model_manager
+from app.inference import translate_batch, translate_text_preserving_structure
+from app.ruleset_store import TenantRuleSet
+from app.tokenization import build_direction_tokenizers
+
+
+class FakeTokenizer:
+    """Tokenizador por palabras con la interfaz mínima que usa translate_batch."""
+
+    SPECIAL = ["</s>", "spa_Latn", "dan_Latn"]
+
+    eos_token = "</s>"
+
+    def __init__(self):
+        self.src_lang = "spa_Latn"
+        self.vocab = {tok: i for i, tok in enumerate(self.SPECIAL)}
+        self.lang_code_to_id = {"spa_Latn": 1, "dan_Latn": 2}
+        self.calls = []
+
+    def _id(self, token):
+        return self.vocab.setdefault(token, len(self.vocab))
+
+    def __call__(self, texts, add_special_tokens=True, **kwargs):
+        self.calls.append(kwargs)
+        prefix = [self._id(self.src_lang)] if add_special_tokens else []
+        suffix = [0] if add_special_tokens else []
+        return {
+            "input_ids": [
+                prefix + [self._id(t) for t in text.split()] + suffix
+                for text in texts
+            ]
+        }
+
+    def convert_ids_to_tokens(self, ids):
+        inverse = {i: tok for tok, i in self.vocab.items()}
+        if isinstance(ids, int):
+            return inverse[ids]
+        return [inverse[i] for i in ids]
+
+    def convert_tokens_to_ids(self, tokens):
+        return [self._id(t) for t in tokens]
+
+    def decode(self, ids, skip_special_tokens=True, **kwargs):
+        tokens = self.convert_ids_to_tokens(ids)
+        if skip_special_tokens:
+            tokens = [t for t in tokens if t not in self.SPECIAL]
+        return " ".join(tokens)
+
+
+class FakeResult:
+    def __init__(self, hypothesis):
+        self.hypotheses = [hypothesis]
+
+
+class FakeAsyncResult:
+    """Resultado asynchronous=True: registra cuándo se espera."""
+
+    def __init__(self, result, events, call):
+        self._result = result
+        self._events = events
+        self._call = call
+
+    def result(self):
+        self._events.append(("result", self._call))
+        return self._result
+
+
+class FakeTranslator:
+    """'Traduce' poniendo en mayúsculas y registra cada ejemplo decodificado."""
+
+    def __init__(self):
+        self.decoded = []
+        self.sources = []  # secuencias de entrada completas (con tokens especiales)
+        self.calls = []  # opciones de cada llamada a translate_batch
+        self.events = []  # ("submit" | "result", nº de llamada) en orden
+        self.num_translators = 1
+        self.num_active_batches = 0
+        self.num_queued_batches = 0
+        self.gate = None  # threading.Event opcional para bloquear la decodificación
+        self.drop = set()  # tokens que el "modelo" omite en la salida
+        self.entered = threading.Event()
+
+    def translate_batch(self, source_tokens, target_prefix=None, **kwargs):
+        call = len(self.calls)
+        self.calls.append(kwargs)
+        self.events.append(("submit", call))
+        self.entered.set()
+        if self.gate is not None:
+            self.gate.wait(timeout=5)
+        results = []
+        for tokens, prefix in zip(source_tokens, target_prefix):
+            self.sources.append(list(tokens))
+            words = [t for t in tokens if t not in FakeTokenizer.SPECIAL]
+            self.decoded.append(" ".join(words))
+            output = [w.upper() for w in words if w not in self.drop]
+            results.append(FakeResult(prefix + output + ["."]))
+        if kwargs.get("asynchronous"):
+            return [FakeAsyncResult(result, self.events, call) for result in results]
+        return results
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """Instala tokenizador y traductor falsos en el ModelManager."""
+    translator = FakeTranslator()
+    tokenizer = FakeTokenizer()
+    monkeypatch.setattr(model_manager, "tokenizer", tokenizer)
+    monkeypatch.setattr(model_manager, "direction_tokenizers", build_direction_tokenizers(tokenizer))
+    monkeypatch.setattr(model_manager, "translator", translator)
+    monkeypatch.setattr(model_manager, "model_loaded", True)
+    monkeypatch.setattr(model_manager, "use_vmap", False)
+    translation_cache.clear()
+    metrics.reset()
+    yield translator
+    translation_cache.clear()
+    metrics.reset()
+
+
+def test_translate_batch_basic(fake_model):
+    """Cada texto se traduce y se mantiene el orden."""
+    result = translate_batch(["hola mundo", "adios"], use_cache=False)
+
+    assert result == ["HOLA MUNDO .", "ADIOS ."]
+
+
+def test_duplicate_segments_decoded_once(fake_model):
+    """Segmentos repetidos en el mismo batch se decodifican una sola vez."""
+    texts = ["Ver más", "hola", "Ver más", "Ver  más", "hola"]
+    result = translate_batch(texts, use_cache=False)
+
+    assert result == ["VER MÁS .", "HOLA .", "VER MÁS .", "VER MÁS .", "HOLA ."]
+    assert sorted(fake_model.decoded) == ["Ver más", "hola"]
+    assert metrics.get("dedup_saved_decodes") == 3
+
+
+def test_duplicates_fill_cache_for_every_key(fake_model):
+    """Todas las variantes de un segmento deduplicado quedan en caché."""
+    translate_batch(["Ver más", "Ver  más"])
+    fake_model.decoded.clear()
+
+    result = translate_batch(["Ver  más", "Ver más"])
+
+    assert result == ["VER MÁS .", "VER MÁS ."]
+    assert fake_model.decoded == []
+
+
+def test_cache_is_per_direction(fake_model):
+    """El mismo texto en otra dirección no reutiliza la entrada de caché."""
+    translate_batch(["hej"], direction="es-da")
+    translate_batch(["hej"], direction="da-es")
+
+    assert fake_model.decoded == ["hej", "hej"]
+
+
+def test_concurrent_identical_requests_decode_once(fake_model):
+    """Peticiones concurrentes con el mismo texto comparten una sola decodificación."""
+    fake_model.gate = threading.Event()
+    results = {}
+
+    def request(name):
+        results[name] = translate_batch(["Aviso legal confidencial"])
+
+    leader = threading.Thread(target=request, args=("leader",))
+    leader.start()
+    # Esperar a que el líder esté decodificando antes de lanzar el seguidor
+    assert fake_model.entered.wait(timeout=5)
+    deadline = time.time() + 5
+    follower = threading.Thread(target=request, args=("follower",))
+    follower.start()
+    while metrics.get("singleflight_coalesced") < 1 and time.time() < deadline:
+        time.sleep(0.01)
+
+    fake_model.gate.set()
+    leader.join()
+    follower.join()
+
+    assert results["leader"] == results["follower"] == ["AVISO LEGAL CONFIDENCIAL ."]
+    assert fake_model.decoded == ["Aviso legal confidencial"]
+    assert metrics.get("singleflight_coalesced") == 1
+
+
+def test_glossary_markers_sent_as_sentinels(fake_model):
+    """El modelo recibe centinelas compactos y la salida recupera los marcadores."""
+    result = translate_batch(["Pague [[KEEP::1.250,00]] a [[TERM::Acme Corporation]]"])
+
+    assert fake_model.decoded == ["Pague §1 a §2"]
+    assert result == ["PAGUE [[KEEP::1.250,00]] A [[TERM::Acme Corporation]] ."]
+
+
+def test_dropped_sentinel_retranslated_with_markers(fake_model):
+    """Si el modelo pierde un centinela, el segmento se retraduce con los marcadores."""
+    fake_model.drop = {"§2"}
+    text = "Pague [[KEEP::1.250,00]] a [[KEEP::2024]]"
+
+    result = translate_batch([text], use_cache=False)
+
+    assert fake_model.decoded == ["Pague §1 a §2", text]
+    assert result == ["PAGUE [[KEEP::1.250,00]] A [[KEEP::2024]] ."]
+    assert metrics.get("sentinels_missing") == 1
+
+
+def test_dropped_marker_reinserted_as_last_resort(fake_model):
+    """Si la retraducción también pierde la entidad, se añade al final en vez de perderla."""
+    fake_model.drop = {"§2", "[[KEEP::2024]]"}
+
+    result = translate_batch(["Pague [[KEEP::1.250,00]] a [[KEEP::2024]]"], use_cache=False)
+
+    assert result == ["PAGUE [[KEEP::1.250,00]] A . [[KEEP::2024]]"]
+    assert metrics.get("markers_reinserted") == 1
+
+
+def test_ruleset_applied_and_cached_per_version(fake_model):
+    """Las reglas del cliente se aplican tras el post-procesado y su versión separa el caché."""
+    brand = TenantRuleSet("demo", {"rules": [{"literal": "ACME", "replace": "Acme"}]}, "v1")
+
+    result = translate_batch(["hola acme"], ruleset=brand, cache_namespace="rules:demo@v1")
+    plain = translate_batch(["hola acme"])
+
+    assert result == ["HOLA Acme ."]
+    assert plain == ["HOLA ACME ."]
+    assert fake_model.decoded == ["hola acme", "hola acme"]
+
+
+def test_direction_tokenizers_do_not_mutate_shared_tokenizer(fake_model):
+    """Cada dirección añade su propio token de idioma sin tocar src_lang."""
+    translate_batch(["hola"], direction="es-da", use_cache=False)
+    translate_batch(["hej"], direction="da-es", use_cache=False)
+
+    assert fake_model.sources == [["spa_Latn", "hola", "</s>"], ["dan_Latn", "hej", "</s>"]]
+    assert model_manager.tokenizer.src_lang == "spa_Latn"
+    assert all(call.get("truncation") is None for call in model_manager.tokenizer.calls)
+
+
+def test_concurrent_mixed_directions(fake_model):
+    """Peticiones concurrentes de ambas direcciones no se mezclan el idioma origen."""
+    errors = []
+
+    def request(direction, word):
+        try:
+            for i in range(20):
+                translate_batch([f"{word}{i}"], direction=direction, use_cache=False)
+        except Exception as e:  # pragma: no cover - solo si hay condición de carrera
+            errors.append(e)
+
+    threads = [
+        threading.Thread(target=request, args=("es-da", "hola")),
+        threading.Thread(target=request, args=("da-es", "hej")),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    for tokens in fake_model.sources:
+        expected = "spa_Latn" if tokens[1].startswith("hola") else "dan_Latn"
+        assert tokens[0] == expected
+
+
+def test_long_paragraph_split_by_token_budget(fake_model, monkeypatch):
+    """Un párrafo que excede MAX_SEGMENT_TOKENS se traduce en un batch de segmentos."""
+    monkeypatch.setattr(settings, "MAX_SEGMENT_TOKENS", 4)
+
+    result = translate_text_preserving_structure("Uno dos. Tres cuatro. Cinco.\n\nSeis.")
+
+    assert fake_model.decoded == ["Uno dos. Tres cuatro.", "Cinco.", "Seis."]
+    assert result == "UNO DOS. TRES CUATRO. . CINCO. .\n\nSEIS. ."
+
+
+def test_non_latin_retry_keeps_request_options(fake_model, monkeypatch):
+    """El reintento por salida no latina usa el mismo post-procesado que la petición."""
+    import app.inference as inference
+
+    retries = []
+
+    def fake_retry(texts, **kwargs):
+        retries.append(kwargs)
+        return ["REINTENTO"]
+
+    monkeypatch.setattr(inference, "latin_ratios", lambda texts: [0.0] * len(texts))
+    monkeypatch.setattr(inference, "translate_batch", fake_retry)
+    ruleset = TenantRuleSet("demo", {"rules": [{"literal": "x", "replace": "y"}]}, version="v1")
+
+    result = translate_batch(
+        ["hola"], beam_size=1, use_cache=False, strict_max=True,
+        preserve_newlines=False, cache_namespace="tenant", ruleset=ruleset
+    )
+
+    assert result == ["REINTENTO"]
+    assert retries[0]["beam_size"] == 2
+    assert retries[0]["preserve_newlines"] is False
+    assert retries[0]["strict_max"] is True
+    assert retries[0]["cache_namespace"] == "tenant"
+    assert retries[0]["ruleset"] is ruleset
+
+
+def test_paragraphs_translated_in_one_batch(fake_model):
+    """Los párrafos de un texto van en un único batch repartido entre réplicas."""
+    fake_model.num_translators = 4
+    text = "Uno.\n\nDos.\n\n\nTres.\n\nCuatro."
+
+    result = translate_text_preserving_structure(text)
+
+    assert len(fake_model.calls) == 1
+    assert fake_model.calls[0]["max_batch_size"] == 1
+    assert fake_model.decoded == ["Uno.", "Dos.", "Tres.", "Cuatro."]
+    assert result == "UNO. .\n\nDOS. .\n\n\nTRES. .\n\nCUATRO. ."
+
+
+def test_idle_server_splits_batch_across_replicas(fake_model):
+    """Con el servidor ocioso, los segmentos se reparten entre todas las réplicas."""
+    fake_model.num_translators = 4
+    texts = [f"segmento {i}" for i in range(10)]
+
+    result = translate_batch(texts, use_cache=False)
+
+    assert fake_model.calls[0]["max_batch_size"] == 3  # ceil(10 / 4)
+    assert result == [f"SEGMENTO {i} ." for i in range(10)]
+    assert metrics.get("replica_split_batches") == 1
+
+
+def test_busy_replicas_limit_split(fake_model):
+    """Bajo carga solo se usan las réplicas libres; sin libres, no se divide."""
+    fake_model.num_translators = 4
+    fake_model.num_active_batches = 2
+    translate_batch([f"a {i}" for i in range(10)], use_cache=False)
+
+    fake_model.num_queued_batches = 3
+    translate_batch([f"b {i}" for i in range(10)], use_cache=False)
+
+    assert [call["max_batch_size"] for call in fake_model.calls] == [5, 0]
+
+
+def test_replica_split_disabled(fake_model, monkeypatch):
+    """SPLIT_BATCH_ACROSS_REPLICAS=false envía siempre el batch entero."""
+    monkeypatch.setattr(settings, "SPLIT_BATCH_ACROSS_REPLICAS", False)
+    fake_model.num_translators = 4
+
+    translate_batch(["uno", "dos", "tres"], use_cache=False)
+
+    assert fake_model.calls[0]["max_batch_size"] == 0
+
+
+def test_pipeline_submits_next_chunk_before_finishing(fake_model, monkeypatch):
+    """El chunk k+1 se envía a CT2 antes de esperar/post-procesar el chunk k."""
+    monkeypatch.setattr(settings, "PIPELINE_BATCH_SIZE", 2)
+    texts = [f"texto {i}" for i in range(5)]
+
+    result = translate_batch(texts, use_cache=False)
+
+    assert result == [f"TEXTO {i} ." for i in range(5)]
+    events = fake_model.events
+    order = [event for i, event in enumerate(events) if i == 0 or event != events[i - 1]]
+    assert order == [
+        ("submit", 0), ("submit", 1), ("result", 0),
+        ("submit", 2), ("result", 1), ("result", 2),
+    ]
+    assert all(call["asynchronous"] for call in fake_model.calls)
+    assert metrics.get("pipeline_chunks") == 3
+
+
+def test_pipeline_single_chunk(fake_model, monkeypatch):
+    """Con menos textos que PIPELINE_BATCH_SIZE hay una sola llamada a CT2."""
+    monkeypatch.setattr(settings, "PIPELINE_BATCH_SIZE", 32)
+
+    translate_batch(["uno", "dos", "tres"], use_cache=False)
+
+    assert len(fake_model.calls) == 1
+    assert metrics.get("pipeline_chunks") == 0
+
+
+def test_vmap_passed_to_translator(fake_model, monkeypatch):
+    """Con vmap cargado, cada llamada a CT2 restringe el vocabulario de salida."""
+    translate_batch(["uno"], use_cache=False)
+    monkeypatch.setattr(model_manager, "use_vmap", True)
+    translate_batch(["dos"], use_cache=False)
+
+    assert [call["use_vmap"] for call in fake_model.calls] == [False, True]
+
+
+@pytest.fixture
+def sentence_cache(monkeypatch):
+    """Activa el caché por oración para párrafos de cualquier longitud."""
+    monkeypatch.setattr(settings, "SENTENCE_CACHE", True)
+    monkeypatch.setattr(settings, "SENTENCE_CACHE_MIN_CHARS", 0)
+
+
+def test_sentence_cache_reuses_known_sentences(fake_model, sentence_cache):
+    """Solo las oraciones nuevas de un párrafo casi idéntico llegan al modelo."""
+    translate_batch(["Gracias por escribir. Su pedido está en camino. Saludos cordiales."])
+    fake_model.decoded.clear()
+
+    result = translate_batch(["Gracias por escribir. Su pedido llegó hoy. Saludos cordiales."])
+
+    assert fake_model.decoded == ["Su pedido llegó hoy."]
+    assert result == ["GRACIAS POR ESCRIBIR. . SU PEDIDO LLEGÓ HOY. . SALUDOS CORDIALES. ."]
+
+
+def test_sentence_cache_keeps_separators(fake_model, sentence_cache):
+    """Las oraciones se reensamblan con los separadores originales."""
+    result = translate_batch(["Hola.\nAdiós."])
+
+    assert result == ["HOLA. .\nADIÓS. ."]
+
+
+def test_sentence_cache_short_text_untouched(fake_model, sentence_cache, monkeypatch):
+    """Textos por debajo del umbral se traducen como un único segmento."""
+    monkeypatch.setattr(settings, "SENTENCE_CACHE_MIN_CHARS", 1000)
+
+    translate_batch(["Hola. Adiós."])
+
+    assert fake_model.decoded == ["Hola. Adiós."]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,52 @@
+"""
+Tests para la validación de alfabeto latino de la salida (inference.py).
+
+Verifica:
+- La tabla de traducción equivale a la clase de caracteres original
+- Proporciones por batch y umbral configurable por dirección
+"""
+import re
+
+import pytest
+from app.settings import settings
+from app.inference import is_mostly_latin, latin_ratio, latin_ratios, latin_threshold
+
+
+# Clase de caracteres usada antes de la tabla precalculada
+LEGACY_LATIN = re.compile(
+    r'[a-zA-ZæøåÆØÅàáâãäåèéêëìíîïòóôõöùúûüýÿñçÀÁÂÃÄÅÈÉÊËÌÍÎÏÒÓÔÕÖÙÚÛÜÝŸÑÇ0-9\s\.,;:!?¿¡\-\'\"()\[\]{}/@#$%&*+=<>|\\~`]'
+)
+
+
+def test_table_matches_legacy_character_class():
+    """Cada code point se clasifica igual que con la regex original."""
+    codepoints = list(range(0x3100)) + [0x202F, 0x3000, 0xFEFF, 0x1F600]
+    for codepoint in codepoints:
+        ch = chr(codepoint)
+        expected = 1.0 if LEGACY_LATIN.match(ch) else 0.0
+        assert latin_ratio(ch) == expected, hex(codepoint)
+
+
+def test_latin_ratios_batch():
+    """Proporciones por texto; vacío cuenta como latino."""
+    ratios = latin_ratios(["Hej verden", "", "Привет мир!", "ab中文"])
+
+    assert ratios[0] == 1.0
+    assert ratios[1] == 1.0
+    assert ratios[2] == pytest.approx(2 / 11)
+    assert ratios[3] == 0.5
+
+
+def test_threshold_per_direction(monkeypatch):
+    """El umbral depende del idioma destino."""
+    monkeypatch.setattr(settings, "LATIN_MIN_RATIO_DA", 0.9)
+    monkeypatch.setattr(settings, "LATIN_MIN_RATIO_ES", 0.5)
+
+    assert latin_threshold("es-da") == 0.9
+    assert latin_threshold("da-es") == 0.5
+    assert is_mostly_latin("ab中文", threshold=0.5)
+    assert not is_mostly_latin("ab中文", threshold=0.9)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
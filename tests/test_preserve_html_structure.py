@@ -10,8 +10,21 @@ from app.segment import (
     split_html_preserving_structure,
     rehydrate_html
 )
+from app.settings import settings
+from app.utils_html import LXML_AVAILABLE
 
 
+@pytest.fixture(params=[
+    "html.parser",
+    pytest.param("lxml", marks=pytest.mark.skipif(not LXML_AVAILABLE, reason="lxml no instalado")),
+])
+def html_parser(request, monkeypatch):
+    """Ejecuta el test con cada backend de parsing (HTML_PARSER)."""
+    monkeypatch.setattr(settings, "HTML_PARSER", request.param)
+    return request.param
+
+
+@pytest.mark.usefixtures("html_parser")
 class TestTranslateHTMLPreservingStructure:
     """Tests para traducción HTML con preservación total de estructura."""
     
@@ -126,6 +139,40 @@ El equipo</p>"""
         # Verificar traducción de contenido
         assert "Kære kunde" in result
         assert "Tak" in result
+    
+    def test_inline_en_un_segmento(self):
+        """Texto partido por etiquetas inline se traduce en una sola llamada."""
+        html = '<p>Hola <a href="/x">mundo</a>, <em>Gracias</em>.</p>'
+        calls = []
+        
+        def counting_translate(text: str) -> str:
+            calls.append(text)
+            return self.fake_translate(text)
+        
+        result = translate_html_preserving_structure(html, counting_translate)
+        
+        assert calls == ['Hola [1]mundo[/1], [2]Gracias[/2].']
+        assert result == '<p>Hej <a href="/x">verden</a>, <em>Tak</em>.</p>'
+    
+    def test_traduce_atributos_opcional(self):
+        """alt/title solo se traducen si se pide, y cada texto distinto una vez."""
+        html = '<p title="Hola">Hola</p><img src="/a.png" alt="Hola mundo">'
+        calls = []
+        
+        def counting_translate(text: str) -> str:
+            calls.append(text)
+            return self.fake_translate(text)
+        
+        assert 'alt="Hola mundo"' in translate_html_preserving_structure(html, counting_translate)
+        
+        calls.clear()
+        result = translate_html_preserving_structure(
+            html, counting_translate, translate_attributes=True
+        )
+        assert 'title="Hej"' in result
+        assert 'alt="Hej verden"' in result
+        assert 'src="/a.png"' in result
+        assert sorted(calls) == ["Hola", "Hola mundo"]
 
 
 class TestSplitHTMLPreservingStructure:
@@ -170,6 +217,7 @@ class TestSplitHTMLPreservingStructure:
         assert "<p>" in result
 
 
+@pytest.mark.usefixtures("html_parser")
 class TestHTMLIntegration:
     """Tests de integración para HTML completo."""
     
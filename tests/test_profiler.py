@@ -0,0 +1,83 @@
+"""
+Tests para el profiler de muestreo (profiler.py).
+
+Verifica:
+- Muestreo de hilos distintos al del profiler
+- Formato de pilas colapsadas (flamegraph)
+- Almacén acotado de perfiles por petición
+"""
+import threading
+import time
+
+import pytest
+from app.profiler import SamplingProfiler, ProfileStore, profile_for
+
+
+def _busy_worker_loop(stop_event: threading.Event):
+    """Función reconocible en las pilas muestreadas."""
+    while not stop_event.is_set():
+        sum(range(1000))
+
+
+def test_profiler_samples_named_threads():
+    """Las pilas deben incluir el nombre del hilo y la función en ejecución."""
+    stop_event = threading.Event()
+    worker = threading.Thread(
+        target=_busy_worker_loop, args=(stop_event,), name="inference-worker"
+    )
+    worker.start()
+
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    time.sleep(0.1)
+    profiler.stop()
+
+    stop_event.set()
+    worker.join()
+
+    collapsed = profiler.collapsed()
+    assert profiler.sample_count > 0
+    assert any(
+        line.startswith("inference-worker;") and "_busy_worker_loop" in line
+        for line in collapsed.splitlines()
+    )
+    # El propio hilo del profiler no debe aparecer
+    assert "sampling-profiler" not in collapsed
+
+
+def test_collapsed_format():
+    """Cada línea: pila separada por ';' seguida de espacio y número de muestras."""
+    collapsed = profile_for(0.05, interval=0.001)
+
+    lines = collapsed.splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+        assert stack
+
+
+def test_profiler_stop_is_idempotent():
+    """Parar un profiler no arrancado o ya parado no debe fallar."""
+    profiler = SamplingProfiler()
+    profiler.stop()
+    profiler.start()
+    profiler.stop()
+    profiler.stop()
+
+
+def test_profile_store_bounded():
+    """El almacén conserva solo los perfiles más recientes."""
+    store = ProfileStore(max_size=2)
+
+    first = store.add("a 1\n")
+    second = store.add("b 1\n")
+    third = store.add("c 1\n")
+
+    assert store.get(first) is None
+    assert store.get(second) == "b 1\n"
+    assert store.get(third) == "c 1\n"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,53 @@
+"""
+Tests para el motor de reglas de post-procesado (rules.py).
+
+Verifica:
+- Aplicación ordenada de reglas precompiladas
+- Procesamiento por batch equivalente al individual
+- Tiempos por regla en las métricas
+"""
+import re
+
+import pytest
+from app.rules import Rule, RuleSet
+from app.metrics import metrics
+from app.postprocess_da import postprocess_da, postprocess_da_batch
+from app.postprocess_es import postprocess_es, postprocess_es_batch
+
+
+def test_rules_apply_in_order():
+    """Cada regla ve la salida de la anterior; count limita sustituciones."""
+    ruleset = RuleSet("demo", [
+        Rule("first_a", r'a', 'b', count=1),
+        Rule("b_to_c", r'b', 'c'),
+        Rule("upper", r'c+', lambda m: m.group(0).upper()),
+    ], strip=True)
+
+    assert ruleset.apply("  aab  ") == "CaC"
+
+
+def test_apply_batch_skips_and_times():
+    """El batch respeta los índices omitidos y acumula tiempo por regla."""
+    metrics.reset()
+    ruleset = RuleSet("demo", [Rule("x", r'x', 'y', flags=re.IGNORECASE)])
+
+    result = ruleset.apply_batch(["xX", "x", "X"], skip={1})
+
+    assert result == ["yy", "x", "y"]
+    assert metrics.snapshot()["timings_ms"]["postprocess.demo.x"]["calls"] == 2
+    metrics.reset()
+
+
+def test_postprocess_batch_matches_single():
+    """El post-procesado por batch coincide con el individual."""
+    da_texts = ["Hej kunde.  Kan du  komme 16/10/2025?", "", "Hilsen"]
+    es_texts = ["Reunión el 16.10.2025 ", "", "Sin fechas"]
+
+    assert postprocess_da_batch(da_texts, formal=True) == [
+        postprocess_da(t, formal=True) for t in da_texts
+    ]
+    assert postprocess_es_batch(es_texts) == [postprocess_es(t) for t in es_texts]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
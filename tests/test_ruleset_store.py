@@ -0,0 +1,121 @@
+"""
+Tests para las reglas de post-procesado por cliente (ruleset_store.py).
+
+Verifica:
+- Formato de fichero: reglas literales/regex, prioridad y dirección
+- Una sola pasada equivalente a reglas independientes
+- Recarga en caliente por mtime
+"""
+import json
+import os
+
+import pytest
+from app.rules import Rule, OnePassRuleSet
+from app.ruleset_store import RuleSetStore, TenantRuleSet
+
+
+CONFIG = {
+    "rules": [
+        {"name": "marca", "literal": "acme", "replace": "ACME", "ignore_case": True},
+        {
+            "name": "fecha_iso",
+            "pattern": r"\b(\d{1,2})\.(\d{1,2})\.(\d{4})\b",
+            "replace": r"\3-\2-\1",
+            "directions": ["es-da"]
+        },
+        {"name": "barra", "literal": "a/b", "replace": r"a\b"}
+    ]
+}
+
+
+def _write(directory, name, config):
+    """Escribe un fichero de reglas."""
+    path = os.path.join(directory, f"{name}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    return path
+
+
+def test_rules_by_direction():
+    """Cada dirección aplica solo sus reglas; los literales no interpretan '\\'."""
+    ruleset = TenantRuleSet("demo", CONFIG, version="v1")
+    texts = ["Acme: 1.2.2025, a/b"]
+
+    assert ruleset.apply_batch(texts, "es-da") == [r"ACME: 2025-2-1, a\b"]
+    assert ruleset.apply_batch(texts, "da-es") == [r"ACME: 1.2.2025, a\b"]
+
+
+def test_invalid_rules_rejected():
+    """Reglas mal formadas producen ValueError al cargar."""
+    invalid = [
+        {"rules": [{"name": "x", "replace": "y"}]},
+        {"rules": [{"pattern": "(", "replace": "y"}]},
+        {"rules": [{"literal": "a", "replace": "b", "directions": ["xx-yy"]}]},
+        {"rules": "no-list"},
+        [],
+        {"rules": ["no-dict"]},
+        {"rules": [{"pattern": 1, "replace": "y"}]},
+        {"rules": [{"literal": "a", "replace": None}]},
+        {"rules": [{"pattern": "(a)", "replace": r"\2"}]},
+        {"rules": [{"pattern": "(a)", "replace": r"\g<x>"}]},
+        {"rules": [{"literal": "a", "replace": "b", "directions": "es-da"}]},
+    ]
+    for config in invalid:
+        with pytest.raises(ValueError):
+            TenantRuleSet("bad", config, version="v1")
+
+
+def test_one_pass_priority_and_fallback():
+    """El orden define la prioridad; backreferencias caen a modo secuencial."""
+    one_pass = OnePassRuleSet("demo", [
+        Rule("largo", r"venlig hilsen", "Med venlig hilsen"),
+        Rule("corto", r"hilsen", "Hilsen!"),
+    ])
+    # Una sola pasada: la salida de una regla no se reprocesa
+    assert one_pass.apply("venlig hilsen / hilsen") == "Med venlig hilsen / Hilsen!"
+    assert one_pass.pattern is not None
+
+    sequential = OnePassRuleSet("demo", [Rule("doble", r"(a)\1", "x")])
+    assert sequential.pattern is None
+    assert sequential.apply("aab") == "xb"
+
+
+def test_store_hot_reload(tmp_path):
+    """Un fichero modificado se recompila al pedirlo; uno inválido no sustituye al válido."""
+    store = RuleSetStore(str(tmp_path))
+    path = _write(str(tmp_path), "acme", CONFIG)
+    assert store.load() == 1
+    first = store.get("acme")
+
+    _write(str(tmp_path), "acme", {"rules": [{"literal": "acme", "replace": "Acme A/S"}]})
+    os.utime(path, (first.mtime + 10, first.mtime + 10))
+    second = store.get("acme")
+
+    assert second.version != first.version
+    assert second.apply_batch(["acme"], "da-es") == ["Acme A/S"]
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{no json")
+    os.utime(path, (first.mtime + 20, first.mtime + 20))
+    assert store.get("acme") is second
+
+    os.remove(path)
+    assert store.get("acme") is None
+    assert store.get("../acme") is None
+    assert store.get("acme\n") is None
+
+
+def test_store_skips_malformed_files(tmp_path):
+    """Un fichero mal formado se ignora sin impedir cargar el resto."""
+    _write(str(tmp_path), "acme", CONFIG)
+    _write(str(tmp_path), "lista", [])
+    _write(str(tmp_path), "grupo", {"rules": [{"pattern": "(a)", "replace": r"\2"}]})
+    store = RuleSetStore(str(tmp_path))
+
+    assert store.load() == 1
+    assert [info["name"] for info in store.list()] == ["acme"]
+    assert store.get("lista") is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
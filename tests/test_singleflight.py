@@ -0,0 +1,57 @@
+"""
+Tests para la coalescencia single-flight (singleflight.py).
+"""
+import pytest
+from app.singleflight import SingleFlight
+
+
+def test_first_claim_is_leader():
+    """El primero que reclama una clave es líder; los siguientes esperan."""
+    flight = SingleFlight()
+
+    is_leader, future = flight.claim("k")
+    assert is_leader is True
+
+    is_leader_2, future_2 = flight.claim("k")
+    assert is_leader_2 is False
+    assert future_2 is future
+    assert len(flight) == 1
+
+
+def test_resolve_publishes_and_releases():
+    """resolve() entrega el valor a los que esperan y libera la clave."""
+    flight = SingleFlight()
+    _, future = flight.claim("k")
+
+    flight.resolve("k", "valor")
+
+    assert future.result(timeout=1) == "valor"
+    assert len(flight) == 0
+    # La clave puede volver a reclamarse
+    assert flight.claim("k")[0] is True
+
+
+def test_fail_propagates_error():
+    """fail() propaga la excepción del líder a los seguidores."""
+    flight = SingleFlight()
+    flight.claim("k")
+    _, follower_future = flight.claim("k")
+
+    flight.fail("k", RuntimeError("fallo"))
+
+    with pytest.raises(RuntimeError, match="fallo"):
+        follower_future.result(timeout=1)
+    assert len(flight) == 0
+
+
+def test_independent_keys():
+    """Claves distintas no se coalescen."""
+    flight = SingleFlight()
+
+    assert flight.claim("a")[0] is True
+    assert flight.claim("b")[0] is True
+    assert len(flight) == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
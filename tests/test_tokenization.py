@@ -0,0 +1,169 @@
+"""
+Tests de la tokenización por dirección (app/tokenization.py).
+
+Verifica:
+- Backend SentencePiece: prefijo de idioma, truncado y decodificación en batch
+  (con un modelo SentencePiece mínimo entrenado en el test)
+- Vocabulario recortado: re-segmentación de piezas fuera del modelo CT2
+- Paridad SentencePiece ↔ tokenizador HF de NLLB (requiere el modelo descargado)
+"""
+from pathlib import Path
+
+import pytest
+
+from app.settings import settings
+from app.tokenization import (
+    SPM_MODEL_FILE,
+    TRIMMED_VOCAB_FILE,
+    RestrictedVocabulary,
+    build_direction_tokenizers,
+    build_sentencepiece_direction_tokenizers,
+    clean_up_tokenization,
+    load_trimmed_vocabulary,
+)
+
+spm = pytest.importorskip("sentencepiece")
+
+
+CORPUS = [
+    "Estimado cliente, gracias por su pedido.",
+    "Le informamos de que su paquete está en camino.",
+    "Kære kunde, tak for din ordre.",
+    "Vi informerer dig om, at din pakke er på vej.",
+    "¿Necesita ayuda? Escríbanos a soporte.",
+    "Har du brug for hjælp? Skriv til support!",
+] * 20
+
+SAMPLES = [
+    "Estimado cliente, gracias por su pedido.",
+    "Kære kunde, tak for din ordre!",
+    "¿Necesita ayuda?",
+]
+
+
+@pytest.fixture(scope="module")
+def spm_dir(tmp_path_factory):
+    """Directorio con un sentencepiece.bpe.model mínimo entrenado sobre CORPUS."""
+    model_dir = tmp_path_factory.mktemp("spm")
+    spm.SentencePieceTrainer.train(
+        sentence_iterator=iter(CORPUS),
+        model_prefix=str(model_dir / "sentencepiece.bpe"),
+        vocab_size=80,
+        model_type="bpe",
+        hard_vocab_limit=False,
+        minloglevel=2,
+    )
+    return model_dir
+
+
+def test_sentencepiece_encode_adds_language_frame(spm_dir):
+    """Cada dirección enmarca las piezas con su idioma origen y </s>."""
+    tokenizers = build_sentencepiece_direction_tokenizers(str(spm_dir))
+
+    es_da = tokenizers["es-da"].encode_batch(["gracias por su pedido"], max_length=512)[0]
+    da_es = tokenizers["da-es"].encode_batch(["tak for din ordre"], max_length=512)[0]
+
+    assert es_da[0] == "spa_Latn" and es_da[-1] == "</s>"
+    assert da_es[0] == "dan_Latn" and da_es[-1] == "</s>"
+    assert tokenizers["es-da"].tgt_bos_tok == "dan_Latn"
+    assert tokenizers["da-es"].tgt_bos_tok == "spa_Latn"
+
+
+def test_sentencepiece_truncates_to_max_length(spm_dir):
+    """max_length incluye los tokens especiales, como truncation=True de HF."""
+    tokenizer = build_sentencepiece_direction_tokenizers(str(spm_dir / SPM_MODEL_FILE))["es-da"]
+
+    tokens = tokenizer.encode_batch([SAMPLES[0]], max_length=5)[0]
+
+    assert len(tokens) == 5
+    assert tokens[0] == "spa_Latn" and tokens[-1] == "</s>"
+
+    full = tokenizer.encode_batch([SAMPLES[0]], max_length=512)[0]
+    assert tokenizer.count_tokens([SAMPLES[0]]) == [len(full) - 2]
+
+
+def test_sentencepiece_decode_round_trip(spm_dir):
+    """Decodificar en batch descarta tokens especiales y limpia espacios."""
+    tokenizer = build_sentencepiece_direction_tokenizers(str(spm_dir))["es-da"]
+    encoded = tokenizer.encode_batch(SAMPLES, max_length=512)
+    hypotheses = [["dan_Latn"] + tokens[1:] for tokens in encoded]
+
+    assert tokenizer.decode_batch(hypotheses) == SAMPLES
+    assert tokenizer.decode_batch([]) == []
+
+
+def test_sentencepiece_missing_model(tmp_path):
+    """Sin modelo SentencePiece el error es explícito."""
+    with pytest.raises(FileNotFoundError):
+        build_sentencepiece_direction_tokenizers(str(tmp_path))
+
+
+def test_invalid_backend_rejected(monkeypatch):
+    """Un TOKENIZER_BACKEND desconocido falla en lugar de usar hf."""
+    from app.startup import ModelManager
+
+    monkeypatch.setattr(settings, "TOKENIZER_BACKEND", "spm")
+    with pytest.raises(ValueError, match="TOKENIZER_BACKEND"):
+        ModelManager()._load_tokenizers()
+
+
+def test_restricted_vocabulary_split():
+    """Las piezas desconocidas se dividen en la pieza conservada más larga."""
+    vocabulary = RestrictedVocabulary(["▁ped", "▁p", "ido", "i", "d", "o", "e"])
+
+    assert vocabulary.split("▁pedido") == ["▁ped", "ido"]
+    assert vocabulary.split("▁pie") == ["▁p", "i", "e"]
+    assert vocabulary.split("▁ø") == ["<unk>", "<unk>"]
+    assert vocabulary.apply(["▁p", "ido"]) == ["▁p", "ido"]
+
+
+def test_trimmed_vocabulary_round_trip(spm_dir, tmp_path):
+    """Con el vocabulario recortado solo salen piezas conservadas y el texto se recupera."""
+    assert load_trimmed_vocabulary(str(tmp_path)) is None
+
+    processor = spm.SentencePieceProcessor(model_file=str(spm_dir / SPM_MODEL_FILE))
+    pieces = [processor.id_to_piece(i) for i in range(processor.get_piece_size())]
+    kept = [piece for piece in pieces if len(piece.lstrip("▁")) <= 1] + ["spa_Latn", "dan_Latn", "</s>"]
+    (tmp_path / TRIMMED_VOCAB_FILE).write_text("\n".join(kept) + "\n", encoding="utf-8")
+
+    vocabulary = load_trimmed_vocabulary(str(tmp_path))
+    tokenizer = build_sentencepiece_direction_tokenizers(str(spm_dir), vocabulary)["es-da"]
+    encoded = tokenizer.encode_batch(SAMPLES, max_length=512)
+
+    assert all(token in vocabulary.pieces for tokens in encoded for token in tokens)
+    assert tokenizer.count_tokens(SAMPLES) == [len(tokens) - 2 for tokens in encoded]
+    hypotheses = [["dan_Latn"] + tokens[1:] for tokens in encoded]
+    assert tokenizer.decode_batch(hypotheses) == SAMPLES
+
+
+def test_clean_up_tokenization():
+    """Misma limpieza que clean_up_tokenization_spaces de transformers."""
+    assert clean_up_tokenization("Hola , mundo . ¿Sí ?") == "Hola, mundo. ¿Sí?"
+
+
+@pytest.mark.skipif(
+    not (Path(settings.MODEL_DIR) / SPM_MODEL_FILE).exists(),
+    reason="Modelo NLLB no descargado"
+)
+@pytest.mark.parametrize("direction", ["es-da", "da-es"])
+def test_parity_with_hf_tokenizer(direction):
+    """Las mismas piezas de entrada y el mismo texto decodificado que HF."""
+    transformers = pytest.importorskip("transformers")
+    hf = build_direction_tokenizers(
+        transformers.AutoTokenizer.from_pretrained(settings.MODEL_DIR)
+    )[direction]
+    sp = build_sentencepiece_direction_tokenizers(settings.MODEL_DIR)[direction]
+    texts = SAMPLES + [
+        "Pague 1.250,00 € antes del 3 de mayo.",
+        "Línea con  dobles   espacios y «comillas».",
+    ]
+
+    hf_tokens = hf.encode_batch(texts, max_length=512)
+    assert sp.encode_batch(texts, max_length=512) == hf_tokens
+
+    hypotheses = [[hf.tgt_bos_tok] + tokens[1:] for tokens in hf_tokens]
+    assert sp.decode_batch(hypotheses) == hf.decode_batch(hypotheses)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])